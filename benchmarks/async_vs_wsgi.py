@@ -0,0 +1,143 @@
+"""
+Сравнение пропускной способности синхронного (WSGI) и асинхронного (ASGI) API.
+
+Клиент открывает заданное число постоянных HTTP/1.1-соединений и в каждом
+последовательно повторяет GET-запросы в течение заданного времени. Для
+каждого адреса печатаются запросы в секунду, p50/p99 и число ошибок.
+
+Пример (оба сервера смотрят в одну БД):
+
+    GUNICORN_BIND=127.0.0.1:8000 gunicorn -c gunicorn.conf.py
+    GUNICORN_BIND=127.0.0.1:8001 GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \\
+        gunicorn -c gunicorn.conf.py
+    python benchmarks/async_vs_wsgi.py \\
+        --url wsgi=http://127.0.0.1:8000/api/users/1/orders/ \\
+        --url asgi=http://127.0.0.1:8001/api/async/users/1/orders/ \\
+        --connections 1000 --duration 30
+
+При 1000 соединениях нужен лимит открытых файлов больше 1024 (ulimit -n).
+Сравнивайте серверы, которые отключают алгоритм Нейгла (Gunicorn, Uvicorn):
+manage.py runserver этого не делает, и каждый ответ на постоянном
+соединении ждет отложенного ACK клиента.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+class Result:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.statuses = {}
+
+
+async def read_response(reader):
+    """
+    Прочитать ответ целиком; вернуть код статуса и признак закрытия соединения
+    """
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, headers.get('connection', '').lower() == 'close'
+
+
+async def worker(url, deadline, result):
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    request = (
+        f'GET {path} HTTP/1.1\r\n'
+        f'Host: {parts.netloc}\r\n'
+        f'Accept: application/json\r\n'
+        f'\r\n'
+    ).encode('ascii')
+
+    writer = None
+    while time.monotonic() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status, closed = await read_response(reader)
+            result.latencies.append(time.perf_counter() - started)
+            result.statuses[status] = result.statuses.get(status, 0) + 1
+            if closed:
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            result.errors += 1
+            if writer is not None:
+                writer.close()
+                writer = None
+            await asyncio.sleep(0.01)
+    if writer is not None:
+        writer.close()
+
+
+async def run(url, connections, duration, warmup):
+    if warmup:
+        await asyncio.gather(*(
+            worker(url, time.monotonic() + warmup, Result()) for _ in range(min(connections, 50))
+        ))
+    result = Result()
+    started = time.monotonic()
+    await asyncio.gather(*(worker(url, started + duration, result) for _ in range(connections)))
+    return result, time.monotonic() - started
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def report(name, result, elapsed):
+    latencies = result.latencies
+    print(
+        f'{name:>14}: {len(latencies) / elapsed:9.1f} req/s  '
+        f'p50 {percentile(latencies, 0.50) * 1000:8.1f} ms  '
+        f'p99 {percentile(latencies, 0.99) * 1000:8.1f} ms  '
+        f'mean {statistics.fmean(latencies) * 1000 if latencies else float("nan"):8.1f} ms  '
+        f'errors {result.errors}  statuses {dict(sorted(result.statuses.items()))}'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', action='append', required=True, metavar='NAME=URL',
+                        help='Адрес для замера, можно указать несколько раз')
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=30.0, help='Секунд на каждый адрес')
+    parser.add_argument('--warmup', type=float, default=2.0, help='Секунд прогрева перед замером')
+    args = parser.parse_args()
+
+    for item in args.url:
+        name, _, url = item.partition('=')
+        if not url:
+            name, url = item, item
+        result, elapsed = asyncio.run(run(url, args.connections, args.duration, args.warmup))
+        report(name, result, elapsed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Пропускная способность массового создания заказов (POST /api/orders/bulk/).
+
+Клиент открывает заданное число постоянных HTTP/1.1-соединений и в каждом
+последовательно отправляет JSON-массивы по --items заказов для пользователей
+из диапазона --users. Печатаются запросы и созданные заказы в секунду,
+p50/p99 и коды ответа. Сервер запускается отдельно, как для async_vs_wsgi.py:
+
+    gunicorn -c gunicorn.conf.py
+    python benchmarks/bulk_orders.py --url http://127.0.0.1:8000/api/orders/bulk/ \\
+        --users 1-5000 --items 1000 --connections 4 --duration 20
+
+Каждый запрос создает заказы, поэтому замер стоит делать на отдельной БД.
+Заказы в секунду растут с --items до ORDER_BULK_BATCH_SIZE (меньше запросов
+и INSERT на заказ) и с числом воркеров Gunicorn, пока хватает ядер CPU:
+разбор JSON, проверка и подготовка INSERT занимают процессор воркера.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlsplit
+
+from async_vs_wsgi import Result, percentile, read_response
+
+
+def parse_range(value):
+    first, _, last = value.partition('-')
+    try:
+        first, last = int(first), int(last or first)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'Ожидается диапазон id FIRST-LAST: {value}')
+    if first < 1 or last < first:
+        raise argparse.ArgumentTypeError(f'Некорректный диапазон id: {value}')
+    return first, last
+
+
+def build_request(parts, users, items, rng):
+    body = json.dumps([
+        {
+            'title': f'Массовый заказ {rng.randint(1, 10 ** 6)}',
+            'description': 'Описание заказа, созданного бенчмарком массового создания',
+            'user': rng.randint(*users),
+        }
+        for _ in range(items)
+    ]).encode('utf-8')
+    head = (
+        f'POST {parts.path} HTTP/1.1\r\n'
+        f'Host: {parts.netloc}\r\n'
+        f'Content-Type: application/json\r\n'
+        f'Accept: application/json\r\n'
+        f'Content-Length: {len(body)}\r\n'
+        f'\r\n'
+    ).encode('ascii')
+    return head + body
+
+
+async def worker(url, users, items, deadline, result, seed):
+    parts = urlsplit(url)
+    rng = random.Random(seed)
+    # Тела готовятся заранее, чтобы клиент не делил CPU с сервером на json.dumps
+    requests = [build_request(parts, users, items, rng) for _ in range(8)]
+    writer = None
+    sent = 0
+    while time.monotonic() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+            started = time.perf_counter()
+            writer.write(requests[sent % len(requests)])
+            await writer.drain()
+            status, closed = await read_response(reader)
+            sent += 1
+            result.latencies.append(time.perf_counter() - started)
+            result.statuses[status] = result.statuses.get(status, 0) + 1
+            if closed:
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            result.errors += 1
+            if writer is not None:
+                writer.close()
+                writer = None
+            await asyncio.sleep(0.01)
+    if writer is not None:
+        writer.close()
+
+
+async def run(args):
+    if args.warmup:
+        deadline = time.monotonic() + args.warmup
+        await asyncio.gather(*(
+            worker(args.url, args.users, args.items, deadline, Result(), index) for index in range(args.connections)
+        ))
+    result = Result()
+    started = time.monotonic()
+    await asyncio.gather(*(
+        worker(args.url, args.users, args.items, started + args.duration, result, args.seed + index)
+        for index in range(args.connections)
+    ))
+    return result, time.monotonic() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8000/api/orders/bulk/')
+    parser.add_argument('--users', type=parse_range, required=True, metavar='FIRST-LAST',
+                        help='Диапазон id существующих пользователей')
+    parser.add_argument('--items', type=int, default=1000, help='Заказов в одном запросе')
+    parser.add_argument('--connections', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    if args.items < 1:
+        parser.error('--items должен быть положительным')
+
+    result, elapsed = asyncio.run(run(args))
+    latencies = result.latencies
+    created = result.statuses.get(201, 0) * args.items
+    print(
+        f'{len(latencies) / elapsed:.1f} req/s, {created / elapsed:.0f} заказов/с  '
+        f'p50 {percentile(latencies, 0.50) * 1000:.1f} ms  p99 {percentile(latencies, 0.99) * 1000:.1f} ms  '
+        f'errors {result.errors}  statuses {dict(sorted(result.statuses.items()))}'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,400 @@
+"""
+Воспроизводимый нагрузочный бенчмарк API.
+
+Скрипт создает отдельную тестовую БД (SQLite во временном файле или
+PostgreSQL из переменных DB_*), заполняет ее детерминированными данными,
+поднимает API во встроенном многопоточном WSGI-сервере этого же процесса и
+нагружает его набором операций с заданными весами. Для каждой операции и в
+целом печатаются req/s, p50/p95/p99 и число ошибок; результаты сохраняются
+в JSON и при необходимости сравниваются с эталоном.
+
+    python benchmarks/load.py --workload read-heavy --connections 32 --duration 20 \\
+        --output results.json
+    python benchmarks/load.py --workload read-heavy --baseline results.json --tolerance 0.2
+
+Сравнение с эталоном завершает процесс с кодом 1, если req/s упали или
+p99 выросли больше допуска. Эталон имеет смысл только для той же машины,
+БД и параметров запуска, поэтому они сохраняются в разделе meta.
+
+Клиент и сервер работают в одном процессе и делят GIL: абсолютные цифры
+ниже, чем у Gunicorn, но сравнение версий кода между собой корректно.
+SQLite подходит для нагрузок на чтение; параллельные транзакции вида
+«чтение, затем запись» (импорт пользователей) получают на нем
+«database is locked», поэтому bulk и write-heavy стоит мерить на PostgreSQL.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlsplit
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Версия стенда в meta.harness: эталоны другой версии несравнимы. 2 - сервер
+# без алгоритма Нейгла (задержки версии 1 отражали таймер отложенного ACK)
+HARNESS_VERSION = 2
+sys.path.insert(0, str(ROOT))
+
+from async_vs_wsgi import Result, percentile, read_response  # noqa: E402
+
+
+class Workload:
+    """
+    Состояние генератора запросов: диапазоны id исходных данных и счетчик уникальных email
+    """
+
+    def __init__(self, users, orders, rng):
+        self.users = users
+        self.orders = orders
+        self.rng = rng
+        self.sequence = 0
+
+    def user_id(self):
+        return self.rng.randint(self.users[0], self.users[1])
+
+    def order_id(self):
+        return self.rng.randint(self.orders[0], self.orders[1])
+
+    def unique(self):
+        self.sequence += 1
+        return f'{id(self):x}-{self.sequence}'
+
+
+def order_payload(workload):
+    return {
+        'title': f'Нагрузочный заказ {workload.rng.randint(1, 10 ** 6)}',
+        'description': 'Описание заказа, созданного нагрузочным бенчмарком',
+        'user': workload.user_id(),
+    }
+
+
+# Операция: функция workload -> (метод, путь, тело, Content-Type)
+OPERATIONS = {
+    'user-list': lambda w: ('GET', '/api/users/?page_size=20', None, None),
+    'user-detail': lambda w: ('GET', f'/api/users/{w.user_id()}/', None, None),
+    'user-stats': lambda w: ('GET', '/api/users/stats/?page_size=20', None, None),
+    'order-list': lambda w: ('GET', '/api/orders/?page_size=20', None, None),
+    'order-list-expand': lambda w: ('GET', '/api/orders/?page_size=20&expand=user', None, None),
+    'order-detail': lambda w: ('GET', f'/api/orders/{w.order_id()}/', None, None),
+    'user-orders': lambda w: ('GET', f'/api/users/{w.user_id()}/orders/?page_size=20', None, None),
+    'user-create': lambda w: ('POST', '/api/users/', {
+        'name': 'Нагрузочный пользователь', 'email': f'load-{w.unique()}@example.com', 'age': 30,
+    }, 'application/json'),
+    'user-update': lambda w: ('PUT', f'/api/users/{w.user_id()}/', {'age': w.rng.randint(18, 80)}, 'application/json'),
+    'order-create': lambda w: ('POST', '/api/orders/', order_payload(w), 'application/json'),
+    'order-update': lambda w: ('PUT', f'/api/orders/{w.order_id()}/', {
+        'title': f'Измененный заказ {w.rng.randint(1, 10 ** 6)}',
+    }, 'application/json'),
+    'order-bulk': lambda w: ('POST', '/api/orders/bulk/', [order_payload(w) for _ in range(100)], 'application/json'),
+    'user-import': lambda w: ('POST', '/api/users/import/', ''.join(
+        json.dumps({'name': 'Импорт', 'email': f'import-{w.unique()}@example.com', 'age': 30}) + '\n'
+        for _ in range(100)
+    ), 'application/x-ndjson'),
+}
+
+# Наборы операций с весами
+WORKLOADS = {
+    'read-heavy': {
+        'user-list': 10, 'user-detail': 20, 'user-stats': 5, 'order-list': 15,
+        'order-list-expand': 10, 'order-detail': 20, 'user-orders': 15,
+        'order-create': 3, 'order-update': 2,
+    },
+    'write-heavy': {
+        'user-create': 20, 'user-update': 10, 'order-create': 40, 'order-update': 20, 'order-detail': 10,
+    },
+    'bulk': {
+        'order-bulk': 70, 'user-import': 30,
+    },
+}
+
+
+def setup_django(args):
+    """
+    Настроить Django на отдельную БД бенчмарка до импорта моделей
+    """
+    os.environ['DEBUG'] = 'False'
+    os.environ['DB_ENGINE'] = args.db
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 't3codescommanders.settings')
+    import django
+    django.setup()
+    if args.db == 'sqlite':
+        # SQLite выполняет BEGIN обычным запросом, и записи выходят за бюджеты,
+        # рассчитанные на PostgreSQL
+        logging.getLogger('t3codescommanders.queries').setLevel(logging.ERROR)
+
+
+def create_database(args):
+    """
+    Создать и мигрировать тестовую БД: test_<DB_NAME> для PostgreSQL, временный файл для SQLite
+    """
+    from django.db import connection
+
+    if args.db == 'sqlite':
+        handle, path = tempfile.mkstemp(prefix='t3bench-', suffix='.sqlite3')
+        os.close(handle)
+        os.unlink(path)
+        connection.settings_dict['TEST']['NAME'] = path
+    return connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+
+
+def seed(users, orders, seed_value):
+    """
+    Детерминированные исходные данные; возвращает диапазоны id пользователей и заказов
+    """
+    from django.core.management import call_command
+
+    from orders.models import Order
+    from users.models import User
+
+    rng = random.Random(seed_value)
+    created = User.objects.bulk_create([
+        User(name=f'Пользователь {i}', email=f'bench{i}@example.com', age=rng.randint(18, 80))
+        for i in range(users)
+    ], batch_size=1000)
+    user_ids = [user.id for user in created]
+    Order.objects.bulk_create([
+        Order(
+            title=f'Заказ {i}',
+            description='Описание заказа для нагрузочного бенчмарка ' * rng.randint(1, 5),
+            user_id=rng.choice(user_ids),
+        )
+        for i in range(orders)
+    ], batch_size=1000)
+    # bulk_create не обновляет счетчики заказов пользователей
+    call_command('recompute_user_counters', verbosity=0)
+    order_ids = Order.objects.order_by('id').values_list('id', flat=True)
+    return (min(user_ids), max(user_ids)), (order_ids.first(), order_ids.last())
+
+
+def start_server():
+    """
+    Многопоточный WSGI-сервер Django (как у LiveServerTestCase) в фоновом потоке
+    """
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        # Заголовки и тело ответа уходят отдельными send(): с алгоритмом Нейгла
+        # тело ждет отложенного ACK клиента (~40 мс) на каждом keep-alive запросе
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=False)
+    server.set_app(WSGIHandler())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    return server, f'http://{host}:{port}'
+
+
+def encode_request(netloc, method, path, body, content_type):
+    if body is not None and not isinstance(body, str):
+        body = json.dumps(body)
+    payload = body.encode('utf-8') if body is not None else b''
+    head = f'{method} {path} HTTP/1.1\r\nHost: {netloc}\r\nAccept: application/json\r\n'
+    if body is not None:
+        head += f'Content-Type: {content_type}\r\nContent-Length: {len(payload)}\r\n'
+    return (head + '\r\n').encode('ascii') + payload
+
+
+async def worker(base_url, deadline, workload, mix, results):
+    parts = urlsplit(base_url)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    writer = None
+    while time.monotonic() < deadline:
+        name = workload.rng.choices(names, weights)[0]
+        stats = results.setdefault(name, Result())
+        request = encode_request(parts.netloc, *OPERATIONS[name](workload))
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(parts.hostname, parts.port)
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status, closed = await read_response(reader)
+            stats.latencies.append(time.perf_counter() - started)
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            if status >= 400:
+                stats.errors += 1
+            if closed:
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            stats.errors += 1
+            if writer is not None:
+                writer.close()
+                writer = None
+            await asyncio.sleep(0.01)
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(base_url, mix, connections, duration, seed_value, users, orders):
+    results = {}
+    started = time.monotonic()
+    await asyncio.gather(*(
+        worker(base_url, started + duration, Workload(users, orders, random.Random(seed_value + index)), mix, results)
+        for index in range(connections)
+    ))
+    return results, time.monotonic() - started
+
+
+def summarize(stats, elapsed):
+    latencies = stats.latencies
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3) if latencies else None,
+        'errors': stats.errors,
+        'statuses': {str(code): count for code, count in sorted(stats.statuses.items())},
+    }
+
+
+def build_report(args, results, elapsed):
+    total = Result()
+    for stats in results.values():
+        total.latencies += stats.latencies
+        total.errors += stats.errors
+        for code, count in stats.statuses.items():
+            total.statuses[code] = total.statuses.get(code, 0) + count
+    return {
+        'meta': {
+            'harness': HARNESS_VERSION,
+            'workload': args.workload,
+            'db': args.db,
+            'connections': args.connections,
+            'duration': args.duration,
+            'users': args.users,
+            'orders': args.orders,
+            'seed': args.seed,
+            'python': platform.python_version(),
+            'machine': platform.node(),
+            'commit': git_commit(),
+            'finished_at': datetime.now(timezone.utc).isoformat(),
+        },
+        'total': summarize(total, elapsed),
+        'operations': {name: summarize(stats, elapsed) for name, stats in sorted(results.items())},
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report):
+    rows = [('total', report['total'])] + list(report['operations'].items())
+    for name, data in rows:
+        print(
+            f'{name:>18}: {data["rps"]:9.1f} req/s  p50 {data["p50_ms"] or 0:8.1f} ms  '
+            f'p95 {data["p95_ms"] or 0:8.1f} ms  p99 {data["p99_ms"] or 0:8.1f} ms  '
+            f'errors {data["errors"]}  statuses {data["statuses"]}'
+        )
+
+
+def compare(report, baseline, tolerance):
+    """
+    Регрессии относительно эталона: падение req/s, рост p99 и появление ошибок
+    """
+    if baseline.get('meta', {}).get('harness') != HARNESS_VERSION:
+        raise ValueError(
+            'Эталон снят другой версией стенда (meta.harness), снимите его заново с --output'
+        )
+    regressions = []
+    pairs = [('total', report['total'], baseline.get('total'))] + [
+        (name, data, baseline.get('operations', {}).get(name)) for name, data in report['operations'].items()
+    ]
+    for name, current, previous in pairs:
+        if not previous:
+            continue
+        if current['rps'] < previous['rps'] * (1 - tolerance):
+            regressions.append(f'{name}: {current["rps"]} req/s против {previous["rps"]} в эталоне')
+        if current['p99_ms'] and previous['p99_ms'] and current['p99_ms'] > previous['p99_ms'] * (1 + tolerance):
+            regressions.append(f'{name}: p99 {current["p99_ms"]} ms против {previous["p99_ms"]} ms в эталоне')
+        if current['errors'] > previous['errors']:
+            regressions.append(f'{name}: ошибок {current["errors"]} против {previous["errors"]} в эталоне')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workload', choices=list(WORKLOADS), default='read-heavy')
+    parser.add_argument('--db', choices=['sqlite', 'postgresql'], default='sqlite',
+                        help='sqlite - временный файл, postgresql - test_<DB_NAME> на сервере из DB_*')
+    parser.add_argument('--connections', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20.0, help='Секунд замера')
+    parser.add_argument('--warmup', type=float, default=3.0, help='Секунд прогрева перед замером')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Сохранить результаты в JSON')
+    parser.add_argument('--baseline', help='JSON эталона для сравнения')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Допустимое ухудшение, доля (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    setup_django(args)
+    from django.db import connection
+
+    old_name = connection.settings_dict['NAME']
+    create_database(args)
+    server = None
+    try:
+        users, orders = seed(args.users, args.orders, args.seed)
+        connection.close()
+        server, base_url = start_server()
+        mix = WORKLOADS[args.workload]
+        if args.warmup:
+            asyncio.run(run_load(base_url, mix, args.connections, args.warmup, args.seed + 10 ** 6, users, orders))
+        results, elapsed = asyncio.run(
+            run_load(base_url, mix, args.connections, args.duration, args.seed, users, orders)
+        )
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    report = build_report(args, results, elapsed)
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        try:
+            regressions = compare(report, baseline, args.tolerance)
+        except ValueError as e:
+            print(str(e), file=sys.stderr)
+            sys.exit(2)
+        if regressions:
+            print('Регрессии относительно эталона:', file=sys.stderr)
+            for line in regressions:
+                print(f'  {line}', file=sys.stderr)
+            sys.exit(1)
+        print(f'Результаты в пределах допуска {args.tolerance:.0%} от эталона')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Накладные расходы MetricsMiddleware на один запрос, микросекунды.
+
+Middleware вызывается с заранее построенными запросом и ответом, поэтому
+замеряется только запись метрик. Для режима нескольких процессов задайте
+PROMETHEUS_MULTIPROC_DIR (значения пишутся в mmap-файлы):
+
+    python benchmarks/metrics_overhead.py
+    PROMETHEUS_MULTIPROC_DIR=$(mktemp -d) python benchmarks/metrics_overhead.py
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 't3codescommanders.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.urls import resolve  # noqa: E402
+
+from t3codescommanders.middleware import MetricsMiddleware, QueryStats  # noqa: E402
+
+
+def measure(handler, request, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        handler(request)
+    return (time.perf_counter() - started) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100000)
+    args = parser.parse_args()
+
+    response = HttpResponse(b'{}' * 1000, content_type='application/json')
+    request = RequestFactory().get('/api/users/')
+    request.resolver_match = resolve('/api/users/')
+    request.query_stats = QueryStats()
+
+    def view(request):
+        return response
+
+    baseline = measure(view, request, args.requests)
+    instrumented = measure(MetricsMiddleware(view), request, args.requests)
+    mode = 'multiprocess' if 'PROMETHEUS_MULTIPROC_DIR' in os.environ else 'single process'
+    print(f'{mode}: {(instrumented - baseline) * 1e6:.1f} us per request')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Микробенчмарк сериализации страницы заказов: строк в секунду.
+
+Сравниваются DRF OrderSerializer над моделями и RowSerializer над строками
+values(), каждый с JSONRenderer и ORJSONRenderer. Данные строятся в памяти,
+поэтому БД не нужна и замеряется только CPU сериализации и рендеринга.
+
+    python benchmarks/serialization.py --rows 10000 --repeat 5
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 't3codescommanders.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.utils import timezone  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from orders.models import Order  # noqa: E402
+from orders.serializers import OrderSerializer  # noqa: E402
+from t3codescommanders.renderers import ORJSONRenderer  # noqa: E402
+from t3codescommanders.serializers import get_row_serializer  # noqa: E402
+from users.models import User  # noqa: E402
+
+
+def build_data(count):
+    """
+    Заказы-модели и эквивалентные им строки values() с полями пользователя
+    """
+    now = timezone.now()
+    users = [
+        User(id=i, name=f'Пользователь {i}', email=f'user{i}@example.com', age=30,
+             order_count=i, last_order_at=now, created_at=now, updated_at=now)
+        for i in range(1, 101)
+    ]
+    orders = []
+    rows = []
+    for i in range(1, count + 1):
+        user = users[i % len(users)]
+        created_at = now - timedelta(seconds=i, microseconds=i)
+        orders.append(Order(
+            id=i, title=f'Заказ {i}', description='Описание заказа для замера сериализации',
+            user=user, created_at=created_at, updated_at=created_at,
+        ))
+        row = {
+            'id': i, 'title': f'Заказ {i}', 'description': 'Описание заказа для замера сериализации',
+            'user': user.id, 'created_at': created_at, 'updated_at': created_at,
+        }
+        for name in ('id', 'name', 'email', 'age', 'order_count', 'last_order_at', 'created_at', 'updated_at'):
+            row[f'user__{name}'] = getattr(user, name)
+        rows.append(row)
+    return orders, rows
+
+
+def measure(render, repeat):
+    """
+    Лучшее время из repeat прогонов и размер ответа
+    """
+    best = float('inf')
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = len(render())
+        best = min(best, time.perf_counter() - started)
+    return best, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    orders, rows = build_data(args.rows)
+    renderers = {'json': JSONRenderer(), 'orjson': ORJSONRenderer()}
+
+    for expand in (set(), {'user'}):
+        row_serializer = get_row_serializer(OrderSerializer, expand)
+        paths = {
+            'serializer': lambda: OrderSerializer(orders, many=True, context={'expand': expand}).data,
+            'rows': lambda: row_serializer.serialize(rows),
+        }
+        print(f'expand={",".join(sorted(expand)) or "-"}')
+        for path_name, serialize in paths.items():
+            for renderer_name, renderer in renderers.items():
+                elapsed, size = measure(lambda: renderer.render({'status': 'success', 'data': serialize()}), args.repeat)
+                print(
+                    f'  {path_name:>10} + {renderer_name:<6}: {args.rows / elapsed:12.0f} rows/s  '
+                    f'{elapsed * 1000:8.1f} ms  {size} bytes'
+                )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Сравнение задержек API в разных режимах запуска сервера.
+
+Скрипт по очереди запускает сервер в каждом режиме, дает нагрузку клиентом
+из async_vs_wsgi.py и печатает req/s, p50 и p99. Режимы:
+
+    gunicorn      - gunicorn.conf.py (WSGI, gthread) без пула (DB_POOL_ENABLED=False)
+    gunicorn-pool - gunicorn.conf.py (WSGI, gthread) с пулом соединений (DB_POOL_ENABLED=True)
+    gunicorn-asgi - gunicorn.conf.py с воркерами Uvicorn и пулом соединений
+
+Пример (PostgreSQL из .env или переменных окружения, данные уже загружены):
+
+    python benchmarks/server_modes.py --path /api/users/1/orders/ \\
+        --connections 100 --duration 30
+
+Разница в p99 между gunicorn и gunicorn-pool - это стоимость TCP-соединения
+и аутентификации в PostgreSQL на каждый запрос. manage.py runserver здесь
+не сравнивается: он не отключает алгоритм Нейгла, и ответы на постоянных
+соединениях ждут отложенного ACK клиента (около 40 мс), поэтому его задержки
+отражают таймеры TCP, а не приложение.
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from async_vs_wsgi import report, run
+
+ROOT = Path(__file__).resolve().parent.parent
+
+MODES = {
+    'gunicorn': (
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', '{bind}'],
+        {'DB_POOL_ENABLED': 'False'},
+    ),
+    'gunicorn-pool': (
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', '{bind}'],
+        {'DB_POOL_ENABLED': 'True'},
+    ),
+    'gunicorn-asgi': (
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', '{bind}'],
+        {'DB_POOL_ENABLED': 'True', 'GUNICORN_WORKER_CLASS': 'uvicorn.workers.UvicornWorker'},
+    ),
+}
+
+
+def wait_until_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except urllib.error.HTTPError:
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Сервер не ответил за {timeout} с: {url}')
+
+
+def bench_mode(mode, args):
+    command, env = MODES[mode]
+    bind = f'127.0.0.1:{args.port}'
+    process = subprocess.Popen(
+        [part.format(bind=bind) for part in command],
+        cwd=ROOT,
+        env={**os.environ, 'DEBUG': 'False', 'GUNICORN_ACCESS_LOG': os.devnull, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        url = f'http://{bind}{args.path}'
+        wait_until_ready(url)
+        result, elapsed = asyncio.run(run(url, args.connections, args.duration, args.warmup))
+        report(mode, result, elapsed)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', action='append', choices=list(MODES),
+                        help='Режим для замера, по умолчанию все')
+    parser.add_argument('--path', default='/api/orders/')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--connections', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--warmup', type=float, default=2.0)
+    args = parser.parse_args()
+
+    for mode in args.mode or MODES:
+        bench_mode(mode, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Конфигурация Gunicorn для продакшн-запуска:
+
+    gunicorn -c gunicorn.conf.py
+
+По умолчанию воркеры gthread обслуживают WSGI-приложение: каждый воркер
+выполняет до GUNICORN_THREADS запросов в постоянных потоках, поэтому
+соединения с БД переживают запрос (DB_CONN_MAX_AGE), потоковые ответы
+отдаются по мере генерации, а QueryInstrumentationMiddleware считает
+запросы к БД.
+
+Воркеры Uvicorn (GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker)
+обслуживают ASGI-приложение и запускаются отдельным процессом для
+/api/async/ (сервис web-async в docker-compose.yml). Остальные
+представления синхронные: под ASGI Django 4.2 выполняет каждое в новом
+потоке sync_to_async, не переиспользует соединения с БД между запросами и
+собирает синхронные потоковые ответы в память целиком.
+
+Плавная перезагрузка кода и конфигурации без потери запросов:
+kill -HUP <pid мастера>.
+"""
+
+import multiprocessing
+import os
+import shutil
+
+# Имя config занято настройкой Gunicorn, поэтому decouple импортируется модулем
+import decouple
+
+bind = decouple.config('GUNICORN_BIND', default='0.0.0.0:8000')
+
+# Воркеры (и соседние процессы: web-async, фоновые задачи) не видят
+# инвалидацию кэша ответов друг друга, если кэш живет в памяти процесса,
+# поэтому такой кэш в них отключается (t3codescommanders.cache)
+os.environ.setdefault('RESPONSE_CACHE_REQUIRE_SHARED', 'True')
+
+# Число процессов: по умолчанию 2 * CPU + 1
+workers = decouple.config('GUNICORN_WORKERS', default=multiprocessing.cpu_count() * 2 + 1, cast=int)
+worker_class = decouple.config('GUNICORN_WORKER_CLASS', default='gthread')
+# Потоки воркера gthread; воркер Uvicorn их не использует
+threads = decouple.config('GUNICORN_THREADS', default=4, cast=int)
+
+wsgi_app = (
+    't3codescommanders.asgi:application' if 'uvicorn' in worker_class
+    else 't3codescommanders.wsgi:application'
+)
+
+timeout = decouple.config('GUNICORN_TIMEOUT', default=30, cast=int)
+graceful_timeout = decouple.config('GUNICORN_GRACEFUL_TIMEOUT', default=30, cast=int)
+keepalive = decouple.config('GUNICORN_KEEPALIVE', default=5, cast=int)
+
+# Перезапуск воркера после заданного числа запросов ограничивает утечки памяти
+max_requests = decouple.config('GUNICORN_MAX_REQUESTS', default=1000, cast=int)
+max_requests_jitter = decouple.config('GUNICORN_MAX_REQUESTS_JITTER', default=100, cast=int)
+
+# Приложение загружается в каждом воркере, поэтому пулы соединений и
+# кэш ответов не наследуются от мастера через fork
+preload_app = False
+reload = decouple.config('GUNICORN_RELOAD', default=False, cast=bool)
+
+accesslog = decouple.config('GUNICORN_ACCESS_LOG', default='-')
+errorlog = '-'
+loglevel = decouple.config('GUNICORN_LOG_LEVEL', default='info')
+
+
+def worker_exit(server, worker):
+    """
+    Закрыть соединения пула при остановке воркера
+    """
+    from t3codescommanders.db.postgresql_pool.base import close_pools
+    close_pools()
+
+
+def on_starting(server):
+    """
+    Очистить файлы метрик Prometheus предыдущего запуска (PROMETHEUS_MULTIPROC_DIR)
+    """
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """
+    Исключить из gauge-метрик значения завершившегося воркера
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
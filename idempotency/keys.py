@@ -0,0 +1,233 @@
+"""
+Поддержка заголовка Idempotency-Key для эндпоинтов создания.
+
+Первый запрос с ключом записывает ключ в таблицу idempotency_idempotencykey,
+выполняется как обычно и сохраняет ответ (любой, кроме 5xx) на
+IDEMPOTENCY_KEY_TTL секунд. Повтор с тем же ключом получает сохраненный
+ответ с заголовком Idempotent-Replayed: true, не выполняя проверок и не
+обращаясь к таблицам пользователей и заказов. Повтор с тем же ключом, но
+другим телом или параметрами запроса отклоняется (422).
+
+Дубликат, пришедший, пока первый запрос выполняется, ждет его ответа до
+IDEMPOTENCY_WAIT_TIMEOUT секунд, опрашивая ключ, а затем получает 409.
+Если выполнявший запрос процесс умер, ключ освобождается через
+IDEMPOTENCY_LOCK_TIMEOUT секунд. После ответа 5xx ключ удаляется, и
+повтор выполняется заново. Истекшие ключи удаляет задача
+purge_idempotency_keys (см. idempotency.tasks).
+
+Синхронные представления DRF используют декоратор idempotent,
+async-представления (/api/async/) - aidempotent с той же таблицей ключей.
+"""
+
+import hashlib
+import json
+import time
+from datetime import timedelta
+from functools import wraps
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+# Заголовки ответа, которые сохраняются вместе с телом
+STORED_HEADERS = ('Location',)
+
+
+class IdempotencyError(Exception):
+    """
+    Запрос с ключом нельзя выполнить: ключ некорректен, занят другим запросом или еще выполняется
+    """
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def request_fingerprint(request):
+    """
+    SHA-256 метода, пути с параметрами запроса и тела запроса.
+
+    Параметры сортируются, поэтому их порядок не важен, а ?mode=atomic и
+    ?mode=partial с одним телом дают разные отпечатки.
+    """
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    target = f'{request.path}?{query}' if query else request.path
+    digest = hashlib.sha256()
+    digest.update(f'{request.method} {target}\n'.encode('utf-8'))
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def check_key(key):
+    if not key.strip() or len(key) > IdempotencyKey._meta.get_field('key').max_length:
+        raise IdempotencyError(
+            f'{HEADER} должен быть непустой строкой не длиннее 255 символов',
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+
+def begin(scope, key, fingerprint):
+    """
+    Занять ключ или дождаться ответа запроса, который его занял.
+
+    Возвращает (запись, завершена ли она): незавершенная запись принадлежит
+    текущему запросу, завершенная содержит ответ для повтора.
+    """
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+    while True:
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    scope=scope, key=key, fingerprint=fingerprint,
+                    locked_until=now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT),
+                    expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+                )
+            return record, False
+        except IntegrityError:
+            pass
+
+        record = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+        if record is None:
+            # Ключ удалили между INSERT и SELECT (ответ 5xx или очистка)
+            continue
+        if record.expires_at <= now:
+            IdempotencyKey.objects.filter(id=record.id, expires_at__lte=now).delete()
+            continue
+        if record.fingerprint != fingerprint:
+            raise IdempotencyError(
+                f'{HEADER} уже использован с другим запросом', status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if record.completed:
+            return record, True
+        if record.locked_until <= now:
+            # Выполнявший запрос процесс не сохранил ответ вовремя: ключ переходит текущему
+            locked_until = now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+            taken = IdempotencyKey.objects.filter(
+                id=record.id, status_code__isnull=True, locked_until=record.locked_until,
+            ).update(locked_until=locked_until)
+            if taken:
+                record.locked_until = locked_until
+                return record, False
+            continue
+        if time.monotonic() >= deadline:
+            raise IdempotencyError(
+                f'Запрос с этим {HEADER} еще выполняется, повторите позже', status.HTTP_409_CONFLICT,
+            )
+        time.sleep(settings.IDEMPOTENCY_POLL_INTERVAL)
+
+
+def complete(record, response):
+    """
+    Сохранить ответ для повторов; после ответа 5xx ключ освобождается
+    """
+    if response.status_code >= 500:
+        IdempotencyKey.objects.filter(id=record.id).delete()
+        return
+    headers = {name: response[name] for name in STORED_HEADERS if response.has_header(name)}
+    # Ответ async-представления уже отрендерен в JSON и не содержит .data
+    data = response.data if hasattr(response, 'data') else json.loads(response.content)
+    IdempotencyKey.objects.filter(id=record.id).update(
+        status_code=response.status_code, response=data, headers=headers, locked_until=None,
+    )
+
+
+def replay(record):
+    response = Response(record.response, status=record.status_code, headers=record.headers)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def idempotent(handler):
+    """
+    Декоратор метода APIView: поддержка заголовка Idempotency-Key.
+
+    Ключ действует в пределах имени URL представления; запрос без
+    заголовка выполняется как обычно.
+    """
+    @wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return handler(view, request, *args, **kwargs)
+        try:
+            check_key(key)
+            scope = request.resolver_match.url_name
+            record, completed = begin(scope, key, request_fingerprint(request))
+        except IdempotencyError as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=e.status_code)
+        if completed:
+            return replay(record)
+
+        try:
+            response = handler(view, request, *args, **kwargs)
+        except Exception:
+            IdempotencyKey.objects.filter(id=record.id).delete()
+            raise
+        complete(record, response)
+        return response
+    return wrapper
+
+
+def aidempotent(handler):
+    """
+    Декоратор метода AsyncAPIView: поддержка заголовка Idempotency-Key.
+
+    Ключ занимается и ответ сохраняется теми же begin и complete через
+    sync_to_async; ожидание дубликата занимает поток запроса, а не цикл событий.
+    """
+    @wraps(handler)
+    async def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return await handler(view, request, *args, **kwargs)
+        try:
+            check_key(key)
+            scope = request.resolver_match.url_name
+            record, completed = await sync_to_async(begin)(scope, key, request_fingerprint(request))
+        except IdempotencyError as e:
+            return view.error(str(e), e.status_code)
+        if completed:
+            response = view.render(record.response, record.status_code)
+            for name, value in record.headers.items():
+                response[name] = value
+            response[REPLAYED_HEADER] = 'true'
+            return response
+
+        try:
+            response = await handler(view, request, *args, **kwargs)
+        except Exception:
+            await IdempotencyKey.objects.filter(id=record.id).adelete()
+            raise
+        await sync_to_async(complete)(record, response)
+        return response
+    return wrapper
+
+
+def purge_expired(batch_size=None, now=None):
+    """
+    Удалить истекшие ключи порциями по batch_size; возвращает число удаленных
+    """
+    batch_size = batch_size or settings.IDEMPOTENCY_PURGE_BATCH_SIZE
+    now = now or timezone.now()
+    total = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(expires_at__lte=now).order_by().values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        # У ключей нет связей и сигналов, поэтому delete() выполняется одним DELETE без выборки объектов
+        total += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
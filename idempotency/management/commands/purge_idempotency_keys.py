@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from idempotency.keys import purge_expired
+from idempotency.tasks import schedule_purge
+
+
+class Command(BaseCommand):
+    help = 'Удалить истекшие ключи Idempotency-Key или запланировать периодическую очистку в очереди jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--schedule', action='store_true',
+            help='Поставить задачу purge_idempotency_keys, которая повторяется каждые IDEMPOTENCY_PURGE_INTERVAL секунд',
+        )
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            job, created = schedule_purge()
+            state = 'запланирована' if created else 'уже запланирована'
+            self.stdout.write(self.style.SUCCESS(f'Очистка ключей {state}: задача #{job.id} на {job.run_at.isoformat()}'))
+            return
+        deleted = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'Удалено истекших ключей: {deleted}'))
@@ -0,0 +1,38 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+
+class IdempotencyKey(models.Model):
+    """
+    Ключ Idempotency-Key и сохраненный ответ на первый запрос с ним
+    """
+    # Имя URL представления: один ключ может использоваться для разных эндпоинтов
+    scope = models.CharField(max_length=100, verbose_name="Эндпоинт")
+    key = models.CharField(max_length=255, verbose_name="Ключ")
+    # SHA-256 метода, пути и тела запроса
+    fingerprint = models.CharField(max_length=64, verbose_name="Отпечаток запроса")
+    # Пока запрос выполняется, ответа нет
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="Код ответа")
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name="Тело ответа")
+    headers = models.JSONField(default=dict, verbose_name="Заголовки ответа")
+    locked_until = models.DateTimeField(null=True, blank=True, verbose_name="Выполняется до")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    expires_at = models.DateTimeField(verbose_name="Истекает")
+
+    class Meta:
+        verbose_name = "Ключ идемпотентности"
+        verbose_name_plural = "Ключи идемпотентности"
+        indexes = [
+            # Очистка истекших ключей
+            models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='idempotency_scope_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}: {self.key}"
+
+    @property
+    def completed(self):
+        return self.status_code is not None
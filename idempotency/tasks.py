@@ -0,0 +1,35 @@
+"""
+Периодическая очистка истекших ключей идемпотентности воркерами run_workers.
+"""
+
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from jobs.registry import enqueue, task
+from .keys import purge_expired
+
+
+def schedule_purge(now=None):
+    """
+    Поставить очистку на начало следующего интервала IDEMPOTENCY_PURGE_INTERVAL.
+
+    Ключ задачи включает номер интервала, поэтому повторный вызов (из
+    команды или выполняющейся очистки) не создает вторую задачу на то же
+    время. Возвращает (задача, создана ли она).
+    """
+    interval = settings.IDEMPOTENCY_PURGE_INTERVAL
+    slot = int((now or timezone.now()).timestamp() // interval) + 1
+    run_at = datetime.fromtimestamp(slot * interval, dt_timezone.utc)
+    return enqueue('purge_idempotency_keys', key=f'purge_idempotency_keys:{slot}', run_at=run_at)
+
+
+@task('purge_idempotency_keys')
+def purge_idempotency_keys_task(job):
+    """
+    Запланировать следующую очистку и удалить истекшие ключи
+    """
+    # Следующая очистка ставится до удаления, чтобы ошибка не прервала расписание
+    schedule_purge()
+    return {'deleted': purge_expired()}
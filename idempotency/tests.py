@@ -0,0 +1,191 @@
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import skipUnless
+
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from jobs.models import Job
+from orders.models import Order
+from users.models import User
+from .keys import REPLAYED_HEADER, purge_expired
+from .models import IdempotencyKey
+from .tasks import schedule_purge
+
+
+class IdempotencyKeyTests(TestCase):
+    """
+    Повтор запроса с Idempotency-Key возвращает сохраненный ответ без повторного создания
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(name='Клиент', email='client@example.com', age=30)
+
+    def post(self, name, data, key):
+        return self.client.post(reverse(name), data, content_type='application/json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay(self):
+        data = {'title': 'Заказ с ключом', 'description': 'Описание заказа с ключом', 'user': self.user.id}
+        first = self.post('order-list-create', data, 'order-1')
+        self.assertEqual(first.status_code, 201)
+        self.assertNotIn(REPLAYED_HEADER, first)
+
+        with CaptureQueriesContext(connection) as captured:
+            second = self.post('order-list-create', data, 'order-1')
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second[REPLAYED_HEADER], 'true')
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(Order.objects.filter(title='Заказ с ключом').count(), 1)
+        # Повтор не обращается к таблицам пользователей и заказов
+        self.assertFalse([
+            query for query in captured.captured_queries
+            if 'users_user' in query['sql'] or 'orders_order' in query['sql']
+        ])
+
+        other = self.post('order-list-create', {**data, 'title': 'Другой заказ'}, 'order-1')
+        self.assertEqual(other.status_code, 422)
+        # Ключ действует в пределах эндпоинта
+        user = self.post('user-list-create', {'name': 'Новый', 'email': 'new@example.com', 'age': 20}, 'order-1')
+        self.assertEqual(user.status_code, 201)
+
+    def test_query_string(self):
+        item = {'title': 'Пакетный заказ', 'description': 'Описание пакетного заказа', 'user': self.user.id}
+        url = reverse('order-bulk-create')
+
+        def post(query):
+            return self.client.post(
+                f'{url}?{query}', [item], content_type='application/json', HTTP_IDEMPOTENCY_KEY='bulk-1',
+            )
+
+        self.assertEqual(post('mode=atomic&unused=1').status_code, 201)
+        # Порядок параметров не меняет отпечаток
+        self.assertEqual(post('unused=1&mode=atomic')[REPLAYED_HEADER], 'true')
+        conflict = post('mode=partial&unused=1')
+        self.assertEqual(conflict.status_code, 422)
+        self.assertNotIn(REPLAYED_HEADER, conflict)
+        self.assertEqual(Order.objects.filter(title='Пакетный заказ').count(), 1)
+
+    def test_errors_are_stored(self):
+        data = {'title': 'Заказ', 'description': 'Описание заказа', 'user': 999999}
+        self.assertEqual(self.post('order-list-create', data, 'missing-user').status_code, 400)
+        replay = self.post('order-list-create', data, 'missing-user')
+        self.assertEqual(replay.status_code, 400)
+        self.assertEqual(replay[REPLAYED_HEADER], 'true')
+        self.assertEqual(self.post('order-list-create', data, ' ').status_code, 400)
+
+    @override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0)
+    def test_in_flight_duplicate(self):
+        data = {'name': 'Дубликат', 'email': 'dup@example.com', 'age': 20}
+        first = self.post('user-list-create', data, 'user-1')
+        record = IdempotencyKey.objects.get(key='user-1')
+        # Ключ занят выполняющимся запросом
+        IdempotencyKey.objects.filter(id=record.id).update(
+            status_code=None, locked_until=timezone.now() + timedelta(minutes=1),
+        )
+        self.assertEqual(self.post('user-list-create', data, 'user-1').status_code, 409)
+
+        # Запрос, занявший ключ, умер: ключ переходит повтору
+        IdempotencyKey.objects.filter(id=record.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+        User.objects.filter(email='dup@example.com').delete()
+        # Перехват ключа стоит лишних запросов сверх бюджета
+        with self.assertLogs('t3codescommanders.queries', 'WARNING'):
+            retry = self.post('user-list-create', data, 'user-1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertNotEqual(retry.json()['data']['id'], first.json()['data']['id'])
+
+    def test_purge(self):
+        now = timezone.now()
+        for key, expires_at in (('old', now - timedelta(seconds=1)), ('fresh', now + timedelta(hours=1))):
+            IdempotencyKey.objects.create(
+                scope='user-list-create', key=key, fingerprint='0' * 64, status_code=201, expires_at=expires_at,
+            )
+        self.assertEqual(purge_expired(batch_size=1, now=now), 1)
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['fresh'])
+
+    @override_settings(IDEMPOTENCY_PURGE_INTERVAL=3600)
+    def test_schedule_purge(self):
+        now = datetime(2025, 1, 1, 10, 30, tzinfo=dt_timezone.utc)
+        job, created = schedule_purge(now)
+        self.assertTrue(created)
+        self.assertEqual(job.run_at, datetime(2025, 1, 1, 11, 0, tzinfo=dt_timezone.utc))
+        self.assertFalse(schedule_purge(now + timedelta(minutes=10))[1])
+        self.assertEqual(Job.objects.filter(name='purge_idempotency_keys').count(), 1)
+
+
+class AsyncIdempotencyKeyTests(TransactionTestCase):
+    """
+    Async-представления создания поддерживают Idempotency-Key так же, как синхронные.
+
+    Без тестовой транзакции: IntegrityError при вставке дубликата не прерывает следующие запросы.
+    """
+
+    async def post(self, name, data, key):
+        return await self.async_client.post(
+            reverse(name), data, content_type='application/json', headers={'Idempotency-Key': key},
+        )
+
+    async def test_replay(self):
+        user = await User.objects.acreate(name='Клиент', email='client@example.com', age=30)
+        data = {'title': 'Асинхронный заказ', 'description': 'Описание асинхронного заказа', 'user': user.id}
+        first = await self.post('async-order-list-create', data, 'async-order-1')
+        self.assertEqual(first.status_code, 201)
+        self.assertNotIn(REPLAYED_HEADER, first)
+
+        second = await self.post('async-order-list-create', data, 'async-order-1')
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second[REPLAYED_HEADER], 'true')
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(await Order.objects.filter(title='Асинхронный заказ').acount(), 1)
+
+        other = await self.post('async-order-list-create', {**data, 'title': 'Другой заказ'}, 'async-order-1')
+        self.assertEqual(other.status_code, 422)
+        self.assertEqual(other.json()['status'], 'error')
+
+    async def test_errors(self):
+        data = {'name': 'Дубликат', 'email': 'dup@example.com', 'age': 20}
+        self.assertEqual((await self.post('async-user-list-create', data, 'user-1')).status_code, 201)
+        duplicate = await self.post('async-user-list-create', data, 'user-2')
+        self.assertEqual(duplicate.status_code, 400)
+        replay = await self.post('async-user-list-create', data, 'user-2')
+        self.assertEqual(replay.status_code, 400)
+        self.assertEqual(replay[REPLAYED_HEADER], 'true')
+        self.assertEqual((await self.post('async-user-list-create', data, ' ')).status_code, 400)
+        self.assertEqual(await User.objects.filter(email='dup@example.com').acount(), 1)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'SQLite в памяти не выдерживает одновременной записи из потоков')
+class ConcurrentIdempotencyTests(TransactionTestCase):
+    """
+    Одновременные запросы с одним ключом создают один объект и получают один ответ
+    """
+
+    def test_concurrent_duplicates(self):
+        user = User.objects.create(name='Клиент', email='client@example.com', age=30)
+        data = {'title': 'Одновременный заказ', 'description': 'Описание одновременного заказа', 'user': user.id}
+        barrier = threading.Barrier(4)
+        responses = []
+
+        def post():
+            try:
+                barrier.wait()
+                responses.append(self.client_class().post(
+                    reverse('order-list-create'), data, content_type='application/json',
+                    HTTP_IDEMPOTENCY_KEY='concurrent',
+                ))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=post) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([response.status_code for response in responses], [201] * 4)
+        self.assertEqual(len({response.json()['data']['id'] for response in responses}), 1)
+        self.assertEqual(sum(1 for response in responses if response.has_header(REPLAYED_HEADER)), 3)
+        self.assertEqual(Order.objects.filter(title='Одновременный заказ').count(), 1)
@@ -0,0 +1,18 @@
+"""
+Фильтры и сортировки списка задач.
+"""
+
+from t3codescommanders.filters import ChoiceFilter, ListFilterSet, Ordering
+from .models import Job
+
+
+class JobFilterSet(ListFilterSet):
+    """
+    Фильтры задач; status обслуживает индекс job_status_idx
+    """
+    filters = {
+        'status': ChoiceFilter('status', [value for value, label in Job.STATUS_CHOICES]),
+    }
+    orderings = {
+        '-id': Ordering(('-id',), ('status',)),
+    }
@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from jobs.worker import Worker
+
+
+def run_threads(threads, poll_interval, burst):
+    """
+    Запустить threads воркеров в текущем процессе; SIGTERM/SIGINT завершают их после текущих задач
+    """
+    prefix = f'{socket.gethostname()}:{os.getpid()}'
+    if burst:
+        if threads == 1:
+            # Без отдельного потока: тот же процесс и соединение, что у вызывающего
+            return Worker(f'{prefix}:0', poll_interval).run_burst()
+        workers = [Worker(f'{prefix}:{index}', poll_interval) for index in range(threads)]
+        pool = [threading.Thread(target=_run_burst_thread, args=(worker,)) for worker in workers]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        return sum(worker.processed for worker in workers)
+
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        stop.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    workers = [Worker(f'{prefix}:{index}', poll_interval) for index in range(threads)]
+    pool = [threading.Thread(target=worker.run, args=(stop,), name=worker.name) for worker in workers]
+    for thread in pool:
+        thread.start()
+    # join с таймаутом, чтобы главный поток оставался доступен для сигналов
+    while any(thread.is_alive() for thread in pool):
+        for thread in pool:
+            thread.join(0.5)
+    return sum(worker.processed for worker in workers)
+
+
+def _run_burst_thread(worker):
+    try:
+        worker.run_burst()
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    """Django command to run background job workers"""
+
+    help = 'Запуск воркеров очереди задач: --processes процессов по --threads потоков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Число процессов')
+        parser.add_argument('--threads', type=int, default=1, help='Число потоков в каждом процессе')
+        parser.add_argument('--poll-interval', type=float, default=None, help='Пауза при пустой очереди, секунд (JOB_POLL_INTERVAL)')
+        parser.add_argument('--burst', action='store_true', help='Выполнить готовые задачи и завершиться')
+
+    def handle(self, *args, **options):
+        processes, threads = options['processes'], options['threads']
+        if processes < 1 or threads < 1:
+            raise CommandError('--processes и --threads должны быть положительными')
+        poll_interval, burst = options['poll_interval'], options['burst']
+
+        if processes == 1:
+            processed = run_threads(threads, poll_interval, burst)
+            self.stdout.write(self.style.SUCCESS(f'Воркеры остановлены, выполнено задач: {processed}'))
+            return
+
+        # Дочерние процессы не должны унаследовать открытые соединения с БД
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        children = [
+            context.Process(target=run_threads, args=(threads, poll_interval, burst), name=f'jobs-worker-{index}')
+            for index in range(processes)
+        ]
+        for child in children:
+            child.start()
+
+        def forward(signum, frame):
+            for child in children:
+                if child.is_alive():
+                    os.kill(child.pid, signal.SIGTERM)
+
+        signal.signal(signal.SIGTERM, forward)
+        signal.signal(signal.SIGINT, forward)
+        for child in children:
+            child.join()
+        self.stdout.write(self.style.SUCCESS(f'Остановлено процессов воркеров: {len(children)}'))
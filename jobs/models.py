@@ -0,0 +1,76 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    Фоновая задача: имя обработчика из jobs.registry, аргументы и состояние выполнения
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (SUCCEEDED, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    ]
+    ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+    name = models.CharField(max_length=100, verbose_name="Задача")
+    payload = models.JSONField(default=dict, verbose_name="Аргументы")
+    # Ключ не дает поставить вторую активную задачу для того же объекта
+    key = models.CharField(max_length=200, null=True, blank=True, verbose_name="Ключ")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, verbose_name="Статус")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Попыток")
+    max_attempts = models.PositiveIntegerField(default=5, verbose_name="Максимум попыток")
+    run_at = models.DateTimeField(default=timezone.now, verbose_name="Выполнить после")
+    locked_by = models.CharField(max_length=100, blank=True, default='', verbose_name="Воркер")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="Взята воркером")
+    progress = models.JSONField(default=dict, verbose_name="Прогресс")
+    result = models.JSONField(null=True, blank=True, verbose_name="Результат")
+    last_error = models.TextField(blank=True, default='', verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Дата завершения")
+
+    class Meta:
+        verbose_name = "Задача"
+        verbose_name_plural = "Задачи"
+        ordering = ['-id']
+        indexes = [
+            # Выборка следующей задачи воркером
+            models.Index(fields=['run_at', 'id'], condition=models.Q(status='queued'), name='job_queued_idx'),
+            # Поиск задач умерших воркеров
+            models.Index(fields=['locked_at'], condition=models.Q(status='running'), name='job_running_idx'),
+            # Список /api/jobs/?status=
+            models.Index(fields=['status', '-id'], name='job_status_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'], condition=models.Q(status__in=['queued', 'running']),
+                name='job_active_key_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status})"
+
+    def report_progress(self, **progress):
+        """
+        Сохранить прогресс выполняющейся задачи; заодно продлевает аренду воркера.
+
+        Если аренда истекла и задачу взял другой воркер, ничего не меняется
+        (возвращает False): прогресс и аренда принадлежат новой попытке.
+        """
+        now = timezone.now()
+        self.progress = progress
+        self.locked_at = now
+        return bool(self.owned().update(progress=progress, locked_at=now, updated_at=now))
+
+    def owned(self):
+        """
+        QuerySet из этой задачи, пока ее выполняет та же попытка того же воркера
+        """
+        return Job.objects.filter(id=self.id, locked_by=self.locked_by, attempts=self.attempts)
@@ -0,0 +1,64 @@
+"""
+Реестр обработчиков фоновых задач и постановка задач в очередь.
+
+Обработчик регистрируется в модуле tasks.py приложения:
+
+    @task('delete_user')
+    def delete_user_task(job, user_id):
+        ...
+
+и вызывается воркером как handler(job, **job.payload). Задача может
+выполниться повторно (ошибка, перезапуск воркера), поэтому обработчики
+должны быть идемпотентными.
+"""
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .models import Job
+
+_tasks = {}
+
+
+def task(name):
+    """
+    Декоратор, регистрирующий обработчик задачи под именем name
+    """
+    def register(func):
+        if name in _tasks and _tasks[name] is not func:
+            raise ValueError(f'Задача {name} уже зарегистрирована')
+        _tasks[name] = func
+        return func
+    return register
+
+
+def get_task(name):
+    return _tasks.get(name)
+
+
+def enqueue(name, payload=None, key=None, max_attempts=None, run_at=None):
+    """
+    Поставить задачу в очередь; возвращает (задача, создана ли она).
+
+    Если key задан и активная задача с этим ключом уже есть, возвращается
+    она, а новая не создается.
+    """
+    if name not in _tasks:
+        raise ValueError(f'Неизвестная задача: {name}')
+    fields = {
+        'name': name, 'payload': payload or {}, 'key': key,
+        'max_attempts': max_attempts or settings.JOB_MAX_ATTEMPTS,
+    }
+    if run_at is not None:
+        fields['run_at'] = run_at
+    if key is None:
+        return Job.objects.create(**fields), True
+    try:
+        with transaction.atomic():
+            return Job.objects.create(**fields), True
+    except IntegrityError:
+        existing = Job.objects.filter(key=key, status__in=Job.ACTIVE_STATUSES).first()
+        if existing is None:
+            # Активная задача успела завершиться между INSERT и SELECT
+            return Job.objects.create(**fields), True
+        return existing, False
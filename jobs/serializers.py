@@ -0,0 +1,15 @@
+from rest_framework import serializers
+from .models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор для модели Job (только чтение)
+    """
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'name', 'payload', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by',
+            'progress', 'result', 'last_error', 'created_at', 'updated_at', 'finished_at',
+        ]
+        read_only_fields = fields
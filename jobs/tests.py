@@ -0,0 +1,143 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from t3codescommanders.testing import QueryBudgetTestMixin
+from .models import Job
+from .registry import enqueue, task
+from .worker import Worker, requeue_stale
+
+calls = []
+
+
+@task('tests.echo')
+def echo(job, value):
+    calls.append(value)
+    job.report_progress(done=1)
+    return {'value': value}
+
+
+@task('tests.broken')
+def broken(job):
+    raise RuntimeError('сбой задачи')
+
+
+class WorkerTests(TestCase):
+    """
+    Воркер выполняет задачи, повторяет упавшие и возвращает задачи умерших воркеров
+    """
+
+    def setUp(self):
+        calls.clear()
+        self.worker = Worker('test', poll_interval=0)
+
+    def test_run(self):
+        job, created = enqueue('tests.echo', {'value': 42})
+        self.assertTrue(created)
+        enqueue('tests.echo', {'value': 43}, run_at=timezone.now() + timedelta(hours=1))
+
+        self.assertEqual(self.worker.run_burst(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.result, {'value': 42})
+        self.assertEqual(job.progress, {'done': 1})
+        self.assertIsNotNone(job.finished_at)
+        # Отложенная задача не выполняется раньше run_at
+        self.assertEqual(calls, [42])
+
+    @override_settings(JOB_RETRY_BASE_DELAY=60)
+    def test_retry_then_fail(self):
+        job, _ = enqueue('tests.broken', max_attempts=2)
+        with self.assertLogs('jobs.worker', 'WARNING'):
+            self.worker.run_burst()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('сбой задачи', job.last_error)
+        self.assertGreaterEqual(job.run_at, timezone.now() + timedelta(seconds=29))
+
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        with self.assertLogs('jobs.worker', 'ERROR'):
+            self.worker.run_burst()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    @override_settings(JOB_LEASE_TIMEOUT=60)
+    def test_requeue_stale(self):
+        job, _ = enqueue('tests.echo', {'value': 1})
+        claimed = self.worker.claim()
+        self.assertEqual(claimed.id, job.id)
+        self.assertIsNone(self.worker.claim())
+
+        Job.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(seconds=61))
+        self.assertEqual(requeue_stale(), 1)
+        self.worker.run_burst()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.attempts, 2)
+
+    @override_settings(JOB_LEASE_TIMEOUT=60)
+    def test_stale_attempt_dropped(self):
+        other = Worker('other', poll_interval=0)
+        for name, payload, final in (('tests.echo', {'value': 1}, Job.SUCCEEDED), ('tests.broken', {}, Job.FAILED)):
+            with self.subTest(task=name):
+                job, _ = enqueue(name, payload, max_attempts=3)
+                stale_worker, stale = self.worker, self.worker.claim()
+                # Аренда истекла, и задачу взяла новая попытка этого же или другого воркера
+                for worker in (self.worker, other):
+                    Job.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(seconds=61))
+                    requeue_stale()
+                    current = worker.claim()
+                    with self.assertLogs('jobs.worker', 'WARNING') as logs:
+                        stale_worker.execute(stale)
+                    self.assertIn('lost its lease', logs.output[-1])
+                    job.refresh_from_db()
+                    self.assertEqual((job.status, job.locked_by, job.attempts), (Job.RUNNING, worker.name, current.attempts))
+                    # Прогресс запоздавшей попытки не продлевает аренду новой
+                    self.assertEqual((job.progress, job.locked_at), ({}, current.locked_at))
+                    stale_worker, stale = worker, current
+
+                with self.assertLogs('jobs.worker', 'INFO'):
+                    stale_worker.execute(stale)
+                job.refresh_from_db()
+                self.assertEqual((job.status, job.locked_by), (final, ''))
+
+    def test_key_dedupe(self):
+        first, created = enqueue('tests.echo', {'value': 1}, key='echo:1')
+        second, created_again = enqueue('tests.echo', {'value': 1}, key='echo:1')
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(first.id, second.id)
+
+        # После завершения ключ освобождается
+        self.worker.run_burst()
+        third, created = enqueue('tests.echo', {'value': 1}, key='echo:1')
+        self.assertTrue(created)
+        self.assertNotEqual(third.id, first.id)
+
+
+class JobViewTests(QueryBudgetTestMixin, TestCase):
+    """
+    Статус задач в /api/jobs/
+    """
+
+    def test_list_and_detail(self):
+        queued, _ = enqueue('tests.echo', {'value': 1})
+        done, _ = enqueue('tests.echo', {'value': 2})
+        Job.objects.filter(id=done.id).update(status=Job.SUCCEEDED)
+
+        response = self.client.get(reverse('job-list'), {'status': 'queued'})
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+        self.assertEqual([job['id'] for job in response.json()['data']], [queued.id])
+
+        response = self.client.get(reverse('job-detail', args=[done.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+        self.assertEqual(response.json()['data']['status'], 'succeeded')
+
+        self.assertEqual(self.client.get(reverse('job-list'), {'status': 'lost'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('job-detail', args=[0])).status_code, 404)
@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import JobListView, JobDetailView
+
+urlpatterns = [
+    path('jobs/', JobListView.as_view(), name='job-list'),
+    path('jobs/<int:job_id>/', JobDetailView.as_view(), name='job-detail'),
+]
@@ -0,0 +1,63 @@
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from t3codescommanders.exceptions import InvalidQueryParameter
+from t3codescommanders.pagination import KeysetPagination
+from .filters import JobFilterSet
+from .models import Job
+from .serializers import JobSerializer
+
+
+class JobListView(APIView):
+    """
+    Представление списка фоновых задач
+    """
+    pagination_class = KeysetPagination
+
+    def get(self, request):
+        """
+        Получить страницу задач, новые первыми; ?status= фильтрует по статусу
+        """
+        try:
+            filterset = JobFilterSet(request.query_params)
+            paginator = self.pagination_class(ordering=filterset.ordering_fields)
+            jobs = paginator.paginate_queryset(filterset.filter_queryset(Job.objects.all()), request, view=self)
+            return paginator.get_paginated_response(JobSerializer(jobs, many=True).data)
+        except InvalidQueryParameter as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': f'Ошибка при получении списка задач: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class JobDetailView(APIView):
+    """
+    Представление состояния фоновой задачи
+    """
+
+    def get(self, request, job_id):
+        """
+        Получить статус, прогресс и результат задачи
+        """
+        try:
+            job = Job.objects.get(id=job_id)
+            return Response({
+                'status': 'success',
+                'data': JobSerializer(job).data
+            })
+        except Job.DoesNotExist:
+            return Response({
+                'status': 'error',
+                'message': 'Задача не найдена'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': f'Ошибка при получении задачи: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,170 @@
+"""
+Воркер очереди задач.
+
+Задача выбирается запросом SELECT ... FOR UPDATE SKIP LOCKED по частичному
+индексу job_queued_idx, поэтому параллельные воркеры не ждут друг друга и
+не берут одну задачу дважды, а переводится в running условным UPDATE
+(на SQLite, где FOR UPDATE нет, повторный захват исключает он один).
+Обработчик выполняется вне транзакции выборки. После ошибки задача
+возвращается в очередь с экспоненциальной задержкой, пока не исчерпаны
+попытки. Задачи воркеров, не продлевавших аренду дольше JOB_LEASE_TIMEOUT
+(процесс убит), возвращаются в очередь; итог такой попытки, если она все же
+завершится, отбрасывается.
+"""
+
+import logging
+import random
+import time
+import traceback
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+from .registry import get_task
+
+logger = logging.getLogger(__name__)
+
+# Длина сохраняемого traceback ошибки
+MAX_ERROR_LENGTH = 10000
+
+
+def retry_delay(attempts):
+    """
+    Задержка перед попыткой attempts + 1: экспонента от JOB_RETRY_BASE_DELAY с разбросом
+    """
+    delay = min(settings.JOB_RETRY_MAX_DELAY, settings.JOB_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def requeue_stale():
+    """
+    Вернуть в очередь задачи с истекшей арендой; возвращает их число
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - timedelta(seconds=settings.JOB_LEASE_TIMEOUT))
+    error = 'Воркер не продлил аренду задачи (процесс остановлен?)'
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, last_error=error, locked_by='', locked_at=None, finished_at=now, updated_at=now,
+    )
+    requeued = stale.update(
+        status=Job.QUEUED, last_error=error, locked_by='', locked_at=None, run_at=now, updated_at=now,
+    )
+    return failed + requeued
+
+
+class Worker:
+    """
+    Выборка и выполнение задач в текущем потоке
+    """
+
+    def __init__(self, name, poll_interval=None):
+        self.name = name
+        self.poll_interval = settings.JOB_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.processed = 0
+
+    def claim(self):
+        """
+        Взять следующую готовую задачу или None
+        """
+        now = timezone.now()
+        ready = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by('run_at', 'id')
+        locking = connections[ready.db].features.has_select_for_update_skip_locked
+        # Без SKIP LOCKED (SQLite) выборка идет вне транзакции: чтение с последующей
+        # записью в одной транзакции SQLite приводит к "database is locked"
+        with transaction.atomic() if locking else nullcontext():
+            job = (ready.select_for_update(skip_locked=True) if locking else ready).first()
+            if job is None:
+                return None
+            claimed = Job.objects.filter(id=job.id, status=Job.QUEUED).update(
+                status=Job.RUNNING, attempts=F('attempts') + 1,
+                locked_by=self.name, locked_at=now, updated_at=now,
+            )
+        if not claimed:
+            return None
+        job.status = Job.RUNNING
+        job.attempts += 1
+        job.locked_by = self.name
+        job.locked_at = now
+        return job
+
+    def execute(self, job):
+        """
+        Выполнить задачу и сохранить результат, повтор или ошибку
+        """
+        handler = get_task(job.name)
+        started = time.monotonic()
+        try:
+            if handler is None:
+                raise LookupError(f'Неизвестная задача: {job.name}')
+            result = handler(job, **job.payload)
+        except Exception:
+            error = traceback.format_exc()[-MAX_ERROR_LENGTH:]
+            now = timezone.now()
+            if handler is None or job.attempts >= job.max_attempts:
+                if self.finish(job, status=Job.FAILED, last_error=error, finished_at=now, updated_at=now):
+                    logger.error('Job %s (%s) failed after %d attempts', job.id, job.name, job.attempts)
+            else:
+                run_at = now + timedelta(seconds=retry_delay(job.attempts))
+                if self.finish(job, status=Job.QUEUED, last_error=error, run_at=run_at, updated_at=now):
+                    logger.warning('Job %s (%s) failed, retry at %s', job.id, job.name, run_at.isoformat())
+        else:
+            now = timezone.now()
+            if self.finish(job, status=Job.SUCCEEDED, result=result, finished_at=now, updated_at=now):
+                logger.info('Job %s (%s) succeeded in %.3f s', job.id, job.name, time.monotonic() - started)
+        self.processed += 1
+
+    def finish(self, job, **fields):
+        """
+        Сохранить итог попытки и снять аренду; возвращает, сохранен ли итог.
+
+        Итог сохраняется, только пока задачу держит эта попытка этого
+        воркера: после истечения аренды задачу мог взять другой воркер, и
+        запоздавший итог перезаписал бы его статус, результат и аренду.
+        """
+        updated = job.owned().update(locked_by='', locked_at=None, **fields)
+        if not updated:
+            logger.warning(
+                'Job %s (%s) attempt %d lost its lease, %s result dropped',
+                job.id, job.name, job.attempts, fields['status'],
+            )
+            return False
+        job.status = fields['status']
+        return True
+
+    def run_burst(self):
+        """
+        Выполнять задачи, пока в очереди есть готовые; возвращает число выполненных
+        """
+        while True:
+            job = self.claim()
+            if job is None:
+                return self.processed
+            self.execute(job)
+
+    def run(self, stop):
+        """
+        Цикл воркера до установки события stop; текущая задача доводится до конца
+        """
+        next_requeue = 0.0
+        while not stop.is_set():
+            # Как между HTTP-запросами: закрыть устаревшие и сломанные соединения
+            close_old_connections()
+            try:
+                if time.monotonic() >= next_requeue:
+                    requeue_stale()
+                    next_requeue = time.monotonic() + settings.JOB_LEASE_TIMEOUT / 10
+                job = self.claim()
+                if job is not None:
+                    self.execute(job)
+            except DatabaseError:
+                # Задача, состояние которой не удалось сохранить, вернется по истечении аренды
+                logger.exception('Worker %s lost the database', self.name)
+                job = None
+            if job is None:
+                stop.wait(self.poll_interval)
+        connections.close_all()
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Order
+from .search import is_supported, search_filter
 
 
 @admin.register(Order)
@@ -21,4 +22,13 @@ class OrderAdmin(admin.ModelAdmin):
     )
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('user') 
\ No newline at end of file
+        return super().get_queryset(request).select_related('user')
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        На PostgreSQL поиск идет по тем же индексам, что и /api/orders/search/
+        """
+        search_term = search_term.strip()
+        if not search_term or not is_supported():
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(search_filter(search_term)), False
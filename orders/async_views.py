@@ -0,0 +1,214 @@
+"""
+Асинхронные представления заказов для запуска под ASGI-сервером.
+
+Повторяют контракт orders.views: тот же конверт ответа, ?expand= и ?fields=,
+курсорная пагинация, ETag и Last-Modified.
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
+from rest_framework import serializers, status
+
+from idempotency.keys import aidempotent
+from t3codescommanders.async_api import AsyncAPIView, InvalidJSONBody
+from t3codescommanders.cache import response_cache
+from t3codescommanders.conditional import (
+    apage_not_modified_response, not_modified_response, page_validators,
+    representation_validators, set_validators,
+)
+from t3codescommanders.exceptions import InvalidQueryParameter
+from t3codescommanders.pagination import KeysetPagination
+from t3codescommanders.serializers import get_row_serializer, prune_fields
+from users.async_views import acached_user_data
+from users.models import User
+from users.serializers import UserSerializer
+from .filters import OrderFilterSet
+from .models import Order
+from .serializers import OrderBulkItemSerializer, OrderSerializer
+from .views import order_queryset, order_version_fields, parse_expand, parse_order_fields
+
+
+async def aorder_detail_data(order_id, expand):
+    """
+    Асинхронный вариант orders.views.order_detail_data
+    """
+    loaded = {}
+
+    async def build():
+        order = await order_queryset(expand).aget(id=order_id)
+        loaded['order'] = order
+        return OrderSerializer(order, context={'expand': set()}).data
+
+    data = await response_cache.afetch('order', order_id, build)
+    if 'user' not in expand:
+        return data
+
+    if 'order' in loaded:
+        user_data = UserSerializer(loaded['order'].user).data
+    else:
+        user_data = await response_cache.afetch('user', data['user'], lambda: acached_user_data(data['user']))
+
+    result = {}
+    for name, value in data.items():
+        result[name] = value
+        if name == 'user':
+            result['user_detail'] = user_data
+    return result
+
+
+class AsyncOrderPageMixin:
+    """
+    Общая выдача страницы заказов для async-представлений
+    """
+    pagination_class = KeysetPagination
+
+    async def render_page(self, request, queryset, expand, fields):
+        """
+        Ответ со страницей заказов и признак того, что страница не пуста
+        """
+        filterset = OrderFilterSet(request.GET)
+        version_fields = order_version_fields(expand)
+        rows = get_row_serializer(OrderSerializer, expand, fields)
+        queryset = rows.values(filterset.filter_queryset(queryset), *version_fields, *filterset.ordering_fields)
+        not_modified = await apage_not_modified_response(
+            request, self.pagination_class, queryset, version_fields,
+            ordering=filterset.ordering_fields,
+        )
+        if not_modified is not None:
+            return not_modified, True
+
+        paginator = self.pagination_class(ordering=filterset.ordering_fields)
+        orders = await paginator.apaginate_queryset(queryset, request, view=self)
+        etag, last_modified = page_validators(
+            request, orders, version_fields, paginator.next_position is not None
+        )
+        response = set_validators(
+            self.render(paginator.get_paginated_data(rows.serialize(orders))), etag, last_modified
+        )
+        return response, bool(orders)
+
+
+class AsyncOrderListCreateView(AsyncOrderPageMixin, AsyncAPIView):
+    """
+    Асинхронное представление для создания и получения списка заказов
+    """
+
+    async def get(self, request):
+        """
+        Получить страницу списка заказов
+        """
+        try:
+            fields, expand = parse_order_fields(request, parse_expand(request))
+            response, _ = await self.render_page(request, order_queryset(expand), expand, fields)
+            return response
+        except InvalidQueryParameter as e:
+            return self.error(str(e), status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return self.error(
+                f'Ошибка при получении заказов: {str(e)}',
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    @aidempotent
+    async def post(self, request):
+        """
+        Создать новый заказ.
+
+        Существование пользователя проверяет внешний ключ: вместо запроса
+        перед вставкой обрабатывается IntegrityError. Пользователь для
+        user_detail загружается после вставки, уже с обновленными счетчиками.
+        """
+        try:
+            payload = self.parse_json(request)
+            if not payload.get('user'):
+                return self.error('ID пользователя обязателен', status.HTTP_400_BAD_REQUEST)
+
+            data = OrderBulkItemSerializer().run_validation(payload)
+            order = Order(title=data['title'], description=data['description'], user_id=data['user'])
+            # Model.asave() в Django 4.2 не передает дополнительные аргументы в save()
+            await sync_to_async(order.save)(validate_user=False)
+            order.user = await User.objects.aget(id=order.user_id)
+            return self.render({
+                'status': 'success',
+                'message': 'Заказ успешно создан',
+                'data': OrderSerializer(order).data
+            }, status.HTTP_201_CREATED)
+        except InvalidJSONBody as e:
+            return self.error(str(e), status.HTTP_400_BAD_REQUEST)
+        except serializers.ValidationError as e:
+            return self.error('Ошибка валидации данных', status.HTTP_400_BAD_REQUEST, errors=e.detail)
+        except IntegrityError:
+            # Внешний ключ отложенный: нарушение выбрасывается при коммите транзакции save()
+            return self.error('Пользователь с указанным ID не существует', status.HTTP_400_BAD_REQUEST)
+        except ValidationError as e:
+            return self.error(
+                'Ошибка валидации данных', status.HTTP_400_BAD_REQUEST,
+                errors=e.message_dict if hasattr(e, 'message_dict') else str(e),
+            )
+        except Exception as e:
+            return self.error(
+                f'Ошибка при создании заказа: {str(e)}',
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class AsyncOrderDetailView(AsyncAPIView):
+    """
+    Асинхронное представление для получения заказа
+    """
+
+    async def get(self, request, order_id):
+        """
+        Получить информацию о заказе по ID
+        """
+        try:
+            fields, expand = parse_order_fields(request, parse_expand(request))
+            data = await aorder_detail_data(order_id, expand)
+            etag, last_modified = representation_validators('order', data)
+            not_modified = not_modified_response(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+            return set_validators(self.render({
+                'status': 'success',
+                'data': prune_fields(data, fields)
+            }), etag, last_modified)
+        except InvalidQueryParameter as e:
+            return self.error(str(e), status.HTTP_400_BAD_REQUEST)
+        except Order.DoesNotExist:
+            return self.error('Заказ не найден', status.HTTP_404_NOT_FOUND)
+        except User.DoesNotExist:
+            return self.error('Заказ не найден', status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return self.error(
+                f'Ошибка при получении заказа: {str(e)}',
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class AsyncUserOrdersView(AsyncOrderPageMixin, AsyncAPIView):
+    """
+    Асинхронное представление для получения заказов пользователя
+    """
+
+    async def get(self, request, user_id):
+        """
+        Получить страницу заказов пользователя.
+
+        Существование пользователя проверяется только для пустой страницы:
+        непустая страница уже доказывает, что пользователь есть.
+        """
+        try:
+            fields, expand = parse_order_fields(request, parse_expand(request))
+            queryset = order_queryset(expand).filter(user_id=user_id)
+            response, found = await self.render_page(request, queryset, expand, fields)
+            if not found and not await User.objects.filter(id=user_id).aexists():
+                return self.error('Пользователь не найден', status.HTTP_404_NOT_FOUND)
+            return response
+        except InvalidQueryParameter as e:
+            return self.error(str(e), status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return self.error(
+                f'Ошибка при получении заказов пользователя: {str(e)}',
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
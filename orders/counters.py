@@ -0,0 +1,149 @@
+"""
+Денормализованные счетчики заказов пользователя: order_count и last_order_at.
+
+Счетчики меняются одним UPDATE на событие через F()-выражения, поэтому
+параллельные запросы не теряют инкременты. Добавление заказа сдвигает
+last_order_at вперед без чтения таблицы заказов, а после удаления или
+переноса заказа дата пересчитывается подзапросом по индексу
+order_user_created_idx. Вместе со счетчиками обновляется updated_at, чтобы
+ETag, Last-Modified и фильтр updated_since видели изменение.
+
+На PostgreSQL добавление заказов без удалений применяется одним
+UPDATE ... FROM (VALUES ...): ORM-выражение Case с When на каждого
+пользователя компилируется дольше, чем выполняется запрос, и на пачке
+из 1000 пользователей занимает около половины времени массового создания.
+"""
+
+from django.db import connection, transaction
+from django.db.models import (
+    Case, Count, F, IntegerField, Max, OuterRef, Q, Subquery, Value, When,
+)
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from t3codescommanders.cache import response_cache
+from users.models import User
+from .models import Order
+
+
+def latest_order_subquery():
+    return Subquery(
+        Order.objects.filter(user_id=OuterRef('pk')).order_by('-created_at').values('created_at')[:1]
+    )
+
+
+def update_counters(added=(), removed=()):
+    """
+    Применить изменения счетчиков одним запросом.
+
+    added - заказы, созданные у пользователя или перенесенные к нему,
+    removed - user_id заказов, удаленных или перенесенных от пользователя
+    (по одному элементу на заказ).
+    """
+    deltas = {}
+    latest = {}
+    for order in added:
+        deltas[order.user_id] = deltas.get(order.user_id, 0) + 1
+        if order.user_id not in latest or latest[order.user_id] < order.created_at:
+            latest[order.user_id] = order.created_at
+    for user_id in removed:
+        deltas[user_id] = deltas.get(user_id, 0) - 1
+    removed = set(removed)
+    if not deltas:
+        return
+
+    if not removed and connection.vendor == 'postgresql':
+        _add_counters_postgresql(deltas, latest, timezone.now())
+        for user_id in deltas:
+            response_cache.invalidate_on_commit('user', user_id)
+        return
+
+    count = F('order_count') + Case(
+        *[When(id=user_id, then=Value(delta)) for user_id, delta in deltas.items()],
+        default=Value(0), output_field=IntegerField(),
+    )
+    last_order_at = Case(
+        *[When(id=user_id, then=latest_order_subquery()) for user_id in removed],
+        *[
+            When(id=user_id, then=Greatest(Coalesce('last_order_at', Value(created_at)), Value(created_at)))
+            for user_id, created_at in latest.items() if user_id not in removed
+        ],
+        default=F('last_order_at'),
+    )
+    User.objects.filter(id__in=deltas).update(
+        # Ноль снизу защищает от рассинхронизации до recompute_user_counters
+        order_count=Greatest(count, Value(0)),
+        last_order_at=last_order_at,
+        updated_at=timezone.now(),
+    )
+    for user_id in deltas:
+        response_cache.invalidate_on_commit('user', user_id)
+
+
+def _add_counters_postgresql(deltas, latest, now):
+    """
+    Прибавить заказы к счетчикам одним UPDATE с таблицей VALUES (id, прирост, дата последнего)
+    """
+    table = User._meta.db_table
+    rows = ', '.join(['(%s, %s, %s::timestamptz)'] * len(deltas))
+    params = [value for user_id, delta in deltas.items() for value in (user_id, delta, latest[user_id])]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE "{table}" AS u SET '
+            f'order_count = GREATEST(u.order_count + d.delta, 0), '
+            f'last_order_at = GREATEST(u.last_order_at, d.latest), '
+            f'updated_at = %s '
+            f'FROM (VALUES {rows}) AS d(id, delta, latest) WHERE u.id = d.id',
+            [now, *params],
+        )
+
+
+def recompute_counters(user_ids):
+    """
+    Пересчитать счетчики пользователей user_ids по таблице заказов.
+
+    Обновляются только разошедшиеся строки; возвращает их id.
+    """
+    orders = Order.objects.filter(user_id=OuterRef('pk')).order_by().values('user_id')
+    actual_count = Coalesce(Subquery(orders.annotate(count=Count('id')).values('count')), Value(0))
+    actual_last = Subquery(orders.annotate(last=Max('created_at')).values('last'))
+
+    drifted = list(
+        User.objects.filter(id__in=user_ids)
+        .annotate(actual_count=actual_count, actual_last=actual_last)
+        .exclude(
+            Q(order_count=F('actual_count'))
+            & (Q(last_order_at=F('actual_last')) | Q(last_order_at__isnull=True, actual_last__isnull=True))
+        )
+        .order_by()
+        .values_list('id', flat=True)
+    )
+    if drifted:
+        User.objects.filter(id__in=drifted).update(
+            order_count=actual_count,
+            last_order_at=actual_last,
+            updated_at=timezone.now(),
+        )
+        for user_id in drifted:
+            response_cache.invalidate_on_commit('user', user_id)
+    return drifted
+
+
+def recompute_batches(batch_size):
+    """
+    Пересчитать счетчики всех пользователей порциями по id без OFFSET.
+
+    Каждая порция фиксируется отдельной транзакцией; для каждой
+    выдается (id пользователей порции, id исправленных).
+    """
+    last_id = 0
+    while True:
+        user_ids = list(
+            User.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not user_ids:
+            return
+        with transaction.atomic():
+            drifted = recompute_counters(user_ids)
+        yield user_ids, drifted
+        last_id = user_ids[-1]
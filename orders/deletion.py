@@ -0,0 +1,99 @@
+"""
+Удаление пользователя вместе с заказами без каскада Django.
+
+user.delete() с on_delete=CASCADE загружает в память все заказы
+пользователя (на Order подключены сигналы, поэтому быстрое удаление
+невозможно) и удаляет их в одной транзакции запроса. Здесь заказы
+удаляются порциями по индексу order_user_created_idx одним DELETE на
+порцию: в памяти только id порции, блокировки держатся одну порцию, а
+order_count уменьшается по мере удаления, поэтому ход удаления виден в
+GET /api/users/{id}/. Сам пользователь удаляется последним.
+
+Пользователи с большим числом заказов удаляются задачей delete_user
+очереди jobs (ответ 202, см. orders.tasks); прерванное удаление
+продолжается повтором задачи, повторным DELETE или командой delete_user.
+"""
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from t3codescommanders.cache import response_cache
+from users.models import User
+from .models import Order
+
+
+def delete_by_ids(model, ids):
+    """
+    Удалить строки model по списку id одним DELETE; возвращает число удаленных.
+
+    QuerySet.delete() для Order (сигналы) и User (связь с заказами) сначала
+    загружает объекты в память, а QuerySet._raw_delete() - закрытый API
+    Django, поэтому запрос составляется здесь.
+    """
+    if not ids:
+        return 0
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} WHERE {quote(model._meta.pk.column)} IN ({placeholders})',
+            list(ids),
+        )
+        return cursor.rowcount
+
+
+def delete_order_batch(user_id, batch_size):
+    """
+    Удалить порцию заказов пользователя, а если она последняя - и пользователя.
+
+    Возвращает (число удаленных заказов, удален ли пользователь).
+    Строка пользователя блокируется на время порции, поэтому заказы для
+    него не создаются между выборкой последней порции и удалением.
+    """
+    with transaction.atomic(savepoint=False):
+        if not User.objects.select_for_update().filter(id=user_id).exists():
+            return 0, True
+        # Порядок порции не важен: без ORDER BY PostgreSQL не сортирует заказы
+        # пользователя по всем секциям, а берет первые batch_size из индекса
+        ids = list(Order.objects.filter(user_id=user_id).order_by().values_list('id', flat=True)[:batch_size])
+        # Удаление одним запросом без загрузки объектов и сигналов post_delete;
+        # кэш и счетчики обновляются ниже для всей порции
+        deleted = delete_by_ids(Order, ids)
+        for order_id in ids:
+            response_cache.invalidate_on_commit('order', order_id)
+        response_cache.invalidate_on_commit('user', user_id)
+
+        finished = len(ids) < batch_size
+        if finished:
+            # Других связей у пользователя нет, каскад Django не нужен
+            delete_by_ids(User, [user_id])
+        else:
+            User.objects.filter(id=user_id).update(
+                order_count=Greatest(F('order_count') - Value(deleted), Value(0)),
+                updated_at=timezone.now(),
+            )
+    return deleted, finished
+
+
+def delete_user(user_id, batch_size=None, progress=None):
+    """
+    Удалить заказы пользователя порциями, затем самого пользователя.
+
+    Каждая порция фиксируется отдельной транзакцией; progress(deleted),
+    если передан, вызывается после каждой порции с числом удаленных
+    заказов. Возвращает общее число удаленных заказов.
+    """
+    batch_size = batch_size or settings.USER_DELETE_BATCH_SIZE
+    total = 0
+    finished = False
+    while not finished:
+        deleted, finished = delete_order_batch(user_id, batch_size)
+        total += deleted
+        if progress is not None and deleted:
+            progress(total)
+    return total
+
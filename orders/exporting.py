@@ -0,0 +1,164 @@
+"""
+Потоковая выгрузка заказов в NDJSON и CSV.
+
+Строки читаются через QuerySet.iterator() (под ASGI - aiterator()), что на
+PostgreSQL означает серверный курсор: в памяти одновременно находится не
+больше одной порции ORDER_EXPORT_CHUNK_SIZE строк, а первые байты ответа
+уходят сразу.
+"""
+
+import csv
+import io
+import json
+
+from django.conf import settings
+from rest_framework.fields import DateTimeField
+from rest_framework.renderers import BaseRenderer
+
+from .filters import OrderFilterSet
+from .models import Order
+
+EXPORT_FIELDS = ['id', 'title', 'description', 'user', 'user_name', 'user_email', 'created_at', 'updated_at']
+
+# Поля выборки в порядке EXPORT_FIELDS
+QUERY_FIELDS = ['id', 'title', 'description', 'user_id', 'user__name', 'user__email', 'created_at', 'updated_at']
+
+DATETIME_FIELDS = ('created_at', 'updated_at')
+DATETIME_POSITIONS = [EXPORT_FIELDS.index(name) for name in DATETIME_FIELDS]
+DATETIME_FIELD = DateTimeField()
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Рендерер NDJSON; ответы с ошибками выдаются одной JSON-строкой
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return (json.dumps(data, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Рендерер CSV; ответы с ошибками выдаются как строка ключей и строка значений
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if isinstance(data, dict):
+            writer.writerow(data.keys())
+            writer.writerow(data.values())
+        return buffer.getvalue().encode('utf-8')
+
+
+def export_queryset(params):
+    """
+    Строки выгрузки с учетом фильтров и сортировки OrderFilterSet.
+
+    По умолчанию заказы выгружаются от старых к новым.
+    """
+    filterset = OrderFilterSet(params, default_ordering='created_at')
+    queryset = filterset.filter_queryset(Order.objects.all())
+    return queryset.order_by(*filterset.ordering_fields).values_list(*QUERY_FIELDS)
+
+
+def _row(values):
+    row = list(values)
+    for position in DATETIME_POSITIONS:
+        row[position] = DATETIME_FIELD.to_representation(row[position])
+    return row
+
+
+class _Buffer:
+    """
+    Склейка мелких строк в куски около size символов, чтобы не писать в сокет построчно
+    """
+
+    def __init__(self, size=64 * 1024):
+        self.size = size
+        self.parts = []
+        self.length = 0
+
+    def add(self, line):
+        """
+        Добавить строку; вернуть накопленный кусок, если он набрал size символов
+        """
+        self.parts.append(line)
+        self.length += len(line)
+        if self.length >= self.size:
+            return self.flush()
+        return None
+
+    def flush(self):
+        chunk = ''.join(self.parts)
+        self.parts = []
+        self.length = 0
+        return chunk
+
+
+class _Echo:
+    """
+    Псевдофайл для csv.writer: writerow возвращает готовую строку
+    """
+
+    def write(self, value):
+        return value
+
+
+def ndjson_line(row):
+    return json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + '\n'
+
+
+_csv_writer = csv.writer(_Echo())
+
+# Формат -> (первая строка файла, строка на каждый заказ)
+FORMATS = {
+    'ndjson': (None, ndjson_line),
+    'csv': (_csv_writer.writerow(EXPORT_FIELDS), _csv_writer.writerow),
+}
+
+
+def stream(queryset, file_format):
+    """
+    Итератор кусков файла для StreamingHttpResponse под WSGI
+    """
+    header, line = FORMATS[file_format]
+    buffer = _Buffer()
+    if header:
+        buffer.add(header)
+    for values in queryset.iterator(chunk_size=settings.ORDER_EXPORT_CHUNK_SIZE):
+        chunk = buffer.add(line(_row(values)))
+        if chunk:
+            yield chunk
+    tail = buffer.flush()
+    if tail:
+        yield tail
+
+
+async def astream(queryset, file_format):
+    """
+    Асинхронный итератор кусков файла для StreamingHttpResponse под ASGI.
+
+    Синхронный итератор Django под ASGI сначала читает целиком в память,
+    асинхронный отдается по мере чтения порций через aiterator().
+    """
+    header, line = FORMATS[file_format]
+    buffer = _Buffer()
+    if header:
+        buffer.add(header)
+    # ValuesListIterable в Django 4.2 выполняет запрос при создании итератора,
+    # то есть в цикле событий, поэтому aiterator() читает словари values()
+    rows = queryset.values(*QUERY_FIELDS).aiterator(chunk_size=settings.ORDER_EXPORT_CHUNK_SIZE)
+    async for values in rows:
+        chunk = buffer.add(line(_row(values[name] for name in QUERY_FIELDS)))
+        if chunk:
+            yield chunk
+    tail = buffer.flush()
+    if tail:
+        yield tail
@@ -0,0 +1,32 @@
+"""
+Фильтры и сортировки списков заказов.
+"""
+
+from t3codescommanders.filters import DateTimeFilter, IntegerFilter, ListFilterSet, Ordering
+
+CREATED_FILTERS = ('user', 'created_after', 'created_before')
+UPDATED_FILTERS = ('user', 'updated_since')
+
+
+class OrderFilterSet(ListFilterSet):
+    """
+    Фильтры заказов.
+
+    Сортировки по created_at обслуживают индексы order_created_idx и
+    order_user_created_idx, по updated_at - order_updated_idx и
+    order_user_updated_idx.
+    """
+    filters = {
+        'user': IntegerFilter('user_id', min_value=1),
+        'created_after': DateTimeFilter('created_at__gte'),
+        'created_before': DateTimeFilter('created_at__lt'),
+        'updated_since': DateTimeFilter('updated_at__gte'),
+    }
+    orderings = {
+        '-created_at': Ordering(('-created_at', '-id'), CREATED_FILTERS),
+        'created_at': Ordering(('created_at', 'id'), CREATED_FILTERS),
+        # updated_since без ?ordering= выдает изменения от старых к новым
+        'updated_at': Ordering(('updated_at', 'id'), UPDATED_FILTERS),
+        '-updated_at': Ordering(('-updated_at', '-id'), UPDATED_FILTERS),
+    }
+    default_ordering = '-created_at'
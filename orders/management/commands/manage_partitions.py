@@ -0,0 +1,77 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from orders.partitions import (
+    PartitionError, archivable_partitions, archive_partition, archive_paths, create_future_partitions,
+    incomplete_archives, list_partitions, month_start, parse_month, restore_partition,
+)
+from orders.tasks import schedule_partitions
+
+
+class Command(BaseCommand):
+    """Django command to pre-create, archive and restore monthly partitions of orders"""
+
+    help = (
+        'Секции заказов по месяцам: создание на --ahead месяцев вперед, '
+        'архивирование секций раньше --archive-before и восстановление --restore'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=None, help='Месяцев вперед (ORDER_PARTITIONS_AHEAD)')
+        parser.add_argument('--list', action='store_true', help='Показать секции и выйти')
+        parser.add_argument('--archive-before', metavar='YYYY-MM', help='Архивировать секции, закончившиеся до месяца')
+        parser.add_argument('--restore', metavar='PARTITION', help='Восстановить секцию из архива (имя или путь к .json)')
+        parser.add_argument('--archive-dir', default=None, help='Каталог архивов (ORDER_ARCHIVE_DIR)')
+        parser.add_argument(
+            '--schedule', action='store_true',
+            help='Поставить задачу manage_partitions, которая повторяется каждые ORDER_PARTITIONS_INTERVAL секунд',
+        )
+
+    def handle(self, *args, **options):
+        directory = options['archive_dir'] or settings.ORDER_ARCHIVE_DIR
+        ahead = settings.ORDER_PARTITIONS_AHEAD if options['ahead'] is None else options['ahead']
+        if ahead < 0:
+            raise CommandError('--ahead не может быть отрицательным')
+        try:
+            if options['list']:
+                for partition in list_partitions():
+                    self.stdout.write(f'{partition.name}: {partition.lower or "MINVALUE"} - {partition.upper or "MAXVALUE"}')
+                return
+            if options['restore']:
+                self.restore(options['restore'], directory)
+                return
+
+            for partition in create_future_partitions(ahead):
+                self.stdout.write(f'Создана секция {partition.name}')
+            if options['archive_before']:
+                self.archive(parse_month(options['archive_before']), directory)
+        except PartitionError as e:
+            raise CommandError(str(e))
+        if options['schedule']:
+            job, created = schedule_partitions()
+            state = 'запланировано' if created else 'уже запланировано'
+            self.stdout.write(f'Создание секций {state}: задача #{job.id} на {job.run_at.isoformat()}')
+        self.stdout.write(self.style.SUCCESS('Секции заказов в порядке'))
+
+    def archive(self, before, directory):
+        if before > month_start(timezone.now()):
+            raise CommandError('Нельзя архивировать текущий и будущие месяцы')
+        # Сначала доводятся до конца прерванные архивирования
+        pending = incomplete_archives(directory)
+        names = {partition.name for partition in pending}
+        pending += [partition for partition in archivable_partitions(before) if partition.name not in names]
+        for partition in pending:
+            rows = archive_partition(partition, directory)
+            self.stdout.write(f'Секция {partition.name} архивирована: {rows} заказов')
+
+    def restore(self, target, directory):
+        manifest_path = target if target.endswith('.json') else archive_paths(directory, target)[0]
+        if not os.path.exists(manifest_path):
+            raise CommandError(f'Архив {manifest_path} не найден')
+        restored, skipped = restore_partition(manifest_path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Восстановлено заказов: {restored}, пропущено (пользователь удален): {skipped}'
+        ))
@@ -0,0 +1,85 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+from t3codescommanders.db.operations import AddIndexConcurrently
+
+# Конфигурация словаря должна совпадать с orders.search.SEARCH_CONFIG
+CREATE_TRIGGER = """
+CREATE OR REPLACE FUNCTION orders_order_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER orders_order_search_vector_trigger
+BEFORE INSERT OR UPDATE OF title, description ON orders_order
+FOR EACH ROW EXECUTE PROCEDURE orders_order_search_vector_update();
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS orders_order_search_vector_trigger ON orders_order;
+DROP FUNCTION IF EXISTS orders_order_search_vector_update();
+"""
+
+BACKFILL = """
+UPDATE orders_order SET search_vector =
+    setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce(description, '')), 'B')
+WHERE id >= %s AND id < %s
+"""
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def create_trigger(apps, schema_editor):
+    """
+    Триггер и заполнение существующих строк порциями по id.
+
+    Миграция не атомарна, поэтому каждая порция фиксируется отдельно и
+    не держит блокировку на всей таблице.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(CREATE_TRIGGER)
+        cursor.execute('SELECT min(id), max(id) FROM orders_order')
+        first, last = cursor.fetchone()
+        if first is None:
+            return
+        for start in range(first, last + 1, BACKFILL_BATCH_SIZE):
+            cursor.execute(BACKFILL, [start, start + BACKFILL_BATCH_SIZE])
+
+
+def drop_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(DROP_TRIGGER)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ('orders', '0002_order_indexes'),
+        ('users', '0003_user_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_trigger, drop_trigger),
+        AddIndexConcurrently(
+            model_name='order',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='order_search_vector_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+from t3codescommanders.db.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ('orders', '0003_order_search_vector'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['user', '-updated_at', '-id'], name='order_user_updated_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['-updated_at', '-id'], name='order_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,115 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import migrations
+
+# Секции на столько месяцев вперед; дальше их создает manage_partitions
+MONTHS_AHEAD = 3
+
+CREATE_TRIGGER = """
+CREATE TRIGGER orders_order_search_vector_trigger
+BEFORE INSERT OR UPDATE OF title, description ON orders_order
+FOR EACH ROW EXECUTE PROCEDURE orders_order_search_vector_update();
+"""
+
+ADD_FOREIGN_KEY = """
+ALTER TABLE orders_order ADD CONSTRAINT orders_order_user_id_fk_users_user_id
+FOREIGN KEY (user_id) REFERENCES users_user (id) DEFERRABLE INITIALLY DEFERRED
+"""
+
+COLUMNS = 'id, title, description, created_at, updated_at, user_id, search_vector'
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def rebuild_table(apps, schema_editor, partitioned):
+    """
+    Пересоздать orders_order секционированной (или обычной) и перенести строки.
+
+    PostgreSQL не умеет секционировать существующую таблицу, поэтому она
+    переименовывается, рядом создается новая, строки копируются одним
+    INSERT ... SELECT, а индексы, внешний ключ и триггер поиска создаются
+    после копирования (строки загружаются без индексов). Миграция атомарна и держит orders_order под
+    эксклюзивной блокировкой все время копирования: на большой таблице ее
+    нужно выполнять в окно обслуживания.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Order = apps.get_model('orders', 'Order')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('LOCK TABLE orders_order IN ACCESS EXCLUSIVE MODE')
+        cursor.execute('ALTER TABLE orders_order RENAME TO orders_order_old')
+        cursor.execute('CREATE SEQUENCE orders_order_id_seq_new')
+        cursor.execute(
+            'CREATE TABLE orders_order (LIKE orders_order_old INCLUDING DEFAULTS INCLUDING STORAGE)'
+            + (' PARTITION BY RANGE (created_at)' if partitioned else '')
+        )
+        cursor.execute("ALTER TABLE orders_order ALTER COLUMN id SET DEFAULT nextval('orders_order_id_seq_new')")
+
+        if partitioned:
+            cursor.execute('SELECT min(created_at) FROM orders_order_old')
+            first = cursor.fetchone()[0] or datetime.now(dt_timezone.utc)
+            first = datetime(first.year, first.month, 1, tzinfo=dt_timezone.utc)
+            now = datetime.now(dt_timezone.utc)
+            last = add_months(datetime(now.year, now.month, 1, tzinfo=dt_timezone.utc), MONTHS_AHEAD)
+            # Все, что раньше первого месяца (например, заказы с перенесенной датой), -
+            # в секцию history; секции по умолчанию нет, она отключает упорядоченный обход секций
+            cursor.execute(
+                f"CREATE TABLE orders_order_history PARTITION OF orders_order "
+                f"FOR VALUES FROM (MINVALUE) TO ('{first.isoformat()}')"
+            )
+            month = first
+            while month <= last:
+                upper = add_months(month, 1)
+                cursor.execute(
+                    f"CREATE TABLE orders_order_p{month:%Y_%m} PARTITION OF orders_order "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+                )
+                month = upper
+
+        cursor.execute(f'INSERT INTO orders_order ({COLUMNS}) SELECT {COLUMNS} FROM orders_order_old')
+        cursor.execute(
+            "SELECT setval('orders_order_id_seq_new', COALESCE((SELECT max(id) FROM orders_order_old), 0) + 1, false)"
+        )
+        # Вместе со старой таблицей удаляются ее индексы, внешний ключ, триггер и последовательность id
+        cursor.execute('DROP TABLE orders_order_old')
+        cursor.execute('ALTER SEQUENCE orders_order_id_seq_new RENAME TO orders_order_id_seq')
+        # Владелец нужен pg_get_serial_sequence, через него Django сбрасывает последовательность
+        cursor.execute('ALTER SEQUENCE orders_order_id_seq OWNED BY orders_order.id')
+        # Имя orders_order_pkey освободилось вместе со старой таблицей. Первичный ключ
+        # секционированной таблицы обязан включать ключ секционирования; уникальность
+        # id обеспечивает последовательность
+        cursor.execute(
+            'ALTER TABLE orders_order ADD PRIMARY KEY '
+            + ('(id, created_at)' if partitioned else '(id)')
+        )
+        cursor.execute(ADD_FOREIGN_KEY)
+        cursor.execute(CREATE_TRIGGER)
+
+    # Индексы модели; на секционированной таблице они создаются в каждой секции.
+    # Поиск по user_id обслуживает order_user_created_idx, отдельный индекс внешнего ключа не нужен
+    for index in Order._meta.indexes:
+        schema_editor.add_index(Order, index)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('ANALYZE orders_order')
+
+
+def partition_table(apps, schema_editor):
+    rebuild_table(apps, schema_editor, partitioned=True)
+
+
+def unpartition_table(apps, schema_editor):
+    rebuild_table(apps, schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_order_updated_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_table, unpartition_table),
+    ]
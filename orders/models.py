@@ -1,8 +1,19 @@
-from django.db import models
+from django.db import models, transaction
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
 from users.models import User
 
 
+class OrderManager(models.Manager):
+    """
+    Менеджер заказов: поисковый вектор не загружается в обычных выборках
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().defer('search_vector')
+
+
 class Order(models.Model):
     """
     Модель заказа с полями: название, описание, ID пользователя
@@ -17,11 +28,38 @@ class Order(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+    # Заполняется триггером PostgreSQL из title и description (orders/search.py)
+    search_vector = SearchVectorField(null=True, editable=False, verbose_name="Поисковый вектор")
+
+    objects = OrderManager()
 
     class Meta:
         verbose_name = "Заказ"
         verbose_name_plural = "Заказы"
         ordering = ['-created_at']
+        # Индексы повторяют сортировку курсорной пагинации (-created_at, -id);
+        # updated_at включен для index-only проверок ETag страницы
+        indexes = [
+            models.Index(
+                fields=['user', '-created_at', '-id'], include=['updated_at'],
+                name='order_user_created_idx',
+            ),
+            models.Index(
+                fields=['-created_at', '-id'], include=['updated_at'],
+                name='order_created_idx',
+            ),
+            models.Index(fields=['user', '-updated_at', '-id'], name='order_user_updated_idx'),
+            models.Index(fields=['-updated_at', '-id'], name='order_updated_idx'),
+            GinIndex(fields=['search_vector'], name='order_search_vector_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Пользователь на момент загрузки: по нему видно перенос заказа
+        # другому пользователю (orders.signals.update_order_counters)
+        instance._loaded_user_id = instance.__dict__.get('user_id')
+        return instance
 
     def __str__(self):
         return f"Заказ: {self.title} (Пользователь: {self.user.name})"
@@ -33,9 +71,15 @@ class Order(models.Model):
         if self.user_id and not User.objects.filter(id=self.user_id).exists():
             raise ValidationError({'user': 'Пользователь с указанным ID не существует'})
 
-    def save(self, *args, **kwargs):
+    def save(self, *args, validate_user=True, **kwargs):
         """
-        Проверка существования пользователя перед сохранением
+        Проверка существования пользователя перед сохранением.
+
+        validate_user=False пропускает запрос проверки: вызывающий код сам
+        обрабатывает IntegrityError внешнего ключа. Заказ и счетчики
+        пользователя из post_save сохраняются в одной транзакции.
         """
-        self.clean()
-        super().save(*args, **kwargs) 
\ No newline at end of file
+        if validate_user:
+            self.clean()
+        with transaction.atomic(using=kwargs.get('using'), savepoint=False):
+            super().save(*args, **kwargs) 
\ No newline at end of file
@@ -0,0 +1,361 @@
+"""
+Помесячное секционирование orders_order и архивирование старых секций.
+
+На PostgreSQL orders_order - секционированная по диапазону created_at
+таблица (миграция orders.0005): секция orders_order_history хранит все
+заказы до первого месяца, дальше идут секции orders_order_pYYYY_MM по
+месяцам UTC. Запросы с условием на created_at (created_after,
+created_before, первая страница списка) затрагивают только секции
+нужных месяцев. Секции на ORDER_PARTITIONS_AHEAD месяцев вперед создает
+команда manage_partitions; строка с created_at вне всех секций не
+вставится, поэтому команду нужно запускать регулярно: задача
+manage_partitions (см. orders.tasks) повторяется каждые
+ORDER_PARTITIONS_INTERVAL секунд.
+
+Архивирование отсоединяет секцию (заказы пропадают из API), выгружает
+ее в сжатый CSV рядом с манифестом JSON, пересчитывает счетчики
+затронутых пользователей, сбрасывает кэш ответов ее заказов и удаляет
+таблицу. Манифест пишется до
+отсоединения, поэтому прерванное архивирование продолжается повторным
+запуском. Восстановление создает секцию заново и загружает в нее
+заказы пользователей, которые еще существуют.
+"""
+
+import gzip
+import json
+import os
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from t3codescommanders.cache import response_cache
+from .counters import recompute_counters
+
+PARENT = 'orders_order'
+
+# Столбцы архива; search_vector не сохраняется, его заполнит триггер при восстановлении
+ARCHIVE_COLUMNS = ['id', 'title', 'description', 'user_id', 'created_at', 'updated_at']
+
+# Пользователей в одной порции пересчета счетчиков
+COUNTER_BATCH_SIZE = 1000
+
+# Заказов в одной порции сброса кэша ответов
+INVALIDATE_BATCH_SIZE = 10000
+
+BOUND_RE = re.compile(r"FOR VALUES FROM \((?P<lower>[^)]*)\) TO \((?P<upper>[^)]*)\)")
+
+
+class PartitionError(Exception):
+    """
+    Операция с секциями невозможна (не PostgreSQL, таблица не секционирована, конфликт секций)
+    """
+
+
+class Partition:
+    """
+    Секция orders_order: имя и границы [lower, upper); None - MINVALUE или MAXVALUE
+    """
+
+    def __init__(self, name, lower, upper):
+        self.name = name
+        self.lower = lower
+        self.upper = upper
+
+    def __repr__(self):
+        return f'Partition({self.name!r}, {self.lower!r}, {self.upper!r})'
+
+    def __eq__(self, other):
+        return isinstance(other, Partition) and (self.name, self.lower, self.upper) == (
+            other.name, other.lower, other.upper
+        )
+
+    def to_manifest(self):
+        return {
+            'table': self.name,
+            'lower': self.lower.isoformat() if self.lower else None,
+            'upper': self.upper.isoformat() if self.upper else None,
+        }
+
+    @classmethod
+    def from_manifest(cls, manifest):
+        return cls(
+            manifest['table'],
+            parse_datetime(manifest['lower']) if manifest['lower'] else None,
+            parse_datetime(manifest['upper']) if manifest['upper'] else None,
+        )
+
+
+def month_start(value):
+    """
+    Начало месяца UTC, в котором лежит value
+    """
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    return f'{PARENT}_p{month:%Y_%m}'
+
+
+def parse_month(value):
+    """
+    Месяц в формате YYYY-MM как datetime начала месяца UTC
+    """
+    try:
+        month = datetime.strptime(value, '%Y-%m')
+    except ValueError:
+        raise PartitionError(f'Месяц должен быть в формате YYYY-MM: {value}')
+    return month.replace(tzinfo=dt_timezone.utc)
+
+
+def _bound_sql(value, infinite):
+    return infinite if value is None else f"'{value.isoformat()}'"
+
+
+def _parse_bound(raw):
+    raw = raw.strip()
+    if raw in ('MINVALUE', 'MAXVALUE'):
+        return None
+    return parse_datetime(raw.strip("'"))
+
+
+def check_supported():
+    if connection.vendor != 'postgresql':
+        raise PartitionError('Секционирование заказов поддерживается только на PostgreSQL')
+
+
+def list_partitions():
+    """
+    Секции orders_order в порядке границ
+    """
+    check_supported()
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', [PARENT])
+        if cursor.fetchone() != ('p',):
+            raise PartitionError(f'Таблица {PARENT} не секционирована, выполните migrate')
+        cursor.execute(
+            'SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i '
+            'JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass',
+            [PARENT],
+        )
+        rows = cursor.fetchall()
+    partitions = []
+    for name, bound in rows:
+        match = BOUND_RE.match(bound)
+        if match is None:
+            raise PartitionError(f'Неожиданная граница секции {name}: {bound}')
+        partitions.append(Partition(name, _parse_bound(match['lower']), _parse_bound(match['upper'])))
+    far_past = datetime.min.replace(tzinfo=dt_timezone.utc)
+    return sorted(partitions, key=lambda partition: partition.lower or far_past)
+
+
+def create_partition(partition):
+    """
+    Создать секцию; индексы и триггер наследуются от orders_order
+    """
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE {quote(partition.name)} PARTITION OF {quote(PARENT)} '
+            f'FOR VALUES FROM ({_bound_sql(partition.lower, "MINVALUE")}) '
+            f'TO ({_bound_sql(partition.upper, "MAXVALUE")})'
+        )
+
+
+def create_future_partitions(ahead, now=None):
+    """
+    Создать недостающие помесячные секции до месяца now + ahead включительно.
+
+    Новые секции продолжают последнюю существующую, поэтому промежутков
+    между секциями не бывает. Возвращает созданные секции.
+    """
+    partitions = list_partitions()
+    target = add_months(month_start(now or timezone.now()), ahead + 1)
+    month = partitions[-1].upper if partitions else month_start(now or timezone.now())
+    if month is None:
+        raise PartitionError(f'Секция {partitions[-1].name} не ограничена сверху')
+    created = []
+    while month < target:
+        partition = Partition(partition_name(month), month, add_months(month, 1))
+        with transaction.atomic():
+            create_partition(partition)
+        created.append(partition)
+        month = partition.upper
+    return created
+
+
+def archive_paths(directory, name):
+    return os.path.join(directory, f'{name}.json'), os.path.join(directory, f'{name}.csv.gz')
+
+
+def _write_manifest(path, manifest):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as stream:
+        json.dump(manifest, stream, ensure_ascii=False, indent=2)
+        stream.flush()
+        os.fsync(stream.fileno())
+    os.replace(tmp_path, path)
+
+
+def _read_manifest(path):
+    with open(path, encoding='utf-8') as stream:
+        return json.load(stream)
+
+
+def _table_state(name):
+    """
+    'partition', 'table' (отсоединена) или None, если таблицы нет
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT relispartition FROM pg_class WHERE oid = to_regclass(%s)', [name])
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return 'partition' if row[0] else 'table'
+
+
+def _user_ids(name):
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT DISTINCT user_id FROM {quote(name)} ORDER BY user_id')
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _recompute(user_ids):
+    for start in range(0, len(user_ids), COUNTER_BATCH_SIZE):
+        with transaction.atomic():
+            recompute_counters(user_ids[start:start + COUNTER_BATCH_SIZE])
+
+
+def _invalidate_orders(name):
+    """
+    Сменить версии заказов таблицы name в кэше ответов, порциями по id
+    """
+    quote = connection.ops.quote_name
+    last_id = 0
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT id FROM {quote(name)} WHERE id > %s ORDER BY id LIMIT %s', [last_id, INVALIDATE_BATCH_SIZE],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return
+        for order_id in ids:
+            response_cache.invalidate('order', order_id)
+        last_id = ids[-1]
+
+
+def archive_partition(partition, directory):
+    """
+    Отсоединить секцию, выгрузить в directory и удалить; возвращает число заказов.
+
+    Секция, отсоединенная прерванным запуском, выгружается без повторного DETACH.
+    """
+    quote = connection.ops.quote_name
+    manifest_path, data_path = archive_paths(directory, partition.name)
+    state = _table_state(partition.name)
+    if state is None:
+        raise PartitionError(f'Таблица {partition.name} не найдена')
+    os.makedirs(directory, exist_ok=True)
+    manifest = {**partition.to_manifest(), 'columns': ARCHIVE_COLUMNS, 'complete': False}
+    _write_manifest(manifest_path, manifest)
+
+    if state == 'partition':
+        # Короткая блокировка orders_order; заказы секции сразу пропадают из API
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE {quote(PARENT)} DETACH PARTITION {quote(partition.name)}')
+
+    columns = ', '.join(quote(column) for column in ARCHIVE_COLUMNS)
+    tmp_path = f'{data_path}.tmp'
+    with transaction.atomic():
+        with connection.cursor() as cursor, gzip.open(tmp_path, 'wb') as stream:
+            cursor.execute(f'SELECT count(*) FROM {quote(partition.name)}')
+            rows = cursor.fetchone()[0]
+            cursor.copy_expert(
+                f'COPY (SELECT {columns} FROM {quote(partition.name)} ORDER BY id) '
+                f'TO STDOUT WITH (FORMAT csv, HEADER)',
+                stream,
+            )
+    with open(tmp_path, 'rb') as stream:
+        os.fsync(stream.fileno())
+    os.replace(tmp_path, data_path)
+
+    _recompute(_user_ids(partition.name))
+    # Отсоединенные заказы не должны отдаваться из кэша до RESPONSE_CACHE_TIMEOUT
+    _invalidate_orders(partition.name)
+    _write_manifest(manifest_path, {
+        **manifest, 'rows': rows, 'complete': True, 'archived_at': timezone.now().isoformat(),
+    })
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE {quote(partition.name)}')
+    return rows
+
+
+def archivable_partitions(before):
+    """
+    Секции, целиком лежащие раньше before
+    """
+    return [
+        partition for partition in list_partitions()
+        if partition.upper is not None and partition.upper <= before
+    ]
+
+
+def incomplete_archives(directory):
+    """
+    Секции, архивирование которых было прервано
+    """
+    if not os.path.isdir(directory):
+        return []
+    partitions = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.json'):
+            continue
+        manifest = _read_manifest(os.path.join(directory, filename))
+        if not manifest.get('complete') and _table_state(manifest['table']) is not None:
+            partitions.append(Partition.from_manifest(manifest))
+    return partitions
+
+
+def restore_partition(manifest_path):
+    """
+    Восстановить секцию из архива; возвращает (загружено, пропущено заказов удаленных пользователей)
+    """
+    quote = connection.ops.quote_name
+    manifest = _read_manifest(manifest_path)
+    if not manifest.get('complete'):
+        raise PartitionError(f'Архив {manifest_path} не завершен')
+    partition = Partition.from_manifest(manifest)
+    if _table_state(partition.name) is not None:
+        raise PartitionError(f'Таблица {partition.name} уже существует')
+    data_path = archive_paths(os.path.dirname(manifest_path), partition.name)[1]
+    columns = ', '.join(quote(column) for column in manifest['columns'])
+
+    with transaction.atomic():
+        create_partition(partition)
+        with connection.cursor() as cursor, gzip.open(data_path, 'rb') as stream:
+            cursor.execute(f'CREATE TEMP TABLE orders_order_restore (LIKE {quote(PARENT)}) ON COMMIT DROP')
+            cursor.copy_expert(f'COPY orders_order_restore ({columns}) FROM STDIN WITH (FORMAT csv, HEADER)', stream)
+            cursor.execute('SELECT count(*) FROM orders_order_restore')
+            total = cursor.fetchone()[0]
+            # Внешний ключ не даст вставить заказы удаленных пользователей, они пропускаются
+            cursor.execute(
+                f'INSERT INTO {quote(partition.name)} ({columns}) SELECT {columns} FROM orders_order_restore r '
+                f'WHERE EXISTS (SELECT 1 FROM users_user u WHERE u.id = r.user_id)'
+            )
+            restored = cursor.rowcount
+    _recompute(_user_ids(partition.name))
+    _write_manifest(manifest_path, {**manifest, 'restored_at': timezone.now().isoformat()})
+    return restored, total - restored
+
@@ -0,0 +1,78 @@
+"""
+Полнотекстовый поиск заказов.
+
+На PostgreSQL заказы ищутся по столбцу search_vector (tsvector из title и
+description, поддерживается триггером, GIN-индекс), а пользователи - по
+триграммам имени и email (pg_trgm, GIN-индексы). Результат ранжируется
+суммой ts_rank и триграммной похожести пользователя. На других СУБД
+используется поиск icontains без ранжирования.
+"""
+
+from django.contrib.postgres.expressions import ArraySubquery
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connection
+from django.db.models import BooleanField, F, FloatField, Func, Q, Value
+from django.db.models.functions import Cast, Greatest
+
+from t3codescommanders.pagination import KeysetPagination
+from users.models import User
+
+# Конфигурация словаря; должна совпадать с триггером в миграции orders.0003
+SEARCH_CONFIG = 'russian'
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+def search_filter(q):
+    """
+    Условие поиска заказов по строке q
+    """
+    if not is_supported():
+        return (
+            Q(title__icontains=q) | Q(description__icontains=q)
+            | Q(user__name__icontains=q) | Q(user__email__icontains=q)
+        )
+    users = User.objects.filter(Q(name__trigram_similar=q) | Q(email__trigram_similar=q)).values('id')
+    # Пользователи подбираются отдельным подзапросом, чтобы оба условия
+    # проверялись по индексам orders (GIN и user_id) через BitmapOr.
+    # user_id IN (подзапрос) внутри OR становится фильтром по хэшу после
+    # полного прохода, а = ANY(ARRAY(подзапрос)) вычисляется один раз и
+    # передается в индекс как массив.
+    return Q(search_vector=_search_query(q)) | Q(EqualsAny(F('user_id'), ArraySubquery(users)))
+
+
+class EqualsAny(Func):
+    """
+    Условие field = ANY(array)
+    """
+    arg_joiner = ' = ANY('
+    template = '(%(expressions)s))'
+    output_field = BooleanField()
+
+
+def search_orders(queryset, q):
+    """
+    Заказы queryset, найденные по строке q, с аннотацией rank
+    """
+    queryset = queryset.filter(search_filter(q))
+    if not is_supported():
+        return queryset.annotate(rank=Value(0.0, output_field=FloatField()))
+    rank = SearchRank(F('search_vector'), _search_query(q)) + Greatest(
+        TrigramSimilarity('user__name', q), TrigramSimilarity('user__email', q)
+    )
+    # ts_rank возвращает real; double precision точно переживает курсор в JSON
+    return queryset.annotate(rank=Cast(rank, FloatField()))
+
+
+def _search_query(q):
+    return SearchQuery(q, config=SEARCH_CONFIG, search_type='websearch')
+
+
+class SearchPagination(KeysetPagination):
+    """
+    Курсорная пагинация результатов поиска по (rank, id)
+    """
+    ordering = ('-rank', '-id')
+    cursor_types = {'rank': float}
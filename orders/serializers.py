@@ -4,24 +4,10 @@ from users.models import User
 from users.serializers import UserSerializer
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderContentValidationMixin:
     """
-    Сериализатор для модели Order
+    Правила проверки названия и описания заказа
     """
-    user_detail = UserSerializer(source='user', read_only=True)
-    
-    class Meta:
-        model = Order
-        fields = ['id', 'title', 'description', 'user', 'user_detail', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at', 'user_detail']
-
-    def validate_user(self, value):
-        """
-        Проверка существования пользователя
-        """
-        if not User.objects.filter(id=value.id).exists():
-            raise serializers.ValidationError("Пользователь с указанным ID не существует")
-        return value
 
     def validate_title(self, value):
         """
@@ -44,6 +30,38 @@ class OrderSerializer(serializers.ModelSerializer):
         return value
 
 
+class OrderSerializer(OrderContentValidationMixin, serializers.ModelSerializer):
+    """
+    Сериализатор для модели Order
+    """
+    user_detail = UserSerializer(source='user', read_only=True)
+
+    # Связи, которые можно встроить в ответ через ?expand=
+    EXPANDABLE_FIELDS = {'user': 'user_detail'}
+    
+    class Meta:
+        model = Order
+        fields = ['id', 'title', 'description', 'user', 'user_detail', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'user_detail']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Без контекста expand сериализатор отдает все вложенные объекты
+        expand = self.context.get('expand')
+        if expand is not None:
+            for name, field_name in self.EXPANDABLE_FIELDS.items():
+                if name not in expand:
+                    self.fields.pop(field_name, None)
+
+    def validate_user(self, value):
+        """
+        Проверка существования пользователя
+        """
+        if not User.objects.filter(id=value.id).exists():
+            raise serializers.ValidationError("Пользователь с указанным ID не существует")
+        return value
+
+
 class OrderUpdateSerializer(serializers.ModelSerializer):
     """
     Сериализатор для обновления заказа
@@ -58,4 +76,18 @@ class OrderUpdateSerializer(serializers.ModelSerializer):
         """
         if not User.objects.filter(id=value.id).exists():
             raise serializers.ValidationError("Пользователь с указанным ID не существует")
-        return value 
\ No newline at end of file
+        return value
+
+
+class OrderBulkItemSerializer(OrderContentValidationMixin, serializers.ModelSerializer):
+    """
+    Сериализатор элемента массовой загрузки заказов.
+
+    Пользователь принимается как ID без запроса к БД: существование всех
+    пользователей пачки проверяется одним запросом в представлении.
+    """
+    user = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = Order
+        fields = ['title', 'description', 'user']
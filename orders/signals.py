@@ -0,0 +1,42 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from t3codescommanders.cache import response_cache
+from users.models import User
+from .counters import update_counters
+from .models import Order
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_order_cache(sender, instance, **kwargs):
+    """
+    Сбросить кэш заказа при изменении или удалении
+    """
+    response_cache.invalidate_on_commit('order', instance.pk)
+
+
+@receiver(post_save, sender=Order)
+def update_order_counters(sender, instance, created, **kwargs):
+    """
+    Учесть созданный или перенесенный к другому пользователю заказ в счетчиках
+    """
+    previous = getattr(instance, '_loaded_user_id', None)
+    if created:
+        update_counters(added=[instance])
+    elif previous is not None and previous != instance.user_id:
+        update_counters(added=[instance], removed=[previous])
+    instance._loaded_user_id = instance.user_id
+
+
+@receiver(post_delete, sender=Order)
+def remove_order_from_counters(sender, instance, **kwargs):
+    """
+    Убрать удаленный заказ из счетчиков пользователя
+    """
+    origin = kwargs.get('origin')
+    if (origin.model if isinstance(origin, QuerySet) else type(origin)) is User:
+        # Каскад от удаления самого пользователя: счетчики удаляются вместе с ним
+        return
+    update_counters(removed=[instance.user_id])
@@ -0,0 +1,59 @@
+"""
+Фоновые задачи заказов, выполняемые воркерами run_workers.
+"""
+
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from jobs.registry import enqueue, task
+from .counters import recompute_batches
+from .deletion import delete_user
+from .partitions import create_future_partitions
+
+
+def schedule_partitions(now=None):
+    """
+    Поставить создание секций на начало следующего интервала ORDER_PARTITIONS_INTERVAL.
+
+    Как и schedule_purge, ключ задачи включает номер интервала, поэтому
+    повторный вызов не создает вторую задачу. Возвращает (задача, создана ли она).
+    """
+    interval = settings.ORDER_PARTITIONS_INTERVAL
+    slot = int((now or timezone.now()).timestamp() // interval) + 1
+    run_at = datetime.fromtimestamp(slot * interval, dt_timezone.utc)
+    return enqueue('manage_partitions', key=f'manage_partitions:{slot}', run_at=run_at)
+
+
+@task('delete_user')
+def delete_user_task(job, user_id):
+    """
+    Удалить пользователя с заказами порциями; повтор продолжает с оставшихся заказов
+    """
+    deleted = delete_user(user_id, progress=lambda total: job.report_progress(orders_deleted=total))
+    return {'user_id': user_id, 'orders_deleted': deleted}
+
+
+@task('recompute_user_counters')
+def recompute_user_counters_task(job, batch_size=1000):
+    """
+    Пересчитать счетчики заказов всех пользователей
+    """
+    checked = repaired = 0
+    for user_ids, drifted in recompute_batches(batch_size):
+        checked += len(user_ids)
+        repaired += len(drifted)
+        job.report_progress(checked=checked, repaired=repaired, last_user_id=user_ids[-1])
+    return {'checked': checked, 'repaired': repaired}
+
+
+@task('manage_partitions')
+def manage_partitions_task(job):
+    """
+    Запланировать следующий запуск и создать секции на ORDER_PARTITIONS_AHEAD месяцев вперед
+    """
+    # Следующий запуск ставится до создания секций, чтобы ошибка не прервала расписание
+    schedule_partitions()
+    created = create_future_partitions(settings.ORDER_PARTITIONS_AHEAD)
+    return {'created': [partition.name for partition in created]}
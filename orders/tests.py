@@ -0,0 +1,847 @@
+import csv
+import json
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import skipIf, skipUnless
+
+from asgiref.sync import sync_to_async
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from jobs.models import Job
+from t3codescommanders.cache import response_cache
+from t3codescommanders.renderers import ORJSONRenderer
+from t3codescommanders.serializers import get_row_serializer
+from t3codescommanders.testing import ExplainTestMixin, QueryBudgetTestMixin
+from users.models import User
+from . import partitions
+from .exporting import EXPORT_FIELDS
+from .models import Order
+from .serializers import OrderSerializer
+from .tasks import schedule_partitions
+
+
+class OrderQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """
+    Бюджеты SQL-запросов для представлений заказов
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create(name=f'Пользователь {i}', email=f'user{i}@example.com', age=25)
+            for i in range(3)
+        ]
+        cls.orders = [
+            Order.objects.create(
+                title=f'Заказ {i}',
+                description='Описание тестового заказа',
+                user=cls.users[i % len(cls.users)],
+            )
+            for i in range(15)
+        ]
+
+    def test_list(self):
+        for params in ({'page_size': 15}, {'page_size': 15, 'expand': 'user'}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('order-list-create'), params)
+                self.assertEqual(response.status_code, 200)
+                self.assertWithinQueryBudget(response)
+
+    def test_list_fields(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(
+                reverse('order-list-create'), {'fields': 'id,title,created_at', 'expand': 'user'}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.json()['data'][0]), ['id', 'title', 'created_at'])
+        sql = captured.captured_queries[-1]['sql']
+        self.assertNotIn('description', sql)
+        self.assertNotIn('users_user', sql)
+        self.assertWithinQueryBudget(response)
+
+        # user_detail без expand доступен, а при пустом expand его нет
+        response = self.client.get(reverse('order-list-create'), {'fields': 'id,user_detail'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.json()['data'][0]), ['id', 'user_detail'])
+        response = self.client.get(reverse('order-list-create'), {'fields': 'id,user_detail', 'expand': ''})
+        self.assertEqual(response.status_code, 400)
+
+    def test_user_detail_by_default(self):
+        for name, args in (
+            ('order-list-create', []), ('order-detail', [self.orders[0].id]), ('user-orders', [self.users[0].id]),
+        ):
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name, args=args))
+                self.assertEqual(response.status_code, 200)
+                data = response.json()['data']
+                order = data[0] if isinstance(data, list) else data
+                self.assertEqual(order['user_detail']['id'], order['user'])
+                self.assertWithinQueryBudget(response)
+
+        # Пользователи загружаются JOIN-ом: число запросов не зависит от длины страницы
+        counts = []
+        for page_size in (1, 15):
+            with CaptureQueriesContext(connection) as captured:
+                self.client.get(reverse('order-list-create'), {'page_size': page_size})
+            counts.append(len(captured))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_expand(self):
+        # user_detail включен по умолчанию ради совместимости, поэтому ?expand=user
+        # намеренно совпадает с ответом без параметра; отключает его ?expand=
+        # Поиск соединяет пользователей для ранжирования по имени и email независимо от expand
+        for name, args, params, ranks_by_user in (
+            ('order-list-create', [], {}, False),
+            ('order-detail', [self.orders[0].id], {}, False),
+            ('user-orders', [self.users[0].id], {}, False),
+            ('order-search', [], {'q': 'Заказ'}, True),
+        ):
+            with self.subTest(name=name):
+                url = reverse(name, args=args)
+                default = self.client.get(url, params)
+                expanded = self.client.get(url, {**params, 'expand': 'user'})
+                self.assertEqual(expanded.status_code, 200)
+                # Ссылка next и ETag страницы списка строятся по URL с параметрами, остальное совпадает
+                self.assertEqual(
+                    {key: value for key, value in expanded.json().items() if key != 'next'},
+                    {key: value for key, value in default.json().items() if key != 'next'},
+                )
+                if 'next' not in default.json():
+                    self.assertEqual(expanded['ETag'], default['ETag'])
+
+                with CaptureQueriesContext(connection) as captured:
+                    lean = self.client.get(url, {**params, 'expand': ''})
+                self.assertEqual(lean.status_code, 200)
+                data = lean.json()['data']
+                for order in data if isinstance(data, list) else [data]:
+                    self.assertNotIn('user_detail', order)
+                    self.assertIn('user', order)
+                joins = [query for query in captured.captured_queries if 'JOIN "users_user"' in query['sql']]
+                self.assertEqual(bool(joins), ranks_by_user)
+
+        url = reverse('order-detail', args=[self.orders[0].id])
+        self.assertEqual(self.client.get(url, {'expand': 'items'}).status_code, 400)
+
+    def test_detail_fields(self):
+        response = self.client.get(
+            reverse('order-detail', args=[self.orders[0].id]), {'fields': 'title,user_detail', 'expand': 'user'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.json()['data']), ['title', 'user_detail'])
+
+        response = self.client.get(reverse('order-detail', args=[self.orders[0].id]), {'fields': 'title,secret'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_create(self):
+        response = self.client.post(
+            reverse('order-list-create'),
+            {'title': 'Новый заказ', 'description': 'Описание нового заказа', 'user': self.users[0].id},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertWithinQueryBudget(response)
+
+    def test_bulk_create(self):
+        items = [
+            {'title': f'Пакетный заказ {i}', 'description': 'Описание пакетного заказа', 'user': user.id}
+            for i, user in enumerate(self.users * 10)
+        ]
+        response = self.client.post(reverse('order-bulk-create'), items, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['summary'], {'created': len(items), 'failed': 0})
+        self.assertWithinQueryBudget(response)
+
+    def test_search(self):
+        for params in ({'q': 'Заказ'}, {'q': 'Заказ', 'expand': 'user'}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('order-search'), params)
+                self.assertEqual(response.status_code, 200)
+                self.assertWithinQueryBudget(response)
+
+    def test_detail(self):
+        for params in ({}, {'expand': 'user'}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('order-detail', args=[self.orders[0].id]), params)
+                self.assertEqual(response.status_code, 200)
+                self.assertWithinQueryBudget(response)
+
+    def test_update(self):
+        response = self.client.put(
+            reverse('order-detail', args=[self.orders[0].id]),
+            {'title': 'Измененный заказ', 'user': self.users[1].id},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+
+    def test_delete(self):
+        response = self.client.delete(reverse('order-detail', args=[self.orders[0].id]))
+        self.assertEqual(response.status_code, 204)
+        self.assertWithinQueryBudget(response)
+
+    def test_user_orders(self):
+        for params in ({'page_size': 15}, {'page_size': 15, 'expand': 'user'}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('user-orders', args=[self.users[0].id]), params)
+                self.assertEqual(response.status_code, 200)
+                self.assertWithinQueryBudget(response)
+
+
+class OrderCounterTests(TestCase):
+    """
+    Счетчики order_count и last_order_at пользователя следуют за его заказами
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = User.objects.create(name='Первый', email='first@example.com', age=25)
+        cls.second = User.objects.create(name='Второй', email='second@example.com', age=25)
+
+    def assertCounters(self, user, count, last_order):
+        user.refresh_from_db()
+        self.assertEqual(user.order_count, count)
+        self.assertEqual(user.last_order_at, last_order.created_at if last_order else None)
+
+    def test_create_reassign_delete(self):
+        older = Order.objects.create(title='Заказ 1', description='Описание тестового заказа', user=self.first)
+        newer = Order.objects.create(title='Заказ 2', description='Описание тестового заказа', user=self.first)
+        self.assertCounters(self.first, 2, newer)
+
+        response = self.client.put(
+            reverse('order-detail', args=[newer.id]), {'user': self.second.id}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertCounters(self.first, 1, older)
+        self.assertCounters(self.second, 1, newer)
+
+        response = self.client.delete(reverse('order-detail', args=[older.id]))
+        self.assertEqual(response.status_code, 204)
+        self.assertCounters(self.first, 0, None)
+
+    def test_bulk_create(self):
+        items = [
+            {'title': f'Пакетный заказ {i}', 'description': 'Описание пакетного заказа', 'user': user.id}
+            for i, user in enumerate([self.first, self.second, self.first])
+        ]
+        response = self.client.post(reverse('order-bulk-create'), items, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertCounters(self.first, 2, Order.objects.filter(user=self.first).first())
+        self.assertCounters(self.second, 1, Order.objects.get(user=self.second))
+
+    def test_recompute_command(self):
+        order = Order.objects.create(title='Заказ', description='Описание тестового заказа', user=self.first)
+        User.objects.update(order_count=7, last_order_at=None)
+        call_command('recompute_user_counters', batch_size=1, stdout=StringIO())
+        self.assertCounters(self.first, 1, order)
+        self.assertCounters(self.second, 0, None)
+
+
+class OrderBulkCreateTests(TestCase):
+    """
+    Массовое создание заказов: атомарный и частичный режимы, вставка порциями
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(name='Покупатель', email='buyer@example.com', age=25)
+
+    def item(self, index, **overrides):
+        return {
+            'title': f'Пакетный заказ {index}',
+            'description': 'Описание пакетного заказа',
+            'user': self.user.id,
+            **overrides,
+        }
+
+    def post(self, items, **params):
+        url = reverse('order-bulk-create')
+        if params:
+            url = f'{url}?{"&".join(f"{key}={value}" for key, value in params.items())}'
+        return self.client.post(url, items, content_type='application/json')
+
+    def test_atomic_rollback(self):
+        items = [self.item(0), self.item(1, title=''), self.item(2)]
+        response = self.post(items)
+        self.assertEqual(response.status_code, 400)
+        body = response.json()
+        self.assertEqual(body['summary'], {'created': 0, 'failed': 1})
+        self.assertEqual([result['status'] for result in body['data']], ['skipped', 'error', 'skipped'])
+        self.assertIn('title', body['data'][1]['errors'])
+        self.assertFalse(Order.objects.exists())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.order_count, 0)
+
+    def test_partial(self):
+        items = [self.item(0), self.item(1, description='Коротко'), self.item(2, user=999999)]
+        response = self.post(items, mode='partial')
+        self.assertEqual(response.status_code, 207)
+        body = response.json()
+        self.assertEqual(body['summary'], {'created': 1, 'failed': 2})
+        created, invalid, missing = body['data']
+        self.assertEqual(created['status'], 'created')
+        self.assertEqual(Order.objects.get().id, created['id'])
+        self.assertEqual((invalid['status'], list(invalid['errors'])), ('error', ['description']))
+        self.assertEqual((missing['status'], list(missing['errors'])), ('error', ['user']))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.order_count, 1)
+
+    def test_invalid_request(self):
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.post({'title': 'Не массив'}).status_code, 400)
+        self.assertEqual(self.post([self.item(0)], mode='unknown').status_code, 400)
+        with override_settings(ORDER_BULK_MAX_ITEMS=2):
+            self.assertEqual(self.post([self.item(i) for i in range(3)]).status_code, 400)
+
+    @override_settings(ORDER_BULK_BATCH_SIZE=10)
+    def test_batches(self):
+        items = [self.item(i) for i in range(25)]
+        with CaptureQueriesContext(connection) as captured:
+            response = self.post(items)
+        self.assertEqual(response.status_code, 201)
+        sql = [query['sql'] for query in captured.captured_queries]
+        # INSERT на порцию и один UPDATE счетчиков на весь запрос
+        self.assertEqual(sum(1 for query in sql if query.startswith('INSERT INTO "orders_order"')), 3)
+        self.assertEqual(sum(1 for query in sql if query.startswith('UPDATE "users_user"')), 1)
+        ids = [result['id'] for result in response.json()['data']]
+        self.assertEqual(sorted(ids), list(Order.objects.order_by('id').values_list('id', flat=True)))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.order_count, 25)
+        self.assertEqual(self.user.last_order_at, Order.objects.latest('created_at').created_at)
+
+
+class UserDeletionTests(TransactionTestCase):
+    """
+    Пользователь с заказами удаляется порциями без каскада Django
+    """
+
+    def create_user(self, orders):
+        user = User.objects.create(name='Удаляемый', email='deleted@example.com', age=30)
+        for i in range(orders):
+            Order.objects.create(title=f'Заказ {i}', description='Описание тестового заказа', user=user)
+        return user
+
+    def test_batches(self):
+        user = self.create_user(5)
+        order = Order.objects.filter(user=user).first()
+        self.assertEqual(self.client.get(reverse('order-detail', args=[order.id])).status_code, 200)
+
+        out = StringIO()
+        call_command('delete_user', user.id, batch_size=2, stdout=out)
+        self.assertIn('Удалено заказов: 4 из ~5', out.getvalue())
+        self.assertFalse(User.objects.filter(id=user.id).exists())
+        self.assertFalse(Order.objects.exists())
+        # Кэш удаленного заказа сброшен
+        self.assertEqual(self.client.get(reverse('order-detail', args=[order.id])).status_code, 404)
+
+    @override_settings(USER_DELETE_SYNC_MAX_ORDERS=2, USER_DELETE_BATCH_SIZE=2)
+    def test_background(self):
+        user = self.create_user(3)
+        response = self.client.delete(reverse('user-detail', args=[user.id]))
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['data']['job_id']
+        self.assertEqual(response.json()['data'], {'id': user.id, 'orders_remaining': 3, 'job_id': job_id})
+        self.assertEqual(response['Location'], reverse('job-detail', args=[job_id]))
+        # Повторный DELETE не ставит вторую задачу
+        self.assertEqual(self.client.delete(reverse('user-detail', args=[user.id])).json()['data']['job_id'], job_id)
+
+        call_command('run_workers', burst=True, stdout=StringIO())
+        job = self.client.get(reverse('job-detail', args=[job_id])).json()['data']
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['result'], {'user_id': user.id, 'orders_deleted': 3})
+        self.assertEqual(job['progress'], {'orders_deleted': 3})
+        self.assertFalse(User.objects.filter(id=user.id).exists())
+        self.assertFalse(Order.objects.exists())
+
+    @override_settings(USER_DELETE_SYNC_MAX_ORDERS=2)
+    def test_background_with_drifted_counter(self):
+        user = self.create_user(3)
+        # Счетчик разошелся с таблицей заказов: решение принимается по заказам
+        User.objects.filter(id=user.id).update(order_count=0)
+        response = self.client.delete(reverse('user-detail', args=[user.id]))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Order.objects.count(), 3)
+
+
+class OrderRowSerializerContractTests(TestCase):
+    """
+    Быстрый путь (values() + RowSerializer + orjson) выдает те же байты, что и OrderSerializer
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(name='Пользователь \u2028 "кавычки"', email='rows@example.com', age=25)
+        for i in range(5):
+            Order.objects.create(title=f'Заказ {i} ✓', description='Описание\nс переводом строки\u2029', user=user)
+        # Метка без микросекунд форматируется иначе, чем с ними
+        Order.objects.filter(id=Order.objects.order_by('id').first().id).update(
+            created_at=datetime(2024, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc)
+        )
+
+    def test_matches_serializer(self):
+        for expand in (None, set(), {'user'}):
+            with self.subTest(expand=expand):
+                context = {} if expand is None else {'expand': expand}
+                orders = list(Order.objects.select_related('user').order_by('id'))
+                expected = JSONRenderer().render(OrderSerializer(orders, many=True, context=context).data)
+
+                rows = get_row_serializer(OrderSerializer, expand)
+                data = rows.serialize(rows.values(Order.objects.order_by('id')))
+                self.assertEqual(ORJSONRenderer().render(data), expected)
+
+    def test_renderer_matches_envelope(self):
+        data = {
+            'status': 'error',
+            'message': 'Ошибка валидации данных',
+            'errors': serializers.ValidationError({'title': ['Пусто']}).detail,
+            'summary': {1: 2.5, 'created': None},
+            'at': datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class AsyncOrderViewTests(QueryBudgetTestMixin, TestCase):
+    """
+    Async-представления заказов отдают те же данные, что и синхронные
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(name='Пользователь', email='async@example.com', age=25)
+        cls.orders = [
+            Order.objects.create(title=f'Заказ {i}', description='Описание тестового заказа', user=cls.user)
+            for i in range(5)
+        ]
+
+    async def test_matches_sync_views(self):
+        pairs = [
+            ('order-list-create', [], {'page_size': 3, 'expand': 'user'}),
+            ('order-detail', [self.orders[0].id], {'expand': 'user'}),
+            ('user-orders', [self.user.id], {'page_size': 3}),
+        ]
+        for name, args, params in pairs:
+            with self.subTest(name=name):
+                expected = (await self.async_client.get(reverse(name, args=args), params)).json()
+                response = await self.async_client.get(reverse(f'async-{name}', args=args), params)
+                self.assertEqual(response.status_code, 200)
+                data = response.json()
+                if data.get('next'):
+                    data['next'] = data['next'].replace('/api/async/', '/api/')
+                self.assertEqual(data, expected)
+
+    async def test_create(self):
+        response = await self.async_client.post(
+            reverse('async-order-list-create'),
+            {'title': 'Новый заказ', 'description': 'Описание нового заказа', 'user': self.user.id},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        data = response.json()['data']
+        self.assertEqual(data['user_detail']['id'], self.user.id)
+        # user_detail загружается после вставки и учитывает новый заказ
+        self.assertEqual(data['user_detail']['order_count'], len(self.orders) + 1)
+
+    async def test_user_orders_missing_user(self):
+        response = await self.async_client.get(reverse('async-user-orders', args=[999]))
+        self.assertEqual(response.status_code, 404)
+
+
+class AsyncOrderCreateTests(TransactionTestCase):
+    """
+    Async-создание заказа проверяет пользователя внешним ключом, который срабатывает при коммите
+    """
+
+    async def test_missing_user(self):
+        response = await self.async_client.post(
+            reverse('async-order-list-create'),
+            {'title': 'Новый заказ', 'description': 'Описание нового заказа', 'user': 999},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], 'Пользователь с указанным ID не существует')
+        self.assertFalse(await Order.objects.aexists())
+        # Отдельного запроса существования пользователя перед вставкой нет
+        self.assertFalse([
+            sql for sql, _ in response.asgi_request.query_stats.queries
+            if sql.startswith('SELECT') and 'users_user' in sql
+        ])
+
+
+class OrderConditionalRequestTests(TestCase):
+    """
+    ETag заказа с user_detail совпадает для GET и проверки If-Match в PUT
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(name='Условный', email='conditional@example.com', age=30)
+        cls.order = Order.objects.create(title='Заказ', description='Описание условного заказа', user=cls.user)
+
+    def setUp(self):
+        response_cache.clear()
+        self.url = reverse('order-detail', args=[self.order.id])
+
+    def put(self, etag, **data):
+        # Кэш сбрасывается после коммита, как без тестовой транзакции
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.put(self.url, data, content_type='application/json', HTTP_IF_MATCH=etag)
+
+    def test_if_match(self):
+        for params in ({}, {'expand': 'user'}):
+            with self.subTest(**params):
+                etag = self.client.get(self.url, params)['ETag']
+                self.assertEqual(self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+                self.assertEqual(self.put(etag, title=f'Заказ {params}').status_code, 200)
+                self.assertEqual(self.put(etag, title='Потерянное изменение').status_code, 412)
+
+    def test_if_match_after_stale_user_cache(self):
+        # Второй GET берет пользователя уже из его записи кэша
+        self.client.get(self.url, {'expand': 'user'})
+        stale = self.client.get(self.url, {'expand': 'user'})['ETag']
+        User.objects.filter(id=self.user.id).update(name='В обход', updated_at=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(self.client.get(self.url, {'expand': 'user'})['ETag'], stale)
+        self.assertEqual(self.put(stale, title='Новый заказ').status_code, 412)
+        fresh = self.client.get(self.url, {'expand': 'user'})
+        self.assertEqual(fresh.json()['data']['user_detail']['name'], 'В обход')
+        self.assertEqual(self.put(fresh['ETag'], title='Новый заказ').status_code, 200)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'SQLite не блокирует строки SELECT ... FOR UPDATE')
+class ConcurrentOrderUpdateTests(TransactionTestCase):
+    """
+    PUT заказа с If-Match проверяет ETag и записывает под блокировкой строки
+    """
+
+    def test_same_etag(self):
+        user = User.objects.create(name='Условный', email='conditional@example.com', age=30)
+        order = Order.objects.create(title='Заказ', description='Описание условного заказа', user=user)
+        response_cache.clear()
+        url = reverse('order-detail', args=[order.id])
+        etag = self.client.get(url)['ETag']
+        responses = []
+
+        def put():
+            try:
+                responses.append(self.client_class().put(
+                    url, {'title': 'Потерянное изменение'}, content_type='application/json', HTTP_IF_MATCH=etag,
+                ))
+            finally:
+                connections.close_all()
+
+        # Первый PUT записан, но не зафиксирован; второй с тем же ETag ждет его фиксации
+        with transaction.atomic():
+            first = self.client.put(
+                url, {'title': 'Первое изменение'}, content_type='application/json', HTTP_IF_MATCH=etag,
+            )
+            thread = threading.Thread(target=put)
+            thread.start()
+            time.sleep(0.2)
+        thread.join()
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual([response.status_code for response in responses], [412])
+        self.assertEqual(Order.objects.get(id=order.id).title, 'Первое изменение')
+
+
+class OrderExportTests(TestCase):
+    """
+    Потоковая выгрузка заказов в NDJSON и CSV
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create(name=f'Пользователь {i}', email=f'export{i}@example.com', age=25)
+            for i in range(2)
+        ]
+        cls.orders = [
+            Order.objects.create(
+                title=f'Заказ {i}',
+                description=f'Описание, "в кавычках"\nи на двух строках {i}',
+                user=cls.users[i % 2],
+            )
+            for i in range(5)
+        ]
+
+    def export(self, **params):
+        response = self.client.get(reverse('order-export'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    def test_ndjson(self):
+        response, content = self.export(format='ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="orders.ndjson"')
+        self.assertTrue(content.endswith('\n'))
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row['id'] for row in rows], [order.id for order in self.orders])
+        self.assertEqual(list(rows[0]), EXPORT_FIELDS)
+        self.assertEqual(rows[0]['description'], self.orders[0].description)
+        self.assertEqual(rows[0]['user_email'], 'export0@example.com')
+
+    def test_csv(self):
+        response, content = self.export(format='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(StringIO(content)))
+        self.assertEqual(rows[0], EXPORT_FIELDS)
+        self.assertEqual([int(row[0]) for row in rows[1:]], [order.id for order in self.orders])
+        # Запятые, кавычки и переводы строк экранируются по правилам CSV
+        self.assertEqual(rows[1][2], self.orders[0].description)
+
+    def test_filters(self):
+        _, content = self.export(format='ndjson', user=self.users[1].id, ordering='-created_at')
+        ids = [json.loads(line)['id'] for line in content.splitlines()]
+        self.assertEqual(ids, [order.id for order in reversed(self.orders) if order.user_id == self.users[1].id])
+
+        response = self.client.get(reverse('order-export'), {'format': 'csv', 'user': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(ORDER_EXPORT_CHUNK_SIZE=2)
+    def test_multiple_chunks(self):
+        # Каждая строка длиннее трети куска ответа, порция чтения из БД - 2 строки
+        Order.objects.update(description='x' * 30000)
+        response = self.client.get(reverse('order-export'), {'format': 'ndjson'})
+        chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 2)
+        rows = [json.loads(line) for line in b''.join(chunks).decode('utf-8').splitlines()]
+        self.assertEqual([row['id'] for row in rows], [order.id for order in self.orders])
+
+    @override_settings(ORDER_EXPORT_CHUNK_SIZE=2)
+    async def test_asgi(self):
+        # Под ASGI выгрузка отдается асинхронным итератором, а не читается в память
+        response = await self.async_client.get(reverse('order-export'), {'format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content]).decode('utf-8')
+        _, expected = await sync_to_async(self.export)(format='csv')
+        self.assertEqual(content, expected)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Планы запросов проверяются только на PostgreSQL')
+class ExplainIndexTests(ExplainTestMixin, TestCase):
+    """
+    Запросы представлений используют индексы, а не полный проход и сортировку
+    """
+    explain_tables = ('users_user', 'orders_order')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = User.objects.bulk_create([
+            User(name=f'Пользователь {i}', email=f'explain{i}@example.com', age=30)
+            for i in range(5000)
+        ])
+        # У первого пользователя много заказов, у остальных по несколько, у последнего нет
+        cls.user_without_orders = cls.users[-1]
+        owners = [cls.users[0]] * 2000 + [cls.users[1 + i % 4998] for i in range(28000)]
+        Order.objects.bulk_create([
+            Order(title=f'Заказ {i}', description='Описание тестового заказа', user=owner)
+            for i, owner in enumerate(owners)
+        ], batch_size=5000)
+        with connection.cursor() as cursor:
+            # Разные created_at, как в реальных данных, и свежая статистика планировщика
+            cursor.execute("UPDATE users_user SET created_at = now() - id * interval '1 minute'")
+            cursor.execute("UPDATE orders_order SET created_at = now() - id * interval '1 second'")
+            # bulk_create не обновляет счетчики, они заполняются как в миграции users.0005
+            cursor.execute(
+                'UPDATE users_user SET '
+                'order_count = (SELECT count(*) FROM orders_order WHERE user_id = users_user.id), '
+                'last_order_at = (SELECT max(created_at) FROM orders_order WHERE user_id = users_user.id)'
+            )
+            cursor.execute('ANALYZE users_user')
+            cursor.execute('ANALYZE orders_order')
+
+    def get(self, name, args=(), **params):
+        params = {key: value for key, value in params.items() if value is not None}
+        return self.assertQueriesUseIndexes(lambda: self.client.get(reverse(name, args=args), params))
+
+    def test_user_list(self):
+        cursor = self.get('user-list-create').json()['next_cursor']
+        self.get('user-list-create', cursor=cursor)
+        self.assertQueriesUseIndexes(
+            lambda: self.client.get(reverse('user-list-create'), HTTP_IF_NONE_MATCH='"stale"')
+        )
+
+    def test_user_detail(self):
+        self.get('user-detail', args=[self.users[0].id])
+
+    def test_order_list(self):
+        cursor = self.get('order-list-create').json()['next_cursor']
+        self.get('order-list-create', cursor=cursor)
+        self.get('order-list-create', expand='user')
+        self.assertQueriesUseIndexes(
+            lambda: self.client.get(reverse('order-list-create'), HTTP_IF_NONE_MATCH='"stale"')
+        )
+
+    def test_list_filters(self):
+        self.get('order-list-create', updated_since='2000-01-01')
+        self.get('order-list-create', user=self.users[0].id, ordering='-updated_at')
+        self.get('order-list-create', created_after='2000-01-01', created_before='2100-01-01')
+        self.get('user-list-create', age_min=20, age_max=40)
+        self.get('user-list-create', updated_since='2000-01-01', ordering='-updated_at')
+
+    def test_user_stats(self):
+        response = self.get('user-stats')
+        self.assertEqual(response.json()['data'][0]['id'], self.users[0].id)
+        self.get('user-stats', cursor=response.json()['next_cursor'])
+        self.get('user-stats', ordering='-last_order_at')
+        self.get('user-stats', last_order_after='2000-01-01')
+
+    def test_order_detail(self):
+        order = Order.objects.order_by('id').first()
+        self.get('order-detail', args=[order.id], expand='user')
+
+    def test_user_orders(self):
+        user_id = self.users[0].id
+        cursor = self.get('user-orders', args=[user_id]).json()['next_cursor']
+        self.get('user-orders', args=[user_id], cursor=cursor)
+        self.get('user-orders', args=[user_id], expand='user')
+        self.get('user-orders', args=[self.user_without_orders.id])
+
+    @override_settings(USER_DELETE_SYNC_MAX_ORDERS=5000)
+    def test_user_delete(self):
+        self.assertQueriesUseIndexes(lambda: self.client.delete(reverse('user-detail', args=[self.users[0].id])))
+
+    def test_export(self):
+        def export():
+            response = self.client.get(reverse('order-export'), {'format': 'ndjson', 'user': self.users[1].id})
+            b''.join(response.streaming_content)
+            return response
+
+        self.assertQueriesUseIndexes(export)
+
+    def test_search(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('order-search'), {'q': 'Заказ 17'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([order['title'] for order in response.json()['data']], ['Заказ 17'])
+        sql = next(query['sql'] for query in captured.captured_queries if query['sql'].startswith('SELECT'))
+        indexes = {
+            self.parent_index(node['Index Name'])
+            for node in self.plan_nodes(self.explain(sql)) if 'Index Name' in node
+        }
+        self.assertIn('order_search_vector_idx', indexes)
+
+    def test_bulk_create(self):
+        self.assertQueriesUseIndexes(lambda: self.client.post(
+            reverse('order-bulk-create'),
+            [{'title': 'Новый заказ', 'description': 'Описание нового заказа', 'user': user.id}
+             for user in self.users[:50]],
+            content_type='application/json',
+        ))
+
+
+class PartitionHelperTests(TestCase):
+    """
+    Границы и имена помесячных секций
+    """
+
+    def test_months(self):
+        month = partitions.month_start(datetime(2024, 12, 31, 23, 30, tzinfo=dt_timezone.utc))
+        self.assertEqual(month, datetime(2024, 12, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(partitions.add_months(month, 1), datetime(2025, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(partitions.add_months(month, -12), datetime(2023, 12, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(partitions.partition_name(month), 'orders_order_p2024_12')
+        self.assertEqual(partitions.parse_month('2024-03'), datetime(2024, 3, 1, tzinfo=dt_timezone.utc))
+        with self.assertRaises(partitions.PartitionError):
+            partitions.parse_month('03.2024')
+
+    @override_settings(ORDER_PARTITIONS_INTERVAL=86400)
+    def test_schedule(self):
+        now = datetime(2025, 1, 1, 10, 30, tzinfo=dt_timezone.utc)
+        job, created = schedule_partitions(now)
+        self.assertTrue(created)
+        self.assertEqual(job.run_at, datetime(2025, 1, 2, tzinfo=dt_timezone.utc))
+        self.assertFalse(schedule_partitions(now + timedelta(hours=1))[1])
+        self.assertEqual(Job.objects.filter(name='manage_partitions').count(), 1)
+
+    @skipIf(connection.vendor == 'postgresql', 'Проверяется отказ на СУБД без секционирования')
+    def test_unsupported(self):
+        with self.assertRaises(CommandError):
+            call_command('manage_partitions', stdout=StringIO())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Секционирование есть только на PostgreSQL')
+class PartitionTests(ExplainTestMixin, TestCase):
+    """
+    Секции заказов: создание и отсечение лишних секций
+    """
+
+    def scanned_partitions(self, sql):
+        return {
+            node['Relation Name'] for node in self.plan_nodes(self.explain(sql))
+            if node.get('Relation Name', '').startswith('orders_order_')
+        }
+
+    def test_future_partitions(self):
+        now = timezone.now()
+        created = partitions.create_future_partitions(6, now=now)
+        last = partitions.list_partitions()[-1]
+        self.assertEqual(last.upper, partitions.add_months(partitions.month_start(now), 7))
+        self.assertTrue(created)
+        # Повторный запуск ничего не создает, секции идут без промежутков
+        self.assertEqual(partitions.create_future_partitions(6, now=now), [])
+        bounds = partitions.list_partitions()
+        for previous, current in zip(bounds, bounds[1:]):
+            self.assertEqual(previous.upper, current.lower)
+
+    def test_pruning(self):
+        user = User.objects.create(name='Секции', email='partitions@example.com', age=30)
+        Order.objects.create(title='Свежий заказ', description='Описание свежего заказа', user=user)
+        month = partitions.month_start(timezone.now())
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('order-list-create'), {
+                'created_after': month.isoformat(), 'created_before': partitions.add_months(month, 1).isoformat(),
+            })
+        self.assertEqual(len(response.json()['data']), 1)
+        sql = next(query['sql'] for query in captured.captured_queries if query['sql'].startswith('SELECT'))
+        self.assertEqual(self.scanned_partitions(sql), {partitions.partition_name(month)})
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Секционирование есть только на PostgreSQL')
+class PartitionArchiveTests(TransactionTestCase):
+    """
+    Архивирование секции и восстановление из архива (каждый шаг - своя транзакция)
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.archive_dir = directory.name
+
+    def test_archive_and_restore(self):
+        user = User.objects.create(name='Архив', email='archive@example.com', age=30)
+        old, recent = [
+            Order.objects.create(title=f'Заказ {i}', description='Описание архивного заказа', user=user)
+            for i in range(2)
+        ]
+        # Перенос даты переносит строку в секцию history
+        Order.objects.filter(id=old.id).update(created_at=datetime(2000, 1, 15, tzinfo=dt_timezone.utc))
+        # Заказ попадает в кэш ответов до архивирования
+        self.assertEqual(self.client.get(reverse('order-detail', args=[old.id])).status_code, 200)
+
+        out = StringIO()
+        before = partitions.month_start(timezone.now()).strftime('%Y-%m')
+        call_command('manage_partitions', archive_before=before, archive_dir=self.archive_dir, stdout=out)
+        self.assertIn('orders_order_history архивирована: 1', out.getvalue())
+        self.assertEqual(list(Order.objects.values_list('id', flat=True)), [recent.id])
+        self.assertEqual(self.client.get(reverse('order-detail', args=[old.id])).status_code, 404)
+        user.refresh_from_db()
+        self.assertEqual(user.order_count, 1)
+
+        call_command('manage_partitions', restore='orders_order_history', archive_dir=self.archive_dir, stdout=out)
+        self.assertIn('Восстановлено заказов: 1', out.getvalue())
+        restored = Order.objects.get(id=old.id)
+        self.assertEqual(restored.title, old.title)
+        self.assertEqual(Order.objects.filter(search_vector__isnull=True).count(), 0)
+        user.refresh_from_db()
+        self.assertEqual(user.order_count, 2)
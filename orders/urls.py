@@ -1,8 +1,14 @@
 from django.urls import path
-from .views import OrderListCreateView, OrderDetailView, UserOrdersView
+from .views import (
+    OrderListCreateView, OrderBulkCreateView, OrderExportView, OrderSearchView, OrderDetailView,
+    UserOrdersView,
+)
 
 urlpatterns = [
     path('orders/', OrderListCreateView.as_view(), name='order-list-create'),
+    path('orders/bulk/', OrderBulkCreateView.as_view(), name='order-bulk-create'),
+    path('orders/export/', OrderExportView.as_view(), name='order-export'),
+    path('orders/search/', OrderSearchView.as_view(), name='order-search'),
     path('orders/<int:order_id>/', OrderDetailView.as_view(), name='order-detail'),
     path('users/<int:user_id>/orders/', UserOrdersView.as_view(), name='user-orders'),
 ] 
\ No newline at end of file
@@ -1,35 +1,162 @@
-from rest_framework import status
+from rest_framework import serializers, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from .counters import update_counters
+from .exporting import CSVRenderer, NDJSONRenderer, astream, export_queryset, stream
+from .filters import OrderFilterSet
 from .models import Order
-from .serializers import OrderSerializer, OrderUpdateSerializer
+from .search import SearchPagination, search_orders
+from .serializers import OrderBulkItemSerializer, OrderSerializer, OrderUpdateSerializer
+from users.serializers import UserSerializer
 from users.models import User
+from users.views import cached_user_data
+from idempotency.keys import idempotent
+from t3codescommanders.cache import response_cache
+from t3codescommanders.conditional import (
+    not_modified_response, page_not_modified_response, precondition_failed_response, precondition_lock,
+    representation_validators, set_page_validators, set_validators,
+)
+from t3codescommanders.exceptions import InvalidQueryParameter
+from t3codescommanders.pagination import KeysetPagination
+from t3codescommanders.serializers import get_row_serializer, parse_fields, prune_fields
+
+
+def parse_expand(request):
+    """
+    Разобрать параметр ?expand= в множество встраиваемых связей.
+
+    Контракт GET-ответов с заказами (списки, detail, поиск, заказы
+    пользователя и их async-версии):
+    - без ?expand= встраиваются все связи (user_detail), как до появления
+      параметра, чтобы не сломать существующих клиентов;
+    - ?expand=user намеренно совпадает с ответом по умолчанию;
+    - ?expand= без значения отключает user_detail и JOIN с пользователями,
+      как и ?fields= без user_detail.
+    """
+    if 'expand' not in request.GET:
+        return set(OrderSerializer.EXPANDABLE_FIELDS)
+    raw = request.GET.get('expand', '')
+    expand = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = expand - set(OrderSerializer.EXPANDABLE_FIELDS)
+    if unknown:
+        raise InvalidQueryParameter(
+            f'Недопустимое значение expand: {", ".join(sorted(unknown))}'
+        )
+    return expand
+
+
+def parse_order_fields(request, expand):
+    """
+    Поля ответа из ?fields= и итоговый набор expand.
+
+    Связь, чье поле (user_detail) не попало в fields, не встраивается,
+    поэтому и JOIN для нее не выполняется.
+    """
+    fields = parse_fields(request.GET, get_row_serializer(OrderSerializer, expand).field_names)
+    if fields is not None:
+        expand = {name for name in expand if OrderSerializer.EXPANDABLE_FIELDS[name] in fields}
+    return fields, expand
+
+
+def order_queryset(expand):
+    """
+    Queryset заказов; пользователь подгружается JOIN-ом только при expand=user
+    """
+    queryset = Order.objects.all()
+    if 'user' in expand:
+        queryset = queryset.select_related('user')
+    return queryset
+
+
+def order_version_fields(expand):
+    """
+    Поля, по которым строятся ETag и Last-Modified страницы заказов
+    """
+    if 'user' in expand:
+        return ('id', 'updated_at', 'user__updated_at')
+    return ('id', 'updated_at')
+
+
+def order_detail_data(order_id, expand):
+    """
+    Данные заказа через кэш ответов.
+
+    Заказ кэшируется без user_detail, а вложенный пользователь берется из
+    записи кэша пользователя, поэтому изменение пользователя сразу видно во
+    всех заказах, которые его встраивают.
+    """
+    loaded = {}
+
+    def build():
+        order = order_queryset(expand).get(id=order_id)
+        loaded['order'] = order
+        return OrderSerializer(order, context={'expand': set()}).data
+
+    data = response_cache.fetch('order', order_id, build)
+    if 'user' not in expand:
+        return data
+
+    if 'order' in loaded:
+        # Пользователь уже получен JOIN-ом вместе с заказом
+        user_data = UserSerializer(loaded['order'].user).data
+    else:
+        user_data = response_cache.fetch('user', data['user'], lambda: cached_user_data(data['user']))
+
+    result = {}
+    for name, value in data.items():
+        result[name] = value
+        if name == 'user':
+            result['user_detail'] = user_data
+    return result
 
 
 class OrderListCreateView(APIView):
     """
     Представление для создания и получения списка заказов
     """
+    pagination_class = KeysetPagination
     
     def get(self, request):
         """
-        Получить список всех заказов
+        Получить страницу списка заказов с фильтрами и сортировкой
         """
         try:
-            orders = Order.objects.all()
-            serializer = OrderSerializer(orders, many=True)
+            fields, expand = parse_order_fields(request, parse_expand(request))
+            filterset = OrderFilterSet(request.query_params)
+            version_fields = order_version_fields(expand)
+            rows = get_row_serializer(OrderSerializer, expand, fields)
+            queryset = rows.values(
+                filterset.filter_queryset(order_queryset(expand)), *version_fields, *filterset.ordering_fields
+            )
+            not_modified = page_not_modified_response(
+                request, self.pagination_class, queryset, version_fields,
+                ordering=filterset.ordering_fields,
+            )
+            if not_modified is not None:
+                return not_modified
+
+            paginator = self.pagination_class(ordering=filterset.ordering_fields)
+            orders = paginator.paginate_queryset(queryset, request, view=self)
+            response = paginator.get_paginated_response(rows.serialize(orders))
+            return set_page_validators(response, request, paginator, orders, version_fields)
+        except InvalidQueryParameter as e:
             return Response({
-                'status': 'success',
-                'data': serializer.data
-            }, status=status.HTTP_200_OK)
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({
                 'status': 'error',
                 'message': f'Ошибка при получении заказов: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @idempotent
     def post(self, request):
         """
         Создать новый заказ с проверкой существования пользователя
@@ -76,6 +203,217 @@ class OrderListCreateView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class OrderBulkCreateView(APIView):
+    """
+    Представление для массового создания заказов из JSON-массива
+    """
+    MODES = ('atomic', 'partial')
+
+    @idempotent
+    def post(self, request):
+        """
+        Создать пачку заказов.
+
+        ?mode=atomic (по умолчанию) создает заказы только если все элементы
+        корректны, ?mode=partial создает корректные и возвращает ошибки
+        для остальных.
+        """
+        try:
+            items = request.data
+            mode = request.query_params.get('mode', 'atomic')
+            if mode not in self.MODES:
+                return Response({
+                    'status': 'error',
+                    'message': f'Недопустимый режим: {mode}. Допустимо: {", ".join(self.MODES)}'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            if not isinstance(items, list) or not items:
+                return Response({
+                    'status': 'error',
+                    'message': 'Ожидается непустой JSON-массив заказов'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            if len(items) > settings.ORDER_BULK_MAX_ITEMS:
+                return Response({
+                    'status': 'error',
+                    'message': f'Слишком много заказов в одном запросе (максимум {settings.ORDER_BULK_MAX_ITEMS})'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            results = [None] * len(items)
+            valid = self._validate_items(items, results)
+            pending = self._resolve_users(valid, results)
+
+            failed = sum(1 for result in results if result is not None)
+            if failed and mode == 'atomic':
+                for index, _ in pending:
+                    results[index] = {'index': index, 'status': 'skipped'}
+                return Response({
+                    'status': 'error',
+                    'message': 'Ошибка валидации данных, заказы не созданы',
+                    'summary': {'created': 0, 'failed': failed},
+                    'data': results
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            created = self._insert(pending, results, atomic=(mode == 'atomic'))
+            failed = len(items) - created
+            return Response({
+                'status': 'success',
+                'message': 'Заказы успешно созданы' if not failed else 'Заказы созданы частично',
+                'summary': {'created': created, 'failed': failed},
+                'data': results
+            }, status=status.HTTP_201_CREATED if not failed else status.HTTP_207_MULTI_STATUS)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': f'Ошибка при создании заказов: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def _validate_items(self, items, results):
+        """
+        Проверить поля каждого элемента одним экземпляром сериализатора
+        """
+        item_serializer = OrderBulkItemSerializer()
+        valid = []
+        for index, item in enumerate(items):
+            try:
+                valid.append((index, item_serializer.run_validation(item)))
+            except serializers.ValidationError as e:
+                results[index] = {'index': index, 'status': 'error', 'errors': e.detail}
+        return valid
+
+    def _resolve_users(self, valid, results):
+        """
+        Проверить существование всех пользователей пачки одним запросом IN
+        """
+        user_ids = {data['user'] for _, data in valid}
+        existing = set(User.objects.filter(id__in=user_ids).order_by().values_list('id', flat=True))
+        pending = []
+        for index, data in valid:
+            if data['user'] not in existing:
+                results[index] = {
+                    'index': index,
+                    'status': 'error',
+                    'errors': {'user': ['Пользователь с указанным ID не существует']}
+                }
+                continue
+            pending.append((index, Order(
+                title=data['title'],
+                description=data['description'],
+                user_id=data['user'],
+            )))
+        return pending
+
+    def _insert(self, pending, results, atomic):
+        """
+        Вставить заказы через bulk_create порциями ORDER_BULK_BATCH_SIZE.
+
+        bulk_create не отправляет post_save, поэтому счетчики пользователей
+        обновляются явно, одним запросом на транзакцию.
+
+        В атомарном режиме все порции идут в одной транзакции, в частичном
+        каждая порция фиксируется отдельно и ошибка БД затрагивает только ее.
+        """
+        batch_size = settings.ORDER_BULK_BATCH_SIZE
+        chunks = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+
+        if atomic:
+            with transaction.atomic():
+                for chunk in chunks:
+                    Order.objects.bulk_create([order for _, order in chunk])
+                update_counters(added=[order for _, order in pending])
+            inserted = chunks
+        else:
+            inserted = []
+            for chunk in chunks:
+                try:
+                    with transaction.atomic():
+                        Order.objects.bulk_create([order for _, order in chunk])
+                        update_counters(added=[order for _, order in chunk])
+                except DatabaseError as e:
+                    for index, _ in chunk:
+                        results[index] = {'index': index, 'status': 'error', 'errors': {'non_field_errors': [str(e)]}}
+                    continue
+                inserted.append(chunk)
+
+        for chunk in inserted:
+            for index, order in chunk:
+                results[index] = {'index': index, 'status': 'created', 'id': order.id}
+        return sum(len(chunk) for chunk in inserted)
+
+
+class OrderExportView(APIView):
+    """
+    Представление для потоковой выгрузки всех заказов в NDJSON или CSV
+    """
+    # Формат выбирается параметром ?format= или заголовком Accept
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+
+    def get(self, request):
+        """
+        Выгрузить заказы с теми же фильтрами и сортировками, что и список
+        """
+        try:
+            file_format = request.accepted_renderer.format
+            queryset = export_queryset(request.query_params)
+            # Под ASGI синхронный итератор был бы прочитан в память целиком
+            chunks = (
+                astream(queryset, file_format) if isinstance(request._request, ASGIRequest)
+                else stream(queryset, file_format)
+            )
+            response = StreamingHttpResponse(
+                chunks,
+                content_type=f'{request.accepted_renderer.media_type}; charset=utf-8'
+            )
+            response['Content-Disposition'] = f'attachment; filename="orders.{file_format}"'
+            return response
+        except InvalidQueryParameter as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': f'Ошибка при выгрузке заказов: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class OrderSearchView(APIView):
+    """
+    Представление для полнотекстового поиска заказов
+    """
+    pagination_class = SearchPagination
+
+    def get(self, request):
+        """
+        Найти заказы по ?q= в названии, описании, имени и email пользователя.
+
+        Результаты упорядочены по релевантности и разбиты на страницы курсором.
+        """
+        try:
+            q = request.query_params.get('q', '').strip()
+            if not q:
+                return Response({
+                    'status': 'error',
+                    'message': 'Параметр q обязателен'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            fields, expand = parse_order_fields(request, parse_expand(request))
+            paginator = self.pagination_class()
+            rows = get_row_serializer(OrderSerializer, expand, fields)
+            queryset = rows.values(search_orders(order_queryset(expand), q), *paginator.ordering)
+            orders = paginator.paginate_queryset(queryset, request, view=self)
+            return paginator.get_paginated_response(rows.serialize(orders))
+        except InvalidQueryParameter as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': f'Ошибка при поиске заказов: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class OrderDetailView(APIView):
     """
     Представление для получения, обновления и удаления заказа
@@ -86,12 +424,22 @@ class OrderDetailView(APIView):
         Получить информацию о заказе по ID
         """
         try:
-            order = get_object_or_404(Order, id=order_id)
-            serializer = OrderSerializer(order)
-            return Response({
+            fields, expand = parse_order_fields(request, parse_expand(request))
+            data = order_detail_data(order_id, expand)
+            # Валидаторы считаются по полному представлению: ETag - версия заказа
+            etag, last_modified = representation_validators('order', data)
+            not_modified = not_modified_response(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+            return set_validators(Response({
                 'status': 'success',
-                'data': serializer.data
-            }, status=status.HTTP_200_OK)
+                'data': prune_fields(data, fields)
+            }, status=status.HTTP_200_OK), etag, last_modified)
+        except InvalidQueryParameter as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Order.DoesNotExist:
             return Response({
                 'status': 'error',
@@ -103,35 +451,59 @@ class OrderDetailView(APIView):
                 'message': f'Ошибка при получении заказа: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @staticmethod
+    def _validators(order):
+        """
+        ETag заказа из БД в обоих представлениях GET (с user_detail и без) и Last-Modified
+        """
+        plain = representation_validators('order', OrderSerializer(order, context={'expand': set()}).data)
+        expanded = representation_validators('order', OrderSerializer(order).data)
+        return [plain[0], expanded[0]], expanded[1]
+
     def put(self, request, order_id):
         """
         Обновить информацию о заказе
         """
         try:
-            order = get_object_or_404(Order, id=order_id)
-            
-            # Проверка существования пользователя при обновлении
-            user_id = request.data.get('user')
-            if user_id and not User.objects.filter(id=user_id).exists():
-                return Response({
-                    'status': 'error',
-                    'message': 'Пользователь с указанным ID не существует'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            serializer = OrderUpdateSerializer(order, data=request.data, partial=True)
-            if serializer.is_valid():
-                serializer.save()
-                return Response({
-                    'status': 'success',
-                    'message': 'Заказ успешно обновлен',
-                    'data': OrderSerializer(order).data
-                }, status=status.HTTP_200_OK)
-            else:
-                return Response({
-                    'status': 'error',
-                    'message': 'Ошибка валидации данных',
-                    'errors': serializer.errors
-                }, status=status.HTTP_400_BAD_REQUEST)
+            lock, orders = precondition_lock(request, Order.objects.all())
+            with lock:
+                order = get_object_or_404(orders, id=order_id)
+
+                # Оптимистичная блокировка через If-Match
+                precondition_failed = precondition_failed_response(
+                    request, lambda: self._validators(order)
+                )
+                if precondition_failed is not None:
+                    # ETag клиента мог прийти из устаревших записей кэша заказа или
+                    # его пользователя: следующий GET построит его из БД
+                    response_cache.invalidate('order', order.id)
+                    response_cache.invalidate('user', order.user_id)
+                    return precondition_failed
+
+                # Проверка существования пользователя при обновлении
+                user_id = request.data.get('user')
+                if user_id and not User.objects.filter(id=user_id).exists():
+                    return Response({
+                        'status': 'error',
+                        'message': 'Пользователь с указанным ID не существует'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+
+                serializer = OrderUpdateSerializer(order, data=request.data, partial=True)
+                if serializer.is_valid():
+                    serializer.save()
+                    data = OrderSerializer(order).data
+                    etag, last_modified = representation_validators('order', data)
+                    return set_validators(Response({
+                        'status': 'success',
+                        'message': 'Заказ успешно обновлен',
+                        'data': data
+                    }, status=status.HTTP_200_OK), etag, last_modified)
+                else:
+                    return Response({
+                        'status': 'error',
+                        'message': 'Ошибка валидации данных',
+                        'errors': serializer.errors
+                    }, status=status.HTTP_400_BAD_REQUEST)
         except Order.DoesNotExist:
             return Response({
                 'status': 'error',
@@ -176,25 +548,47 @@ class UserOrdersView(APIView):
     """
     Представление для получения заказов конкретного пользователя
     """
+    pagination_class = KeysetPagination
     
     def get(self, request, user_id):
         """
-        Получить все заказы пользователя
+        Получить страницу заказов пользователя
         """
         try:
-            # Проверка существования пользователя
-            if not User.objects.filter(id=user_id).exists():
+            # Проверка существования пользователя через кэш ответов: в пакетном
+            # запросе (/api/batch/) его заполняет одна выборка всех пользователей
+            try:
+                response_cache.fetch('user', user_id, lambda: cached_user_data(user_id))
+            except User.DoesNotExist:
                 return Response({
                     'status': 'error',
                     'message': 'Пользователь не найден'
                 }, status=status.HTTP_404_NOT_FOUND)
-            
-            orders = Order.objects.filter(user_id=user_id)
-            serializer = OrderSerializer(orders, many=True)
+
+            fields, expand = parse_order_fields(request, parse_expand(request))
+            filterset = OrderFilterSet(request.query_params)
+            version_fields = order_version_fields(expand)
+            rows = get_row_serializer(OrderSerializer, expand, fields)
+            queryset = rows.values(
+                filterset.filter_queryset(order_queryset(expand)).filter(user_id=user_id),
+                *version_fields, *filterset.ordering_fields,
+            )
+            not_modified = page_not_modified_response(
+                request, self.pagination_class, queryset, version_fields,
+                ordering=filterset.ordering_fields,
+            )
+            if not_modified is not None:
+                return not_modified
+
+            paginator = self.pagination_class(ordering=filterset.ordering_fields)
+            orders = paginator.paginate_queryset(queryset, request, view=self)
+            response = paginator.get_paginated_response(rows.serialize(orders))
+            return set_page_validators(response, request, paginator, orders, version_fields)
+        except InvalidQueryParameter as e:
             return Response({
-                'status': 'success',
-                'data': serializer.data
-            }, status=status.HTTP_200_OK)
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({
                 'status': 'error',
@@ -0,0 +1,66 @@
+"""
+Основа для асинхронных представлений API.
+
+DRF 3.14 не поддерживает async-обработчики в APIView, поэтому async-представления
+наследуются от django.views.View, разбирают JSON сами и отдают тот же
+конверт ответа {'status', 'message', 'data'}, что и синхронные.
+"""
+
+import json
+
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import status
+
+from .renderers import ORJSONRenderer
+
+
+class InvalidJSONBody(Exception):
+    """
+    Тело запроса не является корректным JSON-объектом
+    """
+
+
+class AsyncAPIView(View):
+    """
+    Базовое async-представление: JSON на входе и на выходе, без CSRF
+    """
+    renderer = ORJSONRenderer()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Как и APIView, API не использует сессионную CSRF-защиту
+        view.csrf_exempt = True
+        return view
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        return HttpResponse(
+            self.renderer.render(data),
+            status=status_code,
+            content_type='application/json',
+        )
+
+    def error(self, message, status_code, **extra):
+        return self.render({'status': 'error', 'message': message, **extra}, status_code)
+
+    @staticmethod
+    def parse_json(request):
+        """
+        JSON-объект из тела запроса
+        """
+        try:
+            data = json.loads(request.body or b'{}')
+        except (UnicodeDecodeError, ValueError):
+            raise InvalidJSONBody('Некорректный JSON в теле запроса')
+        if not isinstance(data, dict):
+            raise InvalidJSONBody('Ожидается JSON-объект')
+        return data
+
+    async def http_method_not_allowed(self, request, *args, **kwargs):
+        response = self.error(
+            f'Метод {request.method} не поддерживается',
+            status.HTTP_405_METHOD_NOT_ALLOWED,
+        )
+        response['Allow'] = ', '.join(self._allowed_methods())
+        return response
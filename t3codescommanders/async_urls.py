@@ -0,0 +1,17 @@
+"""
+Маршруты асинхронных представлений API (префикс api/async/).
+"""
+from django.urls import path
+
+from orders.async_views import (
+    AsyncOrderDetailView, AsyncOrderListCreateView, AsyncUserOrdersView,
+)
+from users.async_views import AsyncUserDetailView, AsyncUserListCreateView
+
+urlpatterns = [
+    path('users/', AsyncUserListCreateView.as_view(), name='async-user-list-create'),
+    path('users/<int:user_id>/', AsyncUserDetailView.as_view(), name='async-user-detail'),
+    path('orders/', AsyncOrderListCreateView.as_view(), name='async-order-list-create'),
+    path('orders/<int:order_id>/', AsyncOrderDetailView.as_view(), name='async-order-detail'),
+    path('users/<int:user_id>/orders/', AsyncUserOrdersView.as_view(), name='async-user-orders'),
+]
@@ -0,0 +1,252 @@
+"""
+Пакетные запросы: несколько вызовов API за один HTTP-запрос (POST /api/batch/).
+
+Подзапросы разрешаются корневым URLconf и передаются представлениям
+напрямую, минуя middleware и HTTP: заголовки, cookie и пользователь
+берутся из пакетного запроса. Каждая запись выполняется в своей
+транзакции, которая откатывается, если представление выбросило
+исключение или вернуло 5xx; ошибка одного подзапроса не отменяет остальные.
+
+Записи выполняются по порядку. Идущие подряд чтения (GET, HEAD) между
+ними независимы: одинаковые чтения выполняются один раз, пользователи,
+которых запрашивают user-detail и user-orders, загружаются в кэш ответов
+одной выборкой, а при parallel чтения выполняются в пуле потоков
+(BATCH_MAX_WORKERS) со своими соединениями с БД, которые не учитываются
+в бюджете запросов.
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections, transaction
+from django.http import StreamingHttpResponse
+from django.urls import Resolver404, resolve
+from rest_framework import serializers
+
+from users.views import cached_users_data
+from .cache import response_cache
+from .db.routers import pinned_to_primary, replica_reads
+
+READ_METHODS = frozenset({'GET', 'HEAD'})
+
+# Заголовки ответа подзапроса, которые возвращаются клиенту
+RESPONSE_HEADERS = ('ETag', 'Last-Modified', 'Location', 'Allow')
+
+# Имя URL -> (пространство кэша ответов, параметр маршрута, загрузка пачки объектов)
+PREFETCH = {
+    'user-detail': ('user', 'user_id', cached_users_data),
+    'user-orders': ('user', 'user_id', cached_users_data),
+}
+
+
+class SubRequestSerializer(serializers.Serializer):
+    """
+    Подзапрос пакета: путь с параметрами запроса, метод и JSON-тело
+    """
+    id = serializers.CharField(required=False, max_length=100)
+    method = serializers.ChoiceField(choices=['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE'], default='GET')
+    path = serializers.CharField(max_length=2000)
+    body = serializers.JSONField(required=False)
+
+
+class BatchSerializer(serializers.Serializer):
+    """
+    Пакет подзапросов
+    """
+    requests = SubRequestSerializer(many=True, allow_empty=False)
+    parallel = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(
+                f'Не больше {settings.BATCH_MAX_REQUESTS} подзапросов в пакете'
+            )
+        return value
+
+
+class SubRequest:
+    """
+    Разобранный подзапрос и его место в пакете
+    """
+
+    def __init__(self, index, item):
+        self.index = index
+        self.id = item.get('id', str(index))
+        self.method = item['method']
+        parts = urlsplit(item['path'])
+        self.path = parts.path
+        self.query = parts.query
+        self.body = item.get('body')
+        self.match = None
+        self.error = None
+        try:
+            self.match = resolve(self.path)
+        except Resolver404:
+            self.error = (404, f'Путь не найден: {self.path}')
+            return
+        if not self.path.startswith('/api/') or self.match.url_name == 'batch':
+            self.error = (400, f'Путь недоступен в пакете: {self.path}')
+        elif iscoroutinefunction(self.match.func):
+            self.error = (400, f'Асинхронные представления недоступны в пакете: {self.path}')
+
+    @property
+    def is_read(self):
+        return self.method in READ_METHODS
+
+    @property
+    def read_key(self):
+        return (self.method, self.path, self.query)
+
+
+def build_request(parent, sub):
+    """
+    HttpRequest подзапроса с заголовками, cookie и пользователем пакетного запроса
+    """
+    body = b'' if sub.body is None else json.dumps(sub.body).encode('utf-8')
+    environ = {
+        key: value for key, value in parent.META.items()
+        if key.startswith('HTTP_') or key in ('REMOTE_ADDR', 'SERVER_NAME', 'SERVER_PORT', 'SERVER_PROTOCOL')
+    }
+    # Условные заголовки и Idempotency-Key пакета не относятся к подзапросам
+    for key in (
+        'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE', 'HTTP_IF_MATCH', 'HTTP_IF_UNMODIFIED_SINCE',
+        'HTTP_IDEMPOTENCY_KEY',
+    ):
+        environ.pop(key, None)
+    environ.update({
+        'REQUEST_METHOD': sub.method,
+        'PATH_INFO': sub.path,
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': sub.query,
+        'CONTENT_TYPE': 'application/json' if sub.body is not None else '',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': BytesIO(body),
+        'wsgi.url_scheme': parent.scheme,
+    })
+    request = WSGIRequest(environ)
+    request.resolver_match = sub.match
+    for name in ('user', 'session'):
+        if hasattr(parent, name):
+            setattr(request, name, getattr(parent, name))
+    return request
+
+
+def response_body(response):
+    """
+    Тело ответа подзапроса: данные DRF без рендеринга, JSON или текст
+    """
+    data = getattr(response, 'data', None)
+    if data is not None or response.status_code == 304:
+        return data
+    content = response.content
+    if not content:
+        return None
+    if response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(content)
+    return content.decode(response.charset or 'utf-8', errors='replace')
+
+
+def error_result(sub, code, message):
+    return {'id': sub.id, 'status': code, 'headers': {}, 'body': {'status': 'error', 'message': message}}
+
+
+class BatchExecutor:
+    """
+    Выполнение пакета подзапросов от имени пакетного запроса parent (HttpRequest)
+    """
+
+    def __init__(self, parent, parallel=False):
+        self.parent = parent
+        self.parallel = parallel
+        self.replicas_allowed = bool(settings.DATABASE_REPLICAS) and not pinned_to_primary(parent)
+        self.wrote = False
+
+    def dispatch(self, sub):
+        if sub.error is not None:
+            return error_result(sub, *sub.error)
+        request = build_request(self.parent, sub)
+        try:
+            if sub.is_read:
+                response = sub.match.func(request, *sub.match.args, **sub.match.kwargs)
+            else:
+                with transaction.atomic():
+                    response = sub.match.func(request, *sub.match.args, **sub.match.kwargs)
+                    # Представления отвечают 500 на перехваченные ошибки, часть изменений могла быть записана
+                    if response.status_code >= 500:
+                        transaction.set_rollback(True)
+        except Exception as e:
+            return error_result(sub, 500, f'Ошибка при выполнении подзапроса: {str(e)}')
+        if isinstance(response, StreamingHttpResponse):
+            response.close()
+            return error_result(sub, 400, f'Потоковые ответы недоступны в пакете: {sub.path}')
+        return {
+            'id': sub.id,
+            'status': response.status_code,
+            'headers': {name: response[name] for name in RESPONSE_HEADERS if response.has_header(name)},
+            'body': response_body(response),
+        }
+
+    def dispatch_in_thread(self, sub):
+        try:
+            return self.dispatch(sub)
+        finally:
+            connections.close_all()
+
+    def prefetch(self, reads):
+        """
+        Загрузить в кэш ответов объекты, которые запрашивают чтения, одной выборкой на пространство
+        """
+        pks = {}
+        for sub in reads:
+            if sub.error is None and sub.match.url_name in PREFETCH:
+                namespace, kwarg, load = PREFETCH[sub.match.url_name]
+                pks.setdefault((namespace, load), []).append(sub.match.kwargs[kwarg])
+        for (namespace, load), ids in pks.items():
+            response_cache.prefetch(namespace, ids, load)
+
+    def run_reads(self, reads):
+        """
+        Выполнить независимые чтения; одинаковые выполняются один раз
+        """
+        unique = {}
+        for sub in reads:
+            unique.setdefault(sub.read_key, sub)
+        with replica_reads(self.replicas_allowed):
+            self.prefetch(unique.values())
+            if self.parallel and len(unique) > 1:
+                workers = min(settings.BATCH_MAX_WORKERS, len(unique))
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    # Каждый поток получает копию контекста: разрешение читать с реплик
+                    futures = {
+                        key: executor.submit(copy_context().run, self.dispatch_in_thread, sub)
+                        for key, sub in unique.items()
+                    }
+                    results = {key: future.result() for key, future in futures.items()}
+            else:
+                results = {key: self.dispatch(sub) for key, sub in unique.items()}
+        return [{**results[sub.read_key], 'id': sub.id} for sub in reads]
+
+    def run(self, items):
+        subs = [SubRequest(index, item) for index, item in enumerate(items)]
+        results = []
+        reads = []
+        for sub in subs:
+            if sub.is_read:
+                reads.append(sub)
+                continue
+            if reads:
+                results.extend(self.run_reads(reads))
+                reads = []
+            # После записи клиент должен видеть ее в следующих чтениях пакета
+            self.replicas_allowed = False
+            self.wrote = True
+            results.append(self.dispatch(sub))
+        if reads:
+            results.extend(self.run_reads(reads))
+        return results
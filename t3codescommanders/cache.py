@@ -0,0 +1,295 @@
+"""
+Кэш сериализованных ответов для detail-представлений.
+
+Каждая запись хранится под ключом с версией объекта. Версия - случайный
+токен, который меняется при сохранении или удалении объекта, поэтому
+инвалидация не требует поиска и удаления старых записей: они просто
+перестают читаться и вытесняются по TTL или LRU.
+
+Версия читается до запроса в БД, а новая выставляется после коммита
+транзакции, поэтому данные, прочитанные до изменения, не могут попасть
+в кэш под новой версией.
+
+Реплика (t3codescommanders.db.routers) может вернуть данные до изменения
+и после смены версии, поэтому прочитанное в контексте, где разрешено
+чтение с реплик, сохраняется только под версией старше максимального
+отставания реплик.
+
+Инвалидация видна другим процессам только через общий кэш (бэкенд 'django'
+с Redis или Memcached). Когда процессов несколько (Gunicorn выставляет
+RESPONSE_CACHE_REQUIRE_SHARED), кэш в памяти процесса отключается: иначе
+воркеры, не выполнявшие запись, отдавали бы устаревшие данные до истечения
+RESPONSE_CACHE_TIMEOUT.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+
+from .db.routers import max_staleness
+
+logger = logging.getLogger('t3codescommanders.cache')
+
+
+class LRUCacheBackend:
+    """
+    Кэш в памяти процесса с TTL и вытеснением по числу записей.
+
+    Инвалидация видна только в текущем процессе, поэтому при нескольких
+    процессах-воркерах нужен бэкенд 'django' с общим кэшем (например, Redis).
+    """
+    name = 'lru'
+    shared = False
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DjangoCacheBackend:
+    """
+    Бэкенд поверх кэш-фреймворка Django (settings.CACHES)
+    """
+    name = 'django'
+
+    def __init__(self, alias, timeout):
+        self.cache = caches[alias]
+        self.timeout = timeout
+        # LocMemCache хранит данные в памяти процесса, как и 'lru'
+        self.shared = not isinstance(self.cache, LocMemCache)
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value, self.timeout)
+
+    def clear(self):
+        self.cache.clear()
+
+
+class DummyBackend:
+    """
+    Отключенный кэш: ничего не хранит
+    """
+    name = 'none'
+    shared = True
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def clear(self):
+        pass
+
+
+def create_backend():
+    """
+    Бэкенд по RESPONSE_CACHE_BACKEND; кэш в памяти процесса отключается, если нужен общий
+    """
+    name = settings.RESPONSE_CACHE_BACKEND
+    timeout = settings.RESPONSE_CACHE_TIMEOUT
+    if name == 'lru':
+        backend = LRUCacheBackend(settings.RESPONSE_CACHE_MAX_ENTRIES, timeout)
+    elif name == 'django':
+        backend = DjangoCacheBackend(settings.RESPONSE_CACHE_ALIAS, timeout)
+    elif name == 'none':
+        backend = DummyBackend()
+    else:
+        raise ValueError(f'Неизвестный RESPONSE_CACHE_BACKEND: {name}')
+    if settings.RESPONSE_CACHE_REQUIRE_SHARED and not backend.shared:
+        logger.warning(
+            'Response cache %r is local to the process and is disabled: set CACHE_BACKEND '
+            'to a shared cache (Redis, Memcached) to enable it', name,
+        )
+        return DummyBackend()
+    return backend
+
+
+class ResponseCache:
+    """
+    Версионированный кэш данных сериализаторов по (namespace, pk)
+    """
+    key_prefix = 'response'
+
+    def __init__(self):
+        self._backend = None
+        self.hits = Counter()
+        self.misses = Counter()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = create_backend()
+        return self._backend
+
+    def reset(self):
+        self._backend = None
+        self.hits.clear()
+        self.misses.clear()
+
+    def _version_key(self, namespace, pk):
+        return f'{self.key_prefix}:ver:{namespace}:{pk}'
+
+    def _data_key(self, namespace, pk, version):
+        return f'{self.key_prefix}:data:{namespace}:{pk}:{version}'
+
+    @staticmethod
+    def _new_version():
+        # Время создания версии в токене нужно для проверки в _can_store
+        return f'{time.time():.3f}-{uuid.uuid4().hex}'
+
+    @staticmethod
+    def _can_store(version):
+        """
+        Можно ли сохранить только что прочитанные данные под версией version
+        """
+        staleness = max_staleness()
+        if not staleness:
+            return True
+        created, _, _ = version.partition('-')
+        try:
+            return time.time() - float(created) > staleness
+        except ValueError:
+            return False
+
+    def get_version(self, namespace, pk):
+        """
+        Текущая версия объекта; отсутствующая версия создается заново
+        """
+        key = self._version_key(namespace, pk)
+        version = self.backend.get(key)
+        if version is None:
+            version = self._new_version()
+            self.backend.set(key, version)
+        return version
+
+    def fetch(self, namespace, pk, build):
+        """
+        Данные из кэша или результат build(), сохраненный под текущей версией
+        """
+        version = self.get_version(namespace, pk)
+        key = self._data_key(namespace, pk, version)
+        data = self.backend.get(key)
+        if data is not None:
+            self.hits[namespace] += 1
+            return data
+
+        self.misses[namespace] += 1
+        data = dict(build())
+        if self._can_store(version):
+            self.backend.set(key, data)
+        return data
+
+    async def afetch(self, namespace, pk, build):
+        """
+        Асинхронный вариант fetch: build - корутинная функция.
+
+        Обращения к бэкенду остаются синхронными: для 'lru' это память
+        процесса, для 'django' - клиент кэша без собственного цикла событий.
+        """
+        version = self.get_version(namespace, pk)
+        key = self._data_key(namespace, pk, version)
+        data = self.backend.get(key)
+        if data is not None:
+            self.hits[namespace] += 1
+            return data
+
+        self.misses[namespace] += 1
+        data = dict(await build())
+        if self._can_store(version):
+            self.backend.set(key, data)
+        return data
+
+    def prefetch(self, namespace, pks, load):
+        """
+        Заполнить кэш для pks, которых в нем нет, одним вызовом load(missing) -> {pk: data}.
+
+        Объекты, которых нет в результате load, не кэшируются: их fetch
+        выполнит обычный build и получит ошибку отсутствия.
+        """
+        versions = {pk: self.get_version(namespace, pk) for pk in dict.fromkeys(pks)}
+        missing = [
+            pk for pk, version in versions.items()
+            if self.backend.get(self._data_key(namespace, pk, version)) is None
+        ]
+        if not missing:
+            return
+        for pk, data in load(missing).items():
+            version = versions[pk]
+            if self._can_store(version):
+                self.backend.set(self._data_key(namespace, pk, version), dict(data))
+
+    def invalidate(self, namespace, pk):
+        self.backend.set(self._version_key(namespace, pk), self._new_version())
+
+    def invalidate_on_commit(self, namespace, pk):
+        """
+        Сменить версию объекта после коммита текущей транзакции
+        """
+        transaction.on_commit(lambda: self.invalidate(namespace, pk))
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        namespaces = sorted(set(self.hits) | set(self.misses))
+        data = {
+            'backend': self.backend.name,
+            'namespaces': {
+                namespace: {'hits': self.hits[namespace], 'misses': self.misses[namespace]}
+                for namespace in namespaces
+            },
+        }
+        if isinstance(self.backend, LRUCacheBackend):
+            data['entries'] = len(self.backend)
+            data['max_entries'] = self.backend.max_entries
+        return data
+
+
+response_cache = ResponseCache()
+
+
+@receiver(setting_changed)
+def reset_response_cache(setting, **kwargs):
+    if setting.startswith('RESPONSE_CACHE_') or setting == 'CACHES':
+        response_cache.reset()
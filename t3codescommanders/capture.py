@@ -0,0 +1,197 @@
+"""
+Запись трафика API в JSONL и общие функции его воспроизведения.
+
+RequestCaptureMiddleware пишет по строке на запрос: время, метод, путь,
+Content-Type, тело, код ответа, длительность и id созданных объектов.
+Каждый процесс сервера пишет в свой файл (requests.<pid>.jsonl), файлы
+ротируются по размеру (requests.<pid>.jsonl.1, ...). Команда
+replay_requests читает файлы всех процессов, упорядочивает записи по
+времени и заменяет id, созданные при записи, на id объектов, созданных
+при воспроизведении.
+"""
+
+import json
+import os
+import re
+import threading
+from functools import lru_cache
+from logging import makeLogRecord
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+REDACTED = '[REDACTED]'
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/jsonl')
+
+# /api/users/42/..., /api/async/orders/7/ -> вид объекта и id
+OBJECT_PATH_RE = re.compile(r'/(users|orders)/(\d+)(?=/)')
+# Создающий запрос -> вид созданных объектов
+CREATE_PATH_RE = re.compile(r'^/api/(?:async/)?(users|orders)/(?:bulk/)?$')
+# Поля тела, ссылающиеся на объекты другого вида
+REFERENCE_FIELDS = {'user': 'users'}
+
+
+def process_capture_path(path, pid=None):
+    """
+    Файл записи процесса pid (по умолчанию текущего): requests.jsonl -> requests.<pid>.jsonl
+    """
+    path = Path(path)
+    return str(path.with_name(f'{path.stem}.{pid or os.getpid()}{path.suffix}'))
+
+
+@lru_cache(maxsize=None)
+def get_capture_handler(path, max_bytes, backup_count):
+    """
+    Один обработчик с ротацией на файл, чтобы потоки процесса не ротировали файл независимо.
+
+    RotatingFileHandler не согласует ротацию между процессами: воркеры,
+    пишущие в один файл, переименовывают его друг у друга и теряют строки,
+    поэтому path должен принадлежать одному процессу (process_capture_path).
+    """
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    return RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+
+
+def write_record(handler, record):
+    handler.handle(makeLogRecord({'msg': json.dumps(record, ensure_ascii=False, default=str)}))
+
+
+def redact(value, fields):
+    """
+    Заменить значения полей fields (на любой глубине) на REDACTED
+    """
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if key.lower() in fields else redact(item, fields)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(item, fields) for item in value]
+    return value
+
+
+def redact_body(body, content_type, fields):
+    """
+    Тело запроса для записи: JSON-объекты и массивы сохраняются разобранными, NDJSON - построчно
+    """
+    if content_type == 'application/json':
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return body
+        return redact(data, fields) if isinstance(data, (dict, list)) else body
+    if content_type in NDJSON_CONTENT_TYPES:
+        lines = []
+        for line in body.splitlines(keepends=True):
+            try:
+                data = json.loads(line)
+            except ValueError:
+                lines.append(line)
+                continue
+            lines.append(json.dumps(redact(data, fields), ensure_ascii=False) + '\n')
+        return ''.join(lines)
+    return body
+
+
+def redact_path(full_path, fields):
+    parts = urlsplit(full_path)
+    if not parts.query:
+        return full_path
+    query = [
+        (key, REDACTED if key.lower() in fields else value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+    ]
+    return f'{parts.path}?{urlencode(query)}'
+
+
+def response_data(response):
+    """
+    Тело ответа: данные DRF или разобранный JSON ответа async-представления; None для потоковых и не-JSON ответов
+    """
+    data = getattr(response, 'data', None)
+    if data is not None or response.streaming:
+        return data
+    if not response.get('Content-Type', '').startswith('application/json'):
+        return None
+    try:
+        return json.loads(response.content)
+    except ValueError:
+        return None
+
+
+def created_ids(path, method, status_code, data):
+    """
+    Вид и id объектов, созданных запросом; для массового создания - по позициям, None для неудачных
+    """
+    match = CREATE_PATH_RE.match(path)
+    if method != 'POST' or match is None or status_code not in (201, 207):
+        return None
+    if isinstance(data, dict) and 'id' in data:
+        return match.group(1), [data['id']]
+    if isinstance(data, list):
+        return match.group(1), [item.get('id') if isinstance(item, dict) else None for item in data]
+    return None
+
+
+class IdMap:
+    """
+    Соответствие id объектов из записи и id, созданных при воспроизведении.
+
+    Запрос, ссылающийся на объект, созданный другим запросом записи, ждет
+    его завершения: воркеры выполняют запросы параллельно.
+    """
+
+    def __init__(self, records, timeout):
+        self.timeout = timeout
+        self._ids = {}
+        self._pending = {}
+        for record in records:
+            for key in self._created_keys(record):
+                self._pending[key] = threading.Event()
+
+    @staticmethod
+    def _created_keys(record):
+        created = record.get('created')
+        if not created:
+            return []
+        kind = created['kind']
+        return [(kind, original) for original in created['ids'] if original is not None]
+
+    def resolve(self, kind, original):
+        event = self._pending.get((kind, original))
+        if event is None:
+            return original
+        event.wait(self.timeout)
+        return self._ids.get((kind, original), original)
+
+    def remember(self, record, status_code, data):
+        """
+        Запомнить id, созданные при воспроизведении record, и разбудить ждущие запросы
+        """
+        created = record.get('created')
+        if not created:
+            return
+        replayed = created_ids(urlsplit(record['path']).path, record['method'], status_code, data)
+        replayed_ids = replayed[1] if replayed else []
+        for index, original in enumerate(created['ids']):
+            if original is None:
+                continue
+            if index < len(replayed_ids) and replayed_ids[index] is not None:
+                self._ids[(created['kind'], original)] = replayed_ids[index]
+            self._pending[(created['kind'], original)].set()
+
+    def path(self, path):
+        return OBJECT_PATH_RE.sub(
+            lambda m: f'/{m.group(1)}/{self.resolve(m.group(1), int(m.group(2)))}', path
+        )
+
+    def body(self, body):
+        if isinstance(body, list):
+            return [self.body(item) for item in body]
+        if not isinstance(body, dict):
+            return body
+        return {
+            key: self.resolve(REFERENCE_FIELDS[key], value)
+            if key in REFERENCE_FIELDS and isinstance(value, int) and not isinstance(value, bool) else value
+            for key, value in body.items()
+        }
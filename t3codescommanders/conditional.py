@@ -0,0 +1,172 @@
+"""
+Условные запросы: ETag, Last-Modified, 304 Not Modified и If-Match.
+
+Валидаторы строятся по updated_at объектов, поэтому ответ 304 решается
+по уже закэшированным данным или по легкому запросу ключей страницы,
+без сериализации.
+"""
+
+import hashlib
+from contextlib import nullcontext
+
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+CONDITIONAL_HEADERS = ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE')
+
+PRECONDITION_HEADERS = ('HTTP_IF_MATCH', 'HTTP_IF_UNMODIFIED_SINCE')
+
+
+def make_etag(*parts):
+    """
+    Сильный ETag из произвольных частей
+    """
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'"{digest}"'
+
+
+def has_conditional_headers(request):
+    return any(header in request.META for header in CONDITIONAL_HEADERS)
+
+
+def representation_validators(namespace, data):
+    """
+    ETag и Last-Modified сериализованного объекта и вложенных в него объектов
+    """
+    stamps = [data['updated_at']]
+    stamps += [
+        value['updated_at'] for value in data.values()
+        if isinstance(value, dict) and 'updated_at' in value
+    ]
+    etag = make_etag(namespace, data['id'], *stamps)
+    return etag, max(parse_datetime(stamp) for stamp in stamps)
+
+
+def _resolve(row, field):
+    if isinstance(row, dict):
+        return row[field]
+    for name in field.split('__'):
+        row = getattr(row, name)
+    return row
+
+
+def page_validators(request, rows, fields, has_next):
+    """
+    ETag и Last-Modified страницы списка.
+
+    fields - ('id', 'updated_at', ...): первый элемент - ключ строки,
+    остальные - метки времени строки и вложенных объектов. Строки могут быть
+    экземплярами моделей или словарями из values().
+    """
+    versions = [tuple(_resolve(row, field) for field in fields) for row in rows]
+    etag = make_etag(request.get_full_path(), has_next, *versions)
+    stamps = [stamp for version in versions for stamp in version[1:]]
+    return etag, max(stamps) if stamps else None
+
+
+def page_not_modified_response(request, paginator_class, queryset, fields, ordering=None):
+    """
+    Ответ 304 для страницы списка по легкому запросу ключей страницы или None.
+
+    Запрос выполняется только при наличии условных заголовков.
+    """
+    if not has_conditional_headers(request):
+        return None
+    probe = paginator_class(ordering=ordering)
+    rows = probe.paginate_queryset(_probe_queryset(probe, queryset, fields), request)
+    etag, last_modified = page_validators(request, rows, fields, probe.next_position is not None)
+    return not_modified_response(request, etag, last_modified)
+
+
+async def apage_not_modified_response(request, paginator_class, queryset, fields, ordering=None):
+    """
+    Асинхронный вариант page_not_modified_response
+    """
+    if not has_conditional_headers(request):
+        return None
+    probe = paginator_class(ordering=ordering)
+    rows = await probe.apaginate_queryset(_probe_queryset(probe, queryset, fields), request)
+    etag, last_modified = page_validators(request, rows, fields, probe.next_position is not None)
+    return not_modified_response(request, etag, last_modified)
+
+
+def _probe_queryset(paginator, queryset, fields):
+    names = set(fields) | {name.lstrip('-') for name in paginator.ordering}
+    return queryset.values(*names)
+
+
+def set_page_validators(response, request, paginator, rows, fields):
+    etag, last_modified = page_validators(request, rows, fields, paginator.next_position is not None)
+    return set_validators(response, etag, last_modified)
+
+
+def not_modified_response(request, etag, last_modified):
+    """
+    Ответ 304 (или 412 для несовпавшего If-Match) либо None
+    """
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def has_preconditions(request):
+    return any(header in request.META for header in PRECONDITION_HEADERS)
+
+
+def precondition_lock(request, queryset):
+    """
+    Транзакция и queryset для чтения изменяемой строки с учетом If-Match.
+
+    С предусловием строка читается SELECT ... FOR UPDATE в транзакции, которая
+    охватывает и запись: параллельный запрос с тем же ETag ждет фиксации,
+    перечитывает строку и получает 412. Без предусловия блокировка не нужна.
+    """
+    if not has_preconditions(request):
+        return nullcontext(), queryset
+    return transaction.atomic(), queryset.select_for_update()
+
+
+def precondition_failed_response(request, get_validators):
+    """
+    Ответ 412 для изменяющего запроса или None.
+
+    get_validators() возвращает (список текущих ETag ресурса, Last-Modified) и
+    вызывается только при наличии If-Match или If-Unmodified-Since.
+    """
+    if not has_preconditions(request):
+        return None
+    etags, last_modified = get_validators()
+
+    if_match = request.META.get('HTTP_IF_MATCH')
+    if if_match:
+        client_etags = parse_etags(if_match)
+        if '*' not in client_etags and not set(client_etags) & set(etags):
+            return _precondition_failed()
+
+    if_unmodified_since = parse_http_date_safe(request.META.get('HTTP_IF_UNMODIFIED_SINCE', ''))
+    if if_unmodified_since is not None and int(last_modified.timestamp()) > if_unmodified_since:
+        return _precondition_failed()
+    return None
+
+
+def _precondition_failed():
+    return Response({
+        'status': 'error',
+        'message': 'Ресурс был изменен после получения, запросите его заново'
+    }, status=status.HTTP_412_PRECONDITION_FAILED)
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
@@ -0,0 +1,30 @@
+"""
+Операции миграций, зависящие от СУБД.
+"""
+
+from django.contrib.postgres.indexes import PostgresIndex
+from django.contrib.postgres.operations import AddIndexConcurrently as PostgresAddIndexConcurrently
+from django.db.migrations import AddIndex
+
+
+class AddIndexConcurrently(PostgresAddIndexConcurrently):
+    """
+    CREATE INDEX CONCURRENTLY на PostgreSQL и обычный AddIndex на остальных СУБД.
+
+    Индекс строится без блокировки записи в таблицу, поэтому миграция
+    с этой операцией должна быть объявлена с atomic = False. Индексы,
+    существующие только в PostgreSQL (GIN, GiST и т.п.), на других СУБД
+    не создаются.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        if not isinstance(self.index, PostgresIndex):
+            return AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        if not isinstance(self.index, PostgresIndex):
+            return AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
@@ -0,0 +1,207 @@
+"""
+Бэкенд PostgreSQL с пулом соединений внутри процесса-воркера.
+
+Django 4.2 не умеет пулить соединения, а CONN_MAX_AGE держит по одному
+соединению на поток. Этот бэкенд берет соединение из пула при открытии и
+возвращает его при закрытии, поэтому рукопожатие TCP и аутентификация
+выполняются только при создании новых соединений пула.
+
+Настройки пула задаются ключом POOL в DATABASES:
+
+    'POOL': {
+        'MIN_SIZE': 1,         # соединений, открываемых заранее
+        'MAX_SIZE': 10,        # предел соединений на процесс
+        'MAX_AGE': 600,        # секунд жизни соединения, 0 - без ограничения
+        'TIMEOUT': 5,          # секунд ожидания свободного соединения
+        'HEALTH_CHECK': True,  # проверять соединение при выдаче из пула
+    }
+
+Пул создается отдельно в каждом процессе (по PID), поэтому безопасен для
+воркеров Gunicorn, в том числе с preload_app.
+"""
+
+import os
+import threading
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from django.db.utils import OperationalError
+from psycopg2 import extensions
+
+POOL_DEFAULTS = {
+    'MIN_SIZE': 1,
+    'MAX_SIZE': 10,
+    'MAX_AGE': 0,
+    'TIMEOUT': 5,
+    'HEALTH_CHECK': True,
+}
+
+
+class ConnectionPool:
+    """
+    Потокобезопасный пул соединений psycopg2 с ограничением размера,
+    ожиданием свободного соединения, сроком жизни и проверкой при выдаче
+    """
+
+    def __init__(self, min_size, max_size, max_age, timeout, health_check):
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ImproperlyConfigured('Некорректный размер пула: нужно 0 <= MIN_SIZE <= MAX_SIZE, MAX_SIZE >= 1')
+        self.min_size = min_size
+        self.max_age = max_age
+        self.timeout = timeout
+        self.health_check = health_check
+        self._idle = []
+        self._created = {}
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self.max_size = max_size
+
+    def _open(self, connect):
+        connection = connect()
+        self._created[id(connection)] = time.monotonic()
+        return connection
+
+    def _discard(self, connection):
+        self._created.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _expired(self, connection):
+        if not self.max_age:
+            return False
+        return time.monotonic() - self._created.get(id(connection), 0) > self.max_age
+
+    @staticmethod
+    def _is_usable(connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except base.Database.Error:
+            return False
+        return True
+
+    def getconn(self, connect):
+        """
+        Свободное соединение из пула или новое через connect(), если пул еще не заполнен
+        """
+        if len(self._created) < self.min_size:
+            with self._lock:
+                # Первое обращение процесса заранее открывает MIN_SIZE соединений
+                while len(self._created) < self.min_size:
+                    self._idle.append(self._open(connect))
+
+        if not self._slots.acquire(timeout=self.timeout):
+            raise OperationalError(
+                f'Нет свободных соединений в пуле за {self.timeout} с (MAX_SIZE={self.max_size})'
+            )
+        try:
+            while True:
+                with self._lock:
+                    connection = self._idle.pop() if self._idle else None
+                if connection is None:
+                    return self._open(connect)
+                if connection.closed or self._expired(connection):
+                    self._discard(connection)
+                    continue
+                if self.health_check and not self._is_usable(connection):
+                    self._discard(connection)
+                    continue
+                return connection
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, connection):
+        """
+        Вернуть соединение в пул; сломанные и устаревшие соединения закрываются
+        """
+        try:
+            if connection.closed or self._expired(connection):
+                self._discard(connection)
+                return
+            status = connection.get_transaction_status()
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    self._discard(connection)
+                    return
+                try:
+                    connection.rollback()
+                except base.Database.Error:
+                    self._discard(connection)
+                    return
+            with self._lock:
+                self._idle.append(connection)
+        finally:
+            self._slots.release()
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self._discard(connection)
+
+    def stats(self):
+        with self._lock:
+            return {'idle': len(self._idle), 'open': len(self._created), 'max_size': self.max_size}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict, conn_params):
+    """
+    Пул для псевдонима БД и параметров подключения в текущем процессе.
+
+    Параметры входят в ключ, чтобы смена NAME (например, на тестовую БД)
+    не выдавала соединения к прежней базе.
+    """
+    key = (os.getpid(), alias, tuple(sorted((name, str(value)) for name, value in conn_params.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            options = {**POOL_DEFAULTS, **settings_dict.get('POOL', {})}
+            pool = ConnectionPool(
+                min_size=options['MIN_SIZE'],
+                max_size=options['MAX_SIZE'],
+                max_age=options['MAX_AGE'],
+                timeout=options['TIMEOUT'],
+                health_check=options['HEALTH_CHECK'],
+            )
+            _pools[key] = pool
+        return pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    DatabaseWrapper PostgreSQL, который берет соединения из пула процесса
+    """
+
+    def get_new_connection(self, conn_params):
+        self.pool = get_pool(self.alias, self.settings_dict, conn_params)
+        connection = self.pool.getconn(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+        # Для соединения из пула уровень изоляции выставлен при его создании
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = base.IsolationLevel(
+            options.get('isolation_level', base.IsolationLevel.READ_COMMITTED)
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection)
+
+
+def close_pools():
+    """
+    Закрыть свободные соединения всех пулов текущего процесса
+    """
+    pid = os.getpid()
+    with _pools_lock:
+        pools = [pool for key, pool in _pools.items() if key[0] == pid]
+    for pool in pools:
+        pool.closeall()
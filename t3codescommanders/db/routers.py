@@ -0,0 +1,258 @@
+"""
+Чтение с реплик PostgreSQL с гарантией чтения своих записей.
+
+ReplicaRouter подключается в settings.DATABASE_ROUTERS, когда заданы
+реплики (DB_REPLICAS). Все записи и по умолчанию все чтения идут в
+default; на реплики уходят только чтения внутри replica_reads(), то есть
+безопасные запросы (GET, HEAD, OPTIONS), которые ReplicaRoutingMiddleware
+разрешила читать с реплик. Фоновые задачи, команды и миграции всегда
+работают с default.
+
+Клиент, выполнивший небезопасный запрос, получает cookie с временем
+окончания закрепления и следующие REPLICA_PIN_SECONDS секунд читает с
+default, поэтому видит собственные изменения, даже если реплика отстает.
+
+Состояние реплик проверяет фоновый поток процесса каждые
+REPLICA_CHECK_INTERVAL секунд: недоступная реплика и реплика с
+отставанием больше REPLICA_MAX_LAG секунд исключаются из выбора, пока
+следующая проверка не покажет обратное. Если исправных реплик нет, чтения
+идут в default. Запрос, начатый на реплике, которая отказала до ближайшей
+проверки, завершается ошибкой.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger('t3codescommanders.replicas')
+
+# Состояние реплики PostgreSQL: в восстановлении ли она, применен ли весь
+# полученный WAL, идет ли прием WAL с основной БД и сколько секунд назад
+# применена последняя транзакция. Статус приемника виден ролям с правами
+# pg_read_all_stats (pg_monitor); без них он NULL, и отставание считается
+# по времени последней транзакции
+REPLICA_STATE_SQL = """
+SELECT
+    pg_is_in_recovery(),
+    pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn(),
+    EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming'),
+    EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+"""
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def replica_reads(allowed=True):
+    """
+    Разрешить (или запретить) чтение с реплик в текущем контексте
+    """
+    token = _replica_reads.set(allowed)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_reads_allowed():
+    return _replica_reads.get()
+
+
+def pinned_to_primary(request):
+    """
+    Закреплен ли клиент за default после недавнего небезопасного запроса (cookie REPLICA_PIN_COOKIE)
+    """
+    try:
+        pinned_until = float(request.COOKIES.get(settings.REPLICA_PIN_COOKIE, 0))
+    except ValueError:
+        return False
+    return pinned_until > time.time()
+
+
+def max_staleness():
+    """
+    Насколько данные, прочитанные в текущем контексте, могут отставать от default, секунды
+    """
+    if not replica_reads_allowed() or not settings.DATABASE_REPLICAS:
+        return 0
+    return settings.REPLICA_MAX_LAG + settings.REPLICA_CHECK_INTERVAL
+
+
+def lag_from_state(in_recovery, caught_up, streaming, replay_age):
+    """
+    Отставание реплики в секундах по строке REPLICA_STATE_SQL.
+
+    Реплика, которая принимает WAL и применила все полученное, не отстает,
+    даже если последняя транзакция на основной БД была давно. Без приема
+    WAL (приемник отключен от основной БД) совпадение LSN ничего не значит:
+    отставание - время с последней примененной транзакции, а если ее нет,
+    реплика считается безнадежно отставшей.
+    """
+    if not in_recovery:
+        return 0.0
+    if streaming and caught_up:
+        return 0.0
+    if replay_age is None:
+        return float('inf')
+    return max(float(replay_age), 0.0)
+
+
+def replica_lag(alias):
+    """
+    Отставание реплики alias в секундах; ошибка подключения пробрасывается
+    """
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor != 'postgresql':
+                # Файлы SQLite не реплицируются: достаточно проверить, что база открывается
+                cursor.execute('SELECT 1')
+                return 0.0
+            cursor.execute(REPLICA_STATE_SQL)
+            return lag_from_state(*cursor.fetchone())
+    except DatabaseError:
+        # Следующая проверка откроет соединение заново
+        connection.close()
+        raise
+
+
+class ReplicaSet:
+    """
+    Реплики процесса и их состояние по последней проверке.
+
+    До первой проверки реплика считается неисправной. measure(alias)
+    возвращает отставание в секундах или выбрасывает DatabaseError.
+    """
+
+    def __init__(self, aliases, max_lag, interval, measure=replica_lag):
+        self.aliases = list(aliases)
+        self.max_lag = max_lag
+        self.interval = interval
+        self.measure = measure
+        self.lags = {}
+        self._healthy = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def check(self):
+        """
+        Проверить все реплики и обновить список исправных
+        """
+        healthy = []
+        for alias in self.aliases:
+            try:
+                lag = self.measure(alias)
+            except DatabaseError as exc:
+                lag = None
+                if self.lags.get(alias, 0) is not None:
+                    logger.warning('Replica %s is unavailable: %s', alias, exc)
+            else:
+                if lag > self.max_lag and (self.lags.get(alias) or 0) <= self.max_lag:
+                    logger.warning('Replica %s lags %.1f s > %.1f s', alias, lag, self.max_lag)
+            self.lags[alias] = lag
+            if lag is not None and lag <= self.max_lag:
+                healthy.append(alias)
+        with self._lock:
+            self._healthy = healthy
+        return healthy
+
+    def healthy(self):
+        self.ensure_started()
+        with self._lock:
+            return list(self._healthy)
+
+    def choose(self):
+        """
+        Случайная исправная реплика или None
+        """
+        healthy = self.healthy()
+        return random.choice(healthy) if healthy else None
+
+    def ensure_started(self):
+        """
+        Запустить поток проверок в текущем процессе (после fork поток нужно создать заново)
+        """
+        if self._pid == os.getpid() or not self.aliases:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Состояние родительского процесса после fork могло устареть
+                self._healthy = []
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='replica-health', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                try:
+                    self.check()
+                except Exception:
+                    logger.exception('Replica health check failed')
+                if self._stop.wait(self.interval):
+                    break
+        finally:
+            connections.close_all()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._pid = None
+
+
+_replica_set = None
+_replica_set_lock = threading.Lock()
+
+
+def get_replica_set():
+    global _replica_set
+    with _replica_set_lock:
+        if _replica_set is None:
+            _replica_set = ReplicaSet(
+                settings.DATABASE_REPLICAS, settings.REPLICA_MAX_LAG, settings.REPLICA_CHECK_INTERVAL,
+            )
+        return _replica_set
+
+
+class ReplicaRouter:
+    """
+    Роутер БД: записи и чтения вне replica_reads() - в default, остальные чтения - на исправную реплику
+    """
+
+    def __init__(self, replica_set=None):
+        self._replica_set = replica_set
+
+    @property
+    def replica_set(self):
+        return self._replica_set or get_replica_set()
+
+    def db_for_read(self, model, **hints):
+        if not replica_reads_allowed():
+            return DEFAULT_DB_ALIAS
+        # Внутри транзакции на default читаются ее же незафиксированные данные
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return self.replica_set.choose() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и default
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
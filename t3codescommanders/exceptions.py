@@ -0,0 +1,9 @@
+"""
+Общие исключения API.
+"""
+
+
+class InvalidQueryParameter(Exception):
+    """
+    Некорректное значение параметра строки запроса
+    """
@@ -0,0 +1,160 @@
+"""
+Разбор параметров фильтрации из строки запроса и декларативные фильтры списков.
+"""
+
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .exceptions import InvalidQueryParameter
+
+
+def parse_int_param(params, name, min_value=None):
+    """
+    Целочисленный параметр запроса или None, если он не передан
+    """
+    raw = params.get(name)
+    if raw in (None, ''):
+        return None
+    try:
+        value = int(raw)
+    except ValueError:
+        raise InvalidQueryParameter(f'Параметр {name} должен быть целым числом')
+    if min_value is not None and value < min_value:
+        raise InvalidQueryParameter(f'Параметр {name} должен быть не меньше {min_value}')
+    return value
+
+
+def parse_datetime_param(params, name):
+    """
+    Дата или дата со временем в ISO 8601 как aware datetime или None.
+
+    Дата без времени означает начало суток в текущем часовом поясе.
+    """
+    raw = params.get(name)
+    if raw in (None, ''):
+        return None
+    try:
+        value = parse_datetime(raw)
+        if value is None:
+            date = parse_date(raw)
+            if date is not None:
+                value = datetime.combine(date, time.min)
+    except ValueError:
+        value = None
+    if value is None:
+        raise InvalidQueryParameter(f'Параметр {name} должен быть датой в формате ISO 8601')
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+class Filter:
+    """
+    Фильтр списка: значение параметра запроса подставляется в lookup
+    """
+
+    def __init__(self, lookup):
+        self.lookup = lookup
+
+    def parse(self, params, name):
+        raise NotImplementedError
+
+
+class IntegerFilter(Filter):
+    def __init__(self, lookup, min_value=None):
+        super().__init__(lookup)
+        self.min_value = min_value
+
+    def parse(self, params, name):
+        return parse_int_param(params, name, min_value=self.min_value)
+
+
+class DateTimeFilter(Filter):
+    def parse(self, params, name):
+        return parse_datetime_param(params, name)
+
+
+class ChoiceFilter(Filter):
+    def __init__(self, lookup, choices):
+        super().__init__(lookup)
+        self.choices = tuple(choices)
+
+    def parse(self, params, name):
+        raw = params.get(name)
+        if raw in (None, ''):
+            return None
+        if raw not in self.choices:
+            raise InvalidQueryParameter(f'Параметр {name} должен быть одним из: {", ".join(self.choices)}')
+        return raw
+
+
+class Ordering:
+    """
+    Допустимая сортировка списка и фильтры, которые обслуживает ее индекс.
+
+    where - условия, которые всегда добавляются к этой сортировке, например
+    исключение NULL для частичного индекса.
+    """
+
+    def __init__(self, fields, filters=(), where=None):
+        self.fields = tuple(fields)
+        self.filters = frozenset(filters)
+        self.where = where or {}
+
+
+class ListFilterSet:
+    """
+    Белый список фильтров и сортировок списка.
+
+    filters - {параметр: Filter}, orderings - {значение ?ordering=: Ordering}.
+    Каждой сортировке соответствует индекс, и с ней разрешены только фильтры
+    из Ordering.filters, поэтому любая допустимая комбинация параметров
+    выполняется по индексу. Без ?ordering= выбирается default_ordering или
+    первая сортировка, совместимая с переданными фильтрами.
+    """
+    filters = {}
+    orderings = {}
+    default_ordering = None
+    ordering_param = 'ordering'
+
+    def __init__(self, params, default_ordering=None):
+        self.values = {}
+        for name, list_filter in self.filters.items():
+            value = list_filter.parse(params, name)
+            if value is not None:
+                self.values[name] = value
+        self.ordering = self._resolve_ordering(
+            params.get(self.ordering_param), default_ordering or self.default_ordering
+        )
+
+    def _resolve_ordering(self, requested, default):
+        used = set(self.values)
+        if requested:
+            if requested not in self.orderings:
+                raise InvalidQueryParameter(
+                    f'Недопустимое значение {self.ordering_param}: {requested}. '
+                    f'Допустимо: {", ".join(self.orderings)}'
+                )
+            unsupported = used - self.orderings[requested].filters
+            if unsupported:
+                raise InvalidQueryParameter(
+                    f'Фильтры {", ".join(sorted(unsupported))} нельзя сочетать '
+                    f'с {self.ordering_param}={requested}'
+                )
+            return requested
+
+        for name in [name for name in (default, *self.orderings) if name]:
+            if used <= self.orderings[name].filters:
+                return name
+        raise InvalidQueryParameter(f'Фильтры {", ".join(sorted(used))} нельзя использовать вместе')
+
+    @property
+    def ordering_fields(self):
+        return self.orderings[self.ordering].fields
+
+    def filter_queryset(self, queryset):
+        return queryset.filter(**self.orderings[self.ordering].where, **{
+            self.filters[name].lookup: value for name, value in self.values.items()
+        })
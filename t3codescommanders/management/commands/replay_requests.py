@@ -0,0 +1,185 @@
+import http.client
+import json
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from t3codescommanders.capture import IdMap
+
+
+class Command(BaseCommand):
+    """Django command to replay captured API traffic against a running server"""
+
+    help = 'Воспроизведение запросов, записанных RequestCaptureMiddleware, в N параллельных воркеров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='Файлы записи всех процессов (captures/requests.*.jsonl*), порядок не важен')
+        parser.add_argument('--target', default='http://127.0.0.1:8000', help='Адрес сервера')
+        parser.add_argument('--workers', type=int, default=8, help='Параллельных соединений')
+        parser.add_argument(
+            '--speed', type=float, default=1.0,
+            help='Ускорение относительно исходного темпа (2 - вдвое быстрее, 0 - без пауз)',
+        )
+        parser.add_argument('--limit', type=int, default=None, help='Воспроизвести не больше N запросов')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Таймаут запроса, секунд')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers должен быть положительным')
+        if options['speed'] < 0:
+            raise CommandError('--speed не может быть отрицательным')
+        target = urlsplit(options['target'])
+        if target.scheme not in ('http', 'https') or not target.hostname:
+            raise CommandError(f'Некорректный адрес сервера: {options["target"]}')
+
+        records = self.read_records(options['files'], options['limit'])
+        replayable = [record for record in records if 'body_omitted' not in record]
+        skipped = len(records) - len(replayable)
+        if not replayable:
+            raise CommandError('Нет запросов для воспроизведения')
+
+        replay = Replay(target, IdMap(replayable, options['timeout']), options['timeout'])
+        started = time.monotonic()
+        lag = replay.run(replayable, options['workers'], options['speed'])
+        elapsed = time.monotonic() - started
+
+        latencies = sorted(replay.latencies)
+        self.stdout.write(
+            f'Отправлено {len(latencies) + replay.errors} за {elapsed:.1f} с '
+            f'({(len(latencies) + replay.errors) / elapsed:.1f} запросов/с), пропущено {skipped} (тело не записано)'
+        )
+        if latencies:
+            self.stdout.write(
+                f'Задержка: p50 {percentile(latencies, 0.50) * 1000:.1f} мс, '
+                f'p95 {percentile(latencies, 0.95) * 1000:.1f} мс, p99 {percentile(latencies, 0.99) * 1000:.1f} мс'
+            )
+        self.stdout.write(f'Коды ответа: {dict(sorted(replay.statuses.items()))}')
+        self.stdout.write(f'Отставание от расписания: до {lag * 1000:.0f} мс')
+        message = f'Ошибок соединения: {replay.errors}, коды ответа отличаются от записи: {replay.mismatches}'
+        if replay.errors or replay.mismatches:
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
+
+    def read_records(self, files, limit):
+        records = []
+        for path in files:
+            try:
+                with open(path, encoding='utf-8') as stream:
+                    for line_no, line in enumerate(stream, start=1):
+                        if not line.strip():
+                            continue
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            raise CommandError(f'{path}:{line_no}: некорректный JSON')
+                        record['offset'] = datetime.fromisoformat(record['ts']).timestamp()
+                        records.append(record)
+            except OSError as e:
+                raise CommandError(f'Не удалось прочитать {path}: {e}')
+        records.sort(key=lambda record: record['offset'])
+        return records[:limit] if limit is not None else records
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Replay:
+    """
+    Воркеры с постоянными соединениями и очередь запросов, заполняемая по расписанию записи
+    """
+
+    def __init__(self, target, ids, timeout):
+        self.target = target
+        self.ids = ids
+        self.timeout = timeout
+        self.latencies = []
+        self.statuses = Counter()
+        self.errors = 0
+        self.mismatches = 0
+        self._lock = threading.Lock()
+
+    def run(self, records, workers, speed):
+        """
+        Выполнить records; возвращает наибольшее отставание отправки от расписания, секунд
+        """
+        tasks = queue.Queue(maxsize=workers * 2)
+        threads = [threading.Thread(target=self.worker, args=(tasks,), daemon=True) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+
+        lag = 0.0
+        first = records[0]['offset']
+        started = time.monotonic()
+        for record in records:
+            if speed:
+                delay = (record['offset'] - first) / speed - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    lag = max(lag, -delay)
+            tasks.put(record)
+        for _ in threads:
+            tasks.put(None)
+        for thread in threads:
+            thread.join()
+        return lag
+
+    def connect(self):
+        connection_class = http.client.HTTPSConnection if self.target.scheme == 'https' else http.client.HTTPConnection
+        return connection_class(self.target.hostname, self.target.port, timeout=self.timeout)
+
+    def worker(self, tasks):
+        connection = self.connect()
+        while True:
+            record = tasks.get()
+            if record is None:
+                break
+            status_code = data = None
+            try:
+                status_code, data, elapsed = self.send(connection, record)
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = self.connect()
+                with self._lock:
+                    self.errors += 1
+            else:
+                with self._lock:
+                    self.latencies.append(elapsed)
+                    self.statuses[status_code] += 1
+                    if status_code != record.get('status'):
+                        self.mismatches += 1
+            finally:
+                # Ждущие созданных объектов запросы разблокируются и при ошибке
+                self.ids.remember(record, status_code, data)
+        connection.close()
+
+    def send(self, connection, record):
+        path = self.target.path.rstrip('/') + self.ids.path(record['path'])
+        body = record.get('body')
+        headers = {'Accept': 'application/json'}
+        if body is not None:
+            if not isinstance(body, str):
+                body = json.dumps(self.ids.body(body), ensure_ascii=False)
+            body = body.encode('utf-8')
+            headers['Content-Type'] = record.get('content_type') or 'application/json'
+
+        started = time.perf_counter()
+        connection.request(record['method'], path, body=body, headers=headers)
+        response = connection.getresponse()
+        payload = response.read()
+        elapsed = time.perf_counter() - started
+
+        data = None
+        if record.get('created') and payload:
+            try:
+                data = json.loads(payload).get('data')
+            except (ValueError, AttributeError):
+                data = None
+        return response.status, data, elapsed
@@ -0,0 +1,127 @@
+"""
+Метрики Prometheus для представлений API.
+
+MetricsMiddleware замеряет каждый запрос: длительность, размер ответа,
+класс статуса, число SQL-запросов и время БД (по request.query_stats от
+QueryInstrumentationMiddleware) с меткой имени URL, а также число
+запросов в обработке. MetricsView (/metrics) отдает их в текстовом
+формате Prometheus.
+
+При нескольких процессах-воркерах задайте PROMETHEUS_MULTIPROC_DIR до
+запуска: каждый процесс пишет значения в свои mmap-файлы, а /metrics
+суммирует файлы всех процессов (gunicorn.conf.py очищает каталог при
+старте и помечает завершенные воркеры).
+"""
+
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+from prometheus_client import multiprocess
+
+# Имя URL для запросов, не сопоставленных маршруту (404), чтобы не плодить метки по путям
+UNMATCHED = 'unmatched'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+REQUEST_DURATION = Histogram(
+    'api_request_duration_seconds', 'Длительность обработки запроса',
+    ['view', 'method'], buckets=LATENCY_BUCKETS,
+)
+RESPONSES = Counter(
+    'api_responses', 'Ответы по классам статуса',
+    ['view', 'method', 'status'],
+)
+RESPONSE_SIZE = Histogram(
+    'api_response_size_bytes', 'Размер тела ответа (без потоковых ответов)',
+    ['view', 'method'], buckets=SIZE_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    'api_db_queries_per_request', 'Число SQL-запросов на запрос (без параллельных чтений /api/batch/ и отдачи потокового ответа)',
+    ['view', 'method'], buckets=QUERY_BUCKETS,
+)
+DB_DURATION = Histogram(
+    'api_db_duration_seconds', 'Время SQL-запросов на запрос (без параллельных чтений /api/batch/ и отдачи потокового ответа)',
+    ['view', 'method'], buckets=LATENCY_BUCKETS,
+)
+IN_PROGRESS = Gauge(
+    'api_requests_in_progress', 'Запросы в обработке',
+    ['method'], multiprocess_mode='livesum',
+)
+
+METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'})
+STATUS_CLASSES = {code: f'{code // 100}xx' for code in range(100, 600)}
+
+
+class ViewMetrics:
+    """
+    Дочерние метрики одного представления и метода.
+
+    labels() берет блокировку и строит ключ на каждый вызов, поэтому
+    дочерние метрики создаются один раз и кэшируются.
+    """
+
+    __slots__ = ('duration', 'size', 'queries', 'db_duration', 'responses', 'view', 'method')
+
+    def __init__(self, view, method):
+        self.view = view
+        self.method = method
+        self.duration = REQUEST_DURATION.labels(view, method)
+        self.size = RESPONSE_SIZE.labels(view, method)
+        self.queries = DB_QUERIES.labels(view, method)
+        self.db_duration = DB_DURATION.labels(view, method)
+        self.responses = {}
+
+    def observe(self, response, duration, query_stats):
+        self.duration.observe(duration)
+        status_class = STATUS_CLASSES.get(response.status_code, 'other')
+        counter = self.responses.get(status_class)
+        if counter is None:
+            counter = self.responses[status_class] = RESPONSES.labels(self.view, self.method, status_class)
+        counter.inc()
+        if not response.streaming:
+            self.size.observe(len(response.content))
+        if query_stats is not None:
+            self.queries.observe(query_stats.count)
+            self.db_duration.observe(query_stats.duration)
+
+
+_view_metrics = {}
+_in_progress = {}
+
+
+def request_method(request):
+    return request.method if request.method in METHODS else 'other'
+
+
+def view_metrics(view, method):
+    key = (view, method)
+    metrics = _view_metrics.get(key)
+    if metrics is None:
+        metrics = _view_metrics[key] = ViewMetrics(view, method)
+    return metrics
+
+
+def in_progress(method):
+    gauge = _in_progress.get(method)
+    if gauge is None:
+        gauge = _in_progress[method] = IN_PROGRESS.labels(method)
+    return gauge
+
+
+def get_registry():
+    """
+    Реестр для выдачи: сумма файлов всех процессов в режиме multiprocess или реестр процесса
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_metrics():
+    return generate_latest(get_registry()), CONTENT_TYPE_LATEST
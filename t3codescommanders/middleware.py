@@ -0,0 +1,336 @@
+"""
+Middleware проекта.
+"""
+
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+from .capture import (
+    created_ids, get_capture_handler, process_capture_path, redact_body, redact_path, response_data,
+    write_record,
+)
+from .db.routers import pinned_to_primary, replica_reads
+from .metrics import UNMATCHED, in_progress, request_method, view_metrics
+
+logger = logging.getLogger('t3codescommanders.queries')
+
+
+def get_query_budget(url_name, method):
+    """
+    Допустимое число SQL-запросов для представления и HTTP-метода
+    """
+    return settings.QUERY_BUDGETS.get(url_name, {}).get(method)
+
+
+class QueryStats:
+    """
+    Счетчик SQL-запросов и суммарного времени БД в рамках одного запроса.
+
+    Экземпляр подключается к соединениям через connection.execute_wrapper.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            self.queries.append((sql, elapsed))
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Считает SQL-запросы и время БД для каждого представления.
+
+    Результат сохраняется в request.query_stats, превышение бюджета из
+    settings.QUERY_BUDGETS пишется в лог, а в режиме DEBUG счетчики
+    возвращаются в заголовках ответа.
+
+    В асинхронном режиме (ASGI) запросы к БД выполняются в потоке
+    sync_to_async(thread_sensitive=True), одном на запрос, со своими
+    соединениями, поэтому обертка ставится и снимается в этом потоке.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = QueryStats()
+        request.query_stats = stats
+        with self.instrument(stats):
+            response = self.get_response(request)
+        return self.report(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        request.query_stats = stats
+        stack = await sync_to_async(self.instrument)(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.report(request, response, stats)
+
+    @staticmethod
+    def instrument(stats):
+        """
+        Подключить stats ко всем соединениям текущего потока; закрытие стека отключает
+        """
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        return stack
+
+    @staticmethod
+    def report(request, response, stats):
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.url_name if match else None
+        budget = get_query_budget(url_name, request.method)
+
+        logger.debug(
+            '%s %s (%s): %d queries, %.2f ms',
+            request.method, request.path, url_name, stats.count, stats.duration * 1000,
+        )
+        if budget is not None and stats.count > budget:
+            logger.warning(
+                'Query budget exceeded for %s %s: %d > %d',
+                request.method, url_name, stats.count, budget,
+            )
+
+        if settings.DEBUG:
+            response['X-DB-Query-Count'] = str(stats.count)
+            response['X-DB-Query-Time-Ms'] = f'{stats.duration * 1000:.2f}'
+            if budget is not None:
+                response['X-DB-Query-Budget'] = str(budget)
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Метрики Prometheus для каждого запроса (t3codescommanders.metrics).
+
+    Стоит в начале MIDDLEWARE, до QueryInstrumentationMiddleware: длительность
+    включает остальные middleware, а после ответа уже доступен
+    request.query_stats.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        method = request_method(request)
+        gauge = in_progress(method)
+        gauge.inc()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            gauge.dec()
+        self.observe(request, method, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        method = request_method(request)
+        gauge = in_progress(method)
+        gauge.inc()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            gauge.dec()
+        self.observe(request, method, response, time.perf_counter() - started)
+        return response
+
+    @staticmethod
+    def observe(request, method, response, duration):
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match and match.url_name else UNMATCHED
+        view_metrics(view, method).observe(response, duration, getattr(request, 'query_stats', None))
+
+
+class RequestCaptureMiddleware:
+    """
+    Запись запросов к API в JSONL для последующего воспроизведения (replay_requests).
+
+    Включается REQUEST_CAPTURE_ENABLED; записывается доля
+    REQUEST_CAPTURE_SAMPLE_RATE запросов с путем, начинающимся с
+    REQUEST_CAPTURE_PATH_PREFIX. Значения полей REQUEST_CAPTURE_REDACT_FIELDS
+    в JSON-теле и параметрах запроса заменяются на '[REDACTED]'. Тела больше
+    REQUEST_CAPTURE_MAX_BODY_BYTES не читаются, чтобы не загружать в память
+    потоковый импорт, и такие запросы не воспроизводятся. Каждый процесс
+    пишет в свой файл: имя REQUEST_CAPTURE_FILE дополняется pid.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_CAPTURE_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.redact_fields = {name.lower() for name in settings.REQUEST_CAPTURE_REDACT_FIELDS}
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.should_capture(request):
+            return self.get_response(request)
+        record = self.start_record(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.finish_record(request, record, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if not self.should_capture(request):
+            return await self.get_response(request)
+        record = self.start_record(request)
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        # Запись строки в буферизованный файл не блокирует цикл заметно
+        self.finish_record(request, record, response, time.perf_counter() - started)
+        return response
+
+    @property
+    def handler(self):
+        """
+        Обработчик файла текущего процесса; middleware может создаваться до fork воркеров (--preload)
+        """
+        return get_capture_handler(
+            process_capture_path(settings.REQUEST_CAPTURE_FILE),
+            settings.REQUEST_CAPTURE_MAX_BYTES,
+            settings.REQUEST_CAPTURE_BACKUP_COUNT,
+        )
+
+    def should_capture(self, request):
+        return (
+            request.path.startswith(settings.REQUEST_CAPTURE_PATH_PREFIX)
+            and random.random() < settings.REQUEST_CAPTURE_SAMPLE_RATE
+        )
+
+    def start_record(self, request):
+        """
+        Запрос без ответа; тело читается до представления, которое может прочитать поток
+        """
+        content_type = request.content_type or ''
+        record = {
+            'ts': timezone.now().isoformat(),
+            'method': request.method,
+            'path': redact_path(request.get_full_path(), self.redact_fields),
+            'content_type': content_type,
+            'body': None,
+        }
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if length > settings.REQUEST_CAPTURE_MAX_BODY_BYTES:
+            record['body_omitted'] = 'too_large'
+        elif length:
+            try:
+                body = request.body.decode('utf-8')
+            except UnicodeDecodeError:
+                record['body_omitted'] = 'binary'
+            else:
+                record['body'] = redact_body(body, content_type, self.redact_fields)
+        return record
+
+    def finish_record(self, request, record, response, duration):
+        record['status'] = response.status_code
+        record['duration_ms'] = round(duration * 1000, 3)
+        data = response_data(response)
+        created = created_ids(
+            request.path, request.method, response.status_code,
+            data.get('data') if isinstance(data, dict) else None,
+        )
+        if created is not None:
+            record['created'] = {'kind': created[0], 'ids': created[1]}
+        write_record(self.handler, record)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Разрешает безопасным запросам читать с реплик (t3codescommanders.db.routers).
+
+    Небезопасный запрос (кроме пакета только из чтений) закрепляет клиента за основной БД: cookie
+    REPLICA_PIN_COOKIE хранит время окончания закрепления, и до него все
+    запросы клиента читают с default. Без реплик (DB_REPLICAS) отключена.
+    """
+
+    sync_capable = True
+    async_capable = True
+    safe_methods = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with replica_reads(self.allow_replicas(request)):
+            response = self.get_response(request)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        # sync_to_async копирует контекст, поэтому разрешение видно и в потоках БД
+        with replica_reads(self.allow_replicas(request)):
+            response = await self.get_response(request)
+        return self.pin(request, response)
+
+    def allow_replicas(self, request):
+        return request.method in self.safe_methods and not pinned_to_primary(request)
+
+    def pin(self, request, response):
+        # Пакет только из чтений (/api/batch/) ничего не записал и не закрепляет клиента
+        if getattr(request, 'read_only', False):
+            return response
+        if request.method not in self.safe_methods and settings.REPLICA_PIN_SECONDS > 0:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                f'{time.time() + settings.REPLICA_PIN_SECONDS:.3f}',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
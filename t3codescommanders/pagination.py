@@ -0,0 +1,180 @@
+"""
+Курсорная (keyset) пагинация для списков API.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework import status
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .exceptions import InvalidQueryParameter
+
+
+class InvalidCursor(InvalidQueryParameter):
+    """
+    Курсор не удалось декодировать или он не соответствует сортировке
+    """
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу сортировки (created_at, id).
+
+    Следующая страница выбирается условием по последней строке предыдущей,
+    поэтому стоимость любой страницы одинакова: без OFFSET и без COUNT(*).
+    """
+    ordering = ('-created_at', '-id')
+    # Преобразование значений курсора для полей сортировки, которых нет
+    # в модели (аннотаций); поля модели разбираются их to_python
+    cursor_types = {}
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+        self.page_size = None
+        self.next_position = None
+        self.request = None
+
+    def get_page_size(self, request):
+        """
+        Размер страницы из параметра запроса, ограниченный API_MAX_PAGE_SIZE
+        """
+        page_size = api_settings.PAGE_SIZE
+        try:
+            requested = int(request.GET[self.page_size_query_param])
+            if requested > 0:
+                page_size = requested
+        except (KeyError, ValueError):
+            pass
+        return min(page_size, settings.API_MAX_PAGE_SIZE)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Вернуть одну страницу строк queryset (экземпляры моделей или словари)
+        """
+        return self._finish_page(list(self._page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Асинхронный вариант paginate_queryset для async-представлений
+        """
+        return self._finish_page([row async for row in self._page_queryset(queryset, request)])
+
+    def _page_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request, queryset.model)
+
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self._position_filter(position))
+
+        # Лишняя строка показывает, есть ли следующая страница
+        return queryset[:self.page_size + 1]
+
+    def _finish_page(self, rows):
+        page = rows[:self.page_size]
+        if len(rows) > self.page_size:
+            self.next_position = [self._get_value(page[-1], name) for name in self._field_names()]
+        return page
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data), status=status.HTTP_200_OK)
+
+    def get_paginated_data(self, data):
+        return {
+            'status': 'success',
+            'data': data,
+            'next_cursor': self.get_next_cursor(),
+            'next': self.get_next_link(),
+        }
+
+    def get_next_cursor(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_next_link(self):
+        cursor = self.get_next_cursor()
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_first_link(self):
+        url = self.request.build_absolute_uri()
+        return remove_query_param(url, self.cursor_query_param)
+
+    def encode_cursor(self, values):
+        payload = {
+            'o': list(self.ordering),
+            'p': [value.isoformat() if isinstance(value, datetime) else value for value in values],
+        }
+        raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request, model):
+        """
+        Разобрать курсор из запроса; None означает первую страницу
+        """
+        encoded = request.GET.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            payload = json.loads(raw.decode('utf-8'))
+            if payload['o'] != list(self.ordering) or len(payload['p']) != len(self.ordering):
+                raise InvalidCursor('Курсор не соответствует сортировке списка')
+            return [
+                self.to_python(model, name, value)
+                for name, value in zip(self._field_names(), payload['p'])
+            ]
+        except InvalidCursor:
+            raise
+        except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError, ValidationError):
+            raise InvalidCursor('Некорректный курсор пагинации')
+
+    def to_python(self, model, name, value):
+        if name in self.cursor_types:
+            return self.cursor_types[name](value)
+        return model._meta.get_field(name).to_python(value)
+
+    def _field_names(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def _position_filter(self, position):
+        """
+        Условие "строго после позиции" для лексикографической сортировки.
+
+        Первое поле ограничено нестрогим сравнением отдельно, чтобы индекс
+        использовался как диапазон, а не как фильтр поверх полного прохода.
+        """
+        names = self._field_names()
+        lookups = ['lt' if name.startswith('-') else 'gt' for name in self.ordering]
+
+        after = Q()
+        for index in range(len(names) - 1, -1, -1):
+            strict = Q(**{f'{names[index]}__{lookups[index]}': position[index]})
+            if index == len(names) - 1:
+                after = strict
+            else:
+                after = strict | (Q(**{names[index]: position[index]}) & after)
+
+        return Q(**{f'{names[0]}__{lookups[0]}e': position[0]}) & after
+
+    @staticmethod
+    def _get_value(row, name):
+        if isinstance(row, dict):
+            return row[name]
+        return getattr(row, name)
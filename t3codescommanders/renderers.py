@@ -0,0 +1,37 @@
+"""
+JSON-рендерер на orjson.
+
+Выдает те же байты, что и rest_framework.renderers.JSONRenderer с настройками
+по умолчанию (компактный JSON, UTF-8 без экранирования, U+2028/U+2029 в виде
+escape-последовательностей), но кодирует ответ в несколько раз быстрее.
+Типы, которых orjson не знает, и datetime кодируются энкодером DRF.
+"""
+
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer DRF, кодирующий ответ через orjson
+    """
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # Отступы и нестандартные настройки JSON отдаются исходному рендереру
+        if self.get_indent(accepted_media_type or '', renderer_context or {}) or not (
+            api_settings.UNICODE_JSON and api_settings.COMPACT_JSON and api_settings.STRICT_JSON
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=self.encoder.default, option=ORJSON_OPTIONS)
+        # Как JSONRenderer: разделители строк недопустимы в JavaScript-строках
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,191 @@
+"""
+Быстрая сериализация списков только для чтения.
+
+RowSerializer один раз разбирает поля DRF-сериализатора в план и затем
+превращает строки QuerySet.values() в словари ответа без создания моделей,
+get_attribute и to_representation каждого поля. Результат совпадает с
+данными исходного сериализатора (порядок ключей, форматы дат, вложенные
+объекты), что проверяется контрактными тестами приложений.
+"""
+
+from functools import lru_cache
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.settings import ISO_8601, api_settings
+
+from .exceptions import InvalidQueryParameter
+
+# Поля, у которых to_representation для значения из БД возвращает его же
+PASSTHROUGH_FIELDS = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+def datetime_converter(field, current_timezone):
+    """
+    Функция, форматирующая datetime так же, как поле field (serializers.DateTimeField).
+
+    current_timezone - текущий часовой пояс, полученный один раз на вызов
+    serialize(): DRF запрашивает его заново для каждого значения.
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    field_timezone = field.timezone if hasattr(field, 'timezone') else current_timezone
+
+    def convert(value):
+        if field_timezone is not None and value.tzinfo is not None:
+            value = value.astimezone(field_timezone)
+        else:
+            value = field.enforce_timezone(value)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    return convert
+
+
+class RowSerializer:
+    """
+    Сериализатор строк values() по описанию DRF-сериализатора.
+
+    values_fields - аргументы для QuerySet.values(); вложенный
+    ModelSerializer (например, user_detail с source='user') читается из
+    полей связи с префиксом 'user__'. fields ограничивает поля верхнего
+    уровня (?fields=), и остальные столбцы не выбираются из БД.
+    """
+
+    def __init__(self, serializer, fields=None):
+        self.field_names = [name for name, field in serializer.fields.items() if not field.write_only]
+        self.values_fields = []
+        self._spec = self._build(serializer, '', fields)
+        self._plans = {}
+
+    def _build(self, serializer, prefix, fields=None):
+        """
+        Описание полей: (имя в ответе, ключ строки, поле DRF или вложенное описание)
+        """
+        spec = []
+        for name, field in serializer.fields.items():
+            if field.write_only or (fields is not None and name not in fields):
+                continue
+            key = prefix + field.source
+            if isinstance(field, serializers.ModelSerializer):
+                spec.append((name, key + '__id', self._build(field, key + '__')))
+                if key + '__id' not in self.values_fields:
+                    self.values_fields.append(key + '__id')
+            elif isinstance(field, (serializers.DateTimeField, *PASSTHROUGH_FIELDS)):
+                spec.append((name, key, field))
+                self.values_fields.append(key)
+            else:
+                raise ImproperlyConfigured(
+                    f'RowSerializer не поддерживает поле {name} ({type(field).__name__}) '
+                    f'сериализатора {type(serializer).__name__}'
+                )
+        return spec
+
+    def _compile(self, spec, current_timezone):
+        plan = []
+        for name, key, field in spec:
+            if isinstance(field, list):
+                plan.append((name, self._nested(key, self._compile(field, current_timezone))))
+            elif isinstance(field, serializers.DateTimeField):
+                plan.append((name, self._converted(key, datetime_converter(field, current_timezone))))
+            else:
+                plan.append((name, itemgetter(key)))
+        return plan
+
+    def _plan(self):
+        current_timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+        plan = self._plans.get(current_timezone)
+        if plan is None:
+            plan = self._plans[current_timezone] = self._compile(self._spec, current_timezone)
+        return plan
+
+    @staticmethod
+    def _converted(key, convert):
+        def get(row):
+            value = row[key]
+            return None if value is None else convert(value)
+        return get
+
+    @staticmethod
+    def _nested(pk_key, plan):
+        def get(row):
+            if row[pk_key] is None:
+                return None
+            return {name: get_value(row) for name, get_value in plan}
+        return get
+
+    def to_representation(self, row):
+        return {name: get_value(row) for name, get_value in self._plan()}
+
+    def serialize(self, rows):
+        plan = self._plan()
+        return [{name: get_value(row) for name, get_value in plan} for row in rows]
+
+    def values(self, queryset, *extra):
+        """
+        queryset строк для этого сериализатора.
+
+        extra - дополнительные поля строки, например ключи сортировки
+        пагинации ('-created_at') и поля версии страницы.
+        """
+        fields = list(self.values_fields)
+        fields += [name for name in dict.fromkeys(name.lstrip('-') for name in extra) if name not in fields]
+        return queryset.values(*fields)
+
+
+@lru_cache(maxsize=None)
+def _cached_row_serializer(serializer_class, expand, fields):
+    context = {} if expand is None else {'expand': set(expand)}
+    return RowSerializer(serializer_class(context=context), fields)
+
+
+def get_row_serializer(serializer_class, expand=None, fields=None):
+    """
+    RowSerializer для класса сериализатора, набора ?expand= и ?fields=; план строится один раз
+    """
+    return _cached_row_serializer(
+        serializer_class,
+        None if expand is None else frozenset(expand),
+        None if fields is None else frozenset(fields),
+    )
+
+
+def parse_fields(params, allowed):
+    """
+    Поля ответа из параметра ?fields= или None, если он не передан.
+
+    allowed - поля сериализатора в порядке вывода; неизвестные поля
+    отклоняются до обращения к БД.
+    """
+    raw = params.get('fields')
+    if raw is None:
+        return None
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    if not fields:
+        raise InvalidQueryParameter('Параметр fields не может быть пустым')
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise InvalidQueryParameter(
+            f'Недопустимые поля в fields: {", ".join(unknown)}. Допустимо: {", ".join(allowed)}'
+        )
+    return frozenset(fields)
+
+
+def prune_fields(data, fields):
+    """
+    Оставить в данных сериализатора только поля fields (None - все)
+    """
+    if fields is None:
+        return data
+    return {name: value for name, value in data.items() if name in fields}
@@ -25,13 +25,20 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'corsheaders',
+    't3codescommanders',
     'users',
     'orders',
+    'jobs',
+    'idempotency',
 ]
 
 MIDDLEWARE = [
+    't3codescommanders.middleware.RequestCaptureMiddleware',
+    't3codescommanders.middleware.MetricsMiddleware',
+    't3codescommanders.middleware.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -40,6 +47,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    't3codescommanders.middleware.QueryInstrumentationMiddleware',
 ]
 
 ROOT_URLCONF = 't3codescommanders.urls'
@@ -63,14 +71,84 @@ TEMPLATES = [
 WSGI_APPLICATION = 't3codescommanders.wsgi.application'
 
 # Database
+# DB_POOL_ENABLED включает пул соединений в каждом процессе-воркере
+# (t3codescommanders.db.postgresql_pool). Без пула соединение живет в потоке
+# DB_CONN_MAX_AGE секунд, что работает под WSGI (постоянные потоки воркера
+# gthread): под ASGI Django выполняет синхронный код каждого запроса в новом
+# потоке, и следующие запросы соединение не переиспользуют. С пулом Django
+# возвращает соединение в пул после каждого запроса, а срок жизни задает
+# DB_POOL_MAX_AGE.
+DB_POOL_ENABLED = config('DB_POOL_ENABLED', default=False, cast=bool)
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': (
+            't3codescommanders.db.postgresql_pool' if DB_POOL_ENABLED
+            else 'django.db.backends.postgresql'
+        ),
         'NAME': config('DB_NAME', default='t3codescommanders'),
         'USER': config('DB_USER', default='postgres'),
         'PASSWORD': config('DB_PASSWORD', default='postgres'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
+        'CONN_MAX_AGE': 0 if DB_POOL_ENABLED else config('DB_CONN_MAX_AGE', default=0, cast=int),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        'POOL': {
+            'MIN_SIZE': config('DB_POOL_MIN_SIZE', default=1, cast=int),
+            'MAX_SIZE': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            'MAX_AGE': config('DB_POOL_MAX_AGE', default=600, cast=int),
+            'TIMEOUT': config('DB_POOL_TIMEOUT', default=5, cast=float),
+            'HEALTH_CHECK': config('DB_POOL_HEALTH_CHECK', default=True, cast=bool),
+        },
+    }
+}
+
+# DB_ENGINE=sqlite - локальная замена PostgreSQL для бенчмарков и разработки
+# (benchmarks/load.py). Поиск, триграммы и EXPLAIN-тесты работают только на PostgreSQL.
+DB_ENGINE = config('DB_ENGINE', default='postgresql')
+if DB_ENGINE == 'sqlite':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': config('DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+        'OPTIONS': {'timeout': config('DB_SQLITE_TIMEOUT', default=30, cast=int)},
+    }
+elif DB_ENGINE != 'postgresql':
+    raise ValueError(f'Неизвестный DB_ENGINE: {DB_ENGINE}')
+
+# Реплики для чтения (t3codescommanders.db.routers): DB_REPLICAS - через запятую
+# host[:port] реплик PostgreSQL с теми же NAME, USER и PASSWORD, что у default,
+# или пути к файлам при DB_ENGINE=sqlite. Реплики получают псевдонимы replica1,
+# replica2, ...; в тестах они отражают default и отдельно не создаются.
+DB_REPLICAS = config('DB_REPLICAS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])
+DATABASE_REPLICAS = []
+for number, address in enumerate(DB_REPLICAS, 1):
+    replica = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    if DB_ENGINE == 'sqlite':
+        replica['NAME'] = address
+    else:
+        host, _, port = address.partition(':')
+        replica.update(HOST=host, PORT=port or DATABASES['default']['PORT'])
+    DATABASES[f'replica{number}'] = replica
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['t3codescommanders.db.routers.ReplicaRouter'] if DATABASE_REPLICAS else []
+
+# Реплика с отставанием больше REPLICA_MAX_LAG секунд или недоступная исключается
+# до следующей проверки (раз в REPLICA_CHECK_INTERVAL секунд). После небезопасного
+# запроса клиент REPLICA_PIN_SECONDS секунд читает с default (cookie REPLICA_PIN_COOKIE);
+# чтобы клиент видел свои записи, это время не должно быть меньше
+# REPLICA_MAX_LAG + REPLICA_CHECK_INTERVAL.
+REPLICA_MAX_LAG = config('REPLICA_MAX_LAG', default=5.0, cast=float)
+REPLICA_CHECK_INTERVAL = config('REPLICA_CHECK_INTERVAL', default=2.0, cast=float)
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=10, cast=int)
+REPLICA_PIN_COOKIE = config('REPLICA_PIN_COOKIE', default='db_primary_until')
+
+# Cache: по умолчанию в памяти процесса (разработка и тесты), в продакшне
+# общий кэш, например CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# и CACHE_LOCATION=redis://redis:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
     }
 }
 
@@ -105,15 +183,113 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        't3codescommanders.renderers.ORJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 10,
+    'DEFAULT_PAGINATION_CLASS': 't3codescommanders.pagination.KeysetPagination',
+    'PAGE_SIZE': config('API_PAGE_SIZE', default=10, cast=int),
+}
+
+# Верхняя граница для параметра page_size в списках API
+API_MAX_PAGE_SIZE = config('API_MAX_PAGE_SIZE', default=100, cast=int)
+
+# Массовое создание заказов: максимум элементов в запросе и размер порции INSERT
+ORDER_BULK_MAX_ITEMS = config('ORDER_BULK_MAX_ITEMS', default=10000, cast=int)
+ORDER_BULK_BATCH_SIZE = config('ORDER_BULK_BATCH_SIZE', default=1000, cast=int)
+
+# Потоковый импорт пользователей: размер пачки и число ошибок в отчете
+USER_IMPORT_BATCH_SIZE = config('USER_IMPORT_BATCH_SIZE', default=5000, cast=int)
+USER_IMPORT_MAX_REPORTED_ERRORS = config('USER_IMPORT_MAX_REPORTED_ERRORS', default=100, cast=int)
+
+# Удаление пользователей: заказы удаляются порциями по USER_DELETE_BATCH_SIZE,
+# пользователи с числом заказов больше USER_DELETE_SYNC_MAX_ORDERS - задачей очереди (202)
+USER_DELETE_BATCH_SIZE = config('USER_DELETE_BATCH_SIZE', default=5000, cast=int)
+USER_DELETE_SYNC_MAX_ORDERS = config('USER_DELETE_SYNC_MAX_ORDERS', default=1000, cast=int)
+
+# Очередь фоновых задач (jobs, manage.py run_workers): число попыток,
+# экспоненциальная задержка повтора, аренда задачи воркером и опрос очереди, секунды
+JOB_MAX_ATTEMPTS = config('JOB_MAX_ATTEMPTS', default=5, cast=int)
+JOB_RETRY_BASE_DELAY = config('JOB_RETRY_BASE_DELAY', default=10, cast=float)
+JOB_RETRY_MAX_DELAY = config('JOB_RETRY_MAX_DELAY', default=3600, cast=float)
+JOB_LEASE_TIMEOUT = config('JOB_LEASE_TIMEOUT', default=600, cast=int)
+JOB_POLL_INTERVAL = config('JOB_POLL_INTERVAL', default=1.0, cast=float)
+
+# Idempotency-Key на эндпоинтах создания (idempotency): срок хранения ответа,
+# ожидание дубликатом выполняющегося запроса и опрос ключа при ожидании, время,
+# через которое ключ умершего запроса освобождается, секунды; очистка истекших ключей
+# задачей purge_idempotency_keys раз в IDEMPOTENCY_PURGE_INTERVAL секунд порциями
+IDEMPOTENCY_KEY_TTL = config('IDEMPOTENCY_KEY_TTL', default=24 * 3600, cast=int)
+IDEMPOTENCY_WAIT_TIMEOUT = config('IDEMPOTENCY_WAIT_TIMEOUT', default=10, cast=float)
+IDEMPOTENCY_POLL_INTERVAL = config('IDEMPOTENCY_POLL_INTERVAL', default=0.1, cast=float)
+IDEMPOTENCY_LOCK_TIMEOUT = config('IDEMPOTENCY_LOCK_TIMEOUT', default=60, cast=int)
+IDEMPOTENCY_PURGE_INTERVAL = config('IDEMPOTENCY_PURGE_INTERVAL', default=3600, cast=int)
+IDEMPOTENCY_PURGE_BATCH_SIZE = config('IDEMPOTENCY_PURGE_BATCH_SIZE', default=5000, cast=int)
+
+# Секции заказов по месяцам (PostgreSQL, manage_partitions): сколько месяцев
+# создавать заранее, как часто задача manage_partitions досоздает их, секунды,
+# и куда выгружать архивы старых секций
+ORDER_PARTITIONS_AHEAD = config('ORDER_PARTITIONS_AHEAD', default=3, cast=int)
+ORDER_PARTITIONS_INTERVAL = config('ORDER_PARTITIONS_INTERVAL', default=86400, cast=int)
+ORDER_ARCHIVE_DIR = config('ORDER_ARCHIVE_DIR', default=str(BASE_DIR / 'archive'))
+
+# Пакетные запросы (POST /api/batch/): максимум подзапросов в пакете и потоков
+# для параллельного выполнения чтений (parallel=true)
+BATCH_MAX_REQUESTS = config('BATCH_MAX_REQUESTS', default=50, cast=int)
+BATCH_MAX_WORKERS = config('BATCH_MAX_WORKERS', default=4, cast=int)
+
+# Потоковая выгрузка заказов: число строк, читаемых из серверного курсора за раз
+ORDER_EXPORT_CHUNK_SIZE = config('ORDER_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Кэш ответов detail-представлений: 'django' (CACHES[RESPONSE_CACHE_ALIAS],
+# в продакшне Redis), 'lru' (в памяти процесса) или 'none'
+RESPONSE_CACHE_BACKEND = config('RESPONSE_CACHE_BACKEND', default='django')
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+RESPONSE_CACHE_MAX_ENTRIES = config('RESPONSE_CACHE_MAX_ENTRIES', default=10000, cast=int)
+RESPONSE_CACHE_ALIAS = config('RESPONSE_CACHE_ALIAS', default='default')
+# Отключать кэш в памяти процесса ('lru', LocMemCache): инвалидация из одного
+# процесса не видна другим. Выставляется gunicorn.conf.py
+RESPONSE_CACHE_REQUIRE_SHARED = config('RESPONSE_CACHE_REQUIRE_SHARED', default=False, cast=bool)
+
+# Бюджет SQL-запросов на один вызов представления (по имени URL и методу).
+# Превышение пишется в лог и валит тесты, см. t3codescommanders.testing.
+# Запись заказа включает один UPDATE счетчиков пользователя (orders.counters),
+# запрос с Idempotency-Key - INSERT ключа в точке сохранения и UPDATE ответа (idempotency).
+# Массовое создание растет с числом порций ORDER_BULK_BATCH_SIZE: в частичном
+# режиме каждая порция - точка сохранения, INSERT, UPDATE счетчиков и RELEASE.
+ORDER_BULK_MAX_BATCHES = -(-ORDER_BULK_MAX_ITEMS // ORDER_BULK_BATCH_SIZE)
+QUERY_BUDGETS = {
+    'user-list-create': {'GET': 1, 'POST': 7},
+    'user-stats': {'GET': 1},
+    'user-detail': {'GET': 1, 'PUT': 4, 'DELETE': 6},
+    'order-list-create': {'GET': 1, 'POST': 10},
+    'order-bulk-create': {'POST': 5 + 4 * ORDER_BULK_MAX_BATCHES},
+    'order-search': {'GET': 1},
+    'order-detail': {'GET': 1, 'PUT': 7, 'DELETE': 3},
+    'user-orders': {'GET': 2},
+    'job-list': {'GET': 1},
+    'job-detail': {'GET': 1},
 }
 
+# Метрики Prometheus (MetricsMiddleware, /metrics). Для нескольких процессов
+# нужен PROMETHEUS_MULTIPROC_DIR в окружении, см. t3codescommanders.metrics.
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+
+# Запись трафика API в JSONL с ротацией (RequestCaptureMiddleware) для replay_requests;
+# каждый процесс пишет в файл с pid в имени (requests.<pid>.jsonl)
+REQUEST_CAPTURE_ENABLED = config('REQUEST_CAPTURE_ENABLED', default=False, cast=bool)
+REQUEST_CAPTURE_FILE = config('REQUEST_CAPTURE_FILE', default=str(BASE_DIR / 'captures' / 'requests.jsonl'))
+REQUEST_CAPTURE_SAMPLE_RATE = config('REQUEST_CAPTURE_SAMPLE_RATE', default=1.0, cast=float)
+REQUEST_CAPTURE_PATH_PREFIX = config('REQUEST_CAPTURE_PATH_PREFIX', default='/api/')
+REQUEST_CAPTURE_MAX_BODY_BYTES = config('REQUEST_CAPTURE_MAX_BODY_BYTES', default=65536, cast=int)
+REQUEST_CAPTURE_MAX_BYTES = config('REQUEST_CAPTURE_MAX_BYTES', default=100 * 1024 * 1024, cast=int)
+REQUEST_CAPTURE_BACKUP_COUNT = config('REQUEST_CAPTURE_BACKUP_COUNT', default=10, cast=int)
+REQUEST_CAPTURE_REDACT_FIELDS = config(
+    'REQUEST_CAPTURE_REDACT_FIELDS', default='password,token,secret,api_key,authorization',
+    cast=lambda v: [s.strip() for s in v.split(',') if s.strip()],
+)
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = config('CORS_ALLOW_ALL_ORIGINS', default=True, cast=bool)
 CORS_ALLOWED_ORIGINS = config('CORS_ALLOWED_ORIGINS', default='http://localhost:3000,http://127.0.0.1:3000', cast=lambda v: [s.strip() for s in v.split(',')]) 
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+Вспомогательные средства для тестов API.
+"""
+
+import json
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .cache import response_cache
+from .middleware import get_query_budget
+
+
+class QueryBudgetTestMixin:
+    """
+    Проверка бюджета SQL-запросов для ответов тестового клиента.
+
+    Опирается на QueryInstrumentationMiddleware, которая сохраняет
+    статистику в request.query_stats. Бюджет проверяется на холодном кэше
+    ответов, поэтому кэш очищается перед каждым тестом.
+    """
+
+    def setUp(self):
+        super().setUp()
+        response_cache.clear()
+
+    def assertWithinQueryBudget(self, response):
+        # Ответ AsyncClient (ASGI) хранит запрос в asgi_request
+        request = getattr(response, 'wsgi_request', None) or response.asgi_request
+        url_name = request.resolver_match.url_name
+        budget = get_query_budget(url_name, request.method)
+        self.assertIsNotNone(
+            budget, f'Для {request.method} {url_name} не задан бюджет в QUERY_BUDGETS'
+        )
+
+        stats = request.query_stats
+        queries = '\n'.join(f'  {sql}' for sql, _ in stats.queries)
+        self.assertLessEqual(
+            stats.count, budget,
+            f'{request.method} {url_name}: {stats.count} запросов при бюджете {budget}:\n{queries}'
+        )
+        return stats
+
+
+class ExplainTestMixin:
+    """
+    Проверка планов PostgreSQL для запросов, выполненных представлением.
+
+    Каждый SELECT, пойманный во время запроса, повторно выполняется как
+    EXPLAIN (FORMAT JSON); в плане не должно быть Seq Scan по таблицам
+    из explain_tables (и их непустым секциям) и узлов Sort, то есть
+    сортировка берется из индекса. Сортировку не больше max_sort_rows
+    строк по оценке планировщика (пользователь с парой заказов)
+    PostgreSQL законно предпочитает обходу индекса, она допускается.
+    """
+    explain_tables = ()
+    max_sort_rows = 100
+
+    def setUp(self):
+        super().setUp()
+        response_cache.clear()
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]['Plan']
+
+    def scanned_table(self, name):
+        """
+        Таблица, к которой относится просмотр name: для секции - секционированная
+        таблица, для пустой секции - None (полный проход по ней ничего не стоит)
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT i.inhparent::regclass::text, c.relpages FROM pg_inherits i '
+                'JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhrelid = to_regclass(%s)',
+                [name],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return name
+        return row[0] if row[1] else None
+
+    def parent_index(self, name):
+        """
+        Индекс модели, к которому относится индекс секции name (или сам name)
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT i.inhparent::regclass::text FROM pg_inherits i WHERE i.inhrelid = to_regclass(%s)',
+                [name],
+            )
+            row = cursor.fetchone()
+        return name if row is None else row[0]
+
+    @staticmethod
+    def select_sql(sql):
+        """
+        SELECT запроса, в том числе объявленного серверного курсора (iterator()), или None
+        """
+        if sql.startswith('SELECT'):
+            return sql
+        if sql.startswith('DECLARE') and ' FOR SELECT ' in sql:
+            return sql[sql.index(' FOR SELECT ') + len(' FOR '):]
+        return None
+
+    @classmethod
+    def plan_nodes(cls, node):
+        yield node
+        for child in node.get('Plans', []):
+            yield from cls.plan_nodes(child)
+
+    def assertQueriesUseIndexes(self, request):
+        """
+        Выполнить request() и проверить планы всех его SELECT-запросов
+        """
+        with CaptureQueriesContext(connection) as captured:
+            response = request()
+        self.assertLess(response.status_code, 400)
+
+        selects = [
+            sql for sql in (self.select_sql(query['sql']) for query in captured.captured_queries) if sql
+        ]
+        self.assertTrue(selects, 'Представление не выполнило ни одного SELECT')
+        for sql in selects:
+            nodes = list(self.plan_nodes(self.explain(sql)))
+            for node in nodes:
+                self.assertFalse(
+                    node['Node Type'] == 'Seq Scan'
+                    and self.scanned_table(node['Relation Name']) in self.explain_tables,
+                    f'Seq Scan по {node.get("Relation Name")}:\n{sql}'
+                )
+                self.assertFalse(
+                    node['Node Type'] == 'Sort' and node['Plan Rows'] > self.max_sort_rows,
+                    f'Сортировка вне индекса:\n{sql}'
+                )
+        return response
@@ -0,0 +1,535 @@
+import base64
+import json
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, transaction
+from django.http import HttpResponse
+from django.test import LiveServerTestCase, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import ResolverMatch, reverse
+
+from orders.models import Order
+from users.models import User
+from .batch import BatchExecutor, SubRequest
+from .cache import response_cache
+from .capture import REDACTED, get_capture_handler, process_capture_path
+from .db.routers import (
+    ReplicaRouter, ReplicaSet, lag_from_state, replica_lag, replica_reads, replica_reads_allowed,
+)
+from .middleware import ReplicaRoutingMiddleware
+from .pagination import KeysetPagination
+
+
+class CaptureFileMixin:
+    """
+    Временный файл записи трафика вместо REQUEST_CAPTURE_FILE
+    """
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            REQUEST_CAPTURE_ENABLED=True, REQUEST_CAPTURE_FILE=str(Path(directory.name) / 'requests.jsonl'),
+        )
+        # Файл текущего процесса
+        self.capture_file = Path(process_capture_path(Path(directory.name) / 'requests.jsonl'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def tearDown(self):
+        get_capture_handler(
+            str(self.capture_file), settings.REQUEST_CAPTURE_MAX_BYTES, settings.REQUEST_CAPTURE_BACKUP_COUNT,
+        ).close()
+        super().tearDown()
+
+    def captured(self):
+        with open(self.capture_file, encoding='utf-8') as stream:
+            return [json.loads(line) for line in stream]
+
+
+class RequestCaptureTests(CaptureFileMixin, TestCase):
+    """
+    RequestCaptureMiddleware пишет запросы API в JSONL
+    """
+
+    @override_settings(REQUEST_CAPTURE_REDACT_FIELDS=['name'])
+    def test_capture_and_redact(self):
+        response = self.client.post(
+            reverse('user-list-create'), {'name': 'Секрет', 'email': 'capture@example.com', 'age': 30},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.client.get(reverse('user-detail', args=[response.json()['data']['id']]), {'name': 'Секрет'})
+        self.client.get('/admin/login/')
+
+        created, detail = self.captured()
+        self.assertEqual(created['method'], 'POST')
+        self.assertEqual(created['path'], '/api/users/')
+        self.assertEqual(created['body'], {'name': REDACTED, 'email': 'capture@example.com', 'age': 30})
+        self.assertEqual(created['status'], 201)
+        self.assertEqual(created['created'], {'kind': 'users', 'ids': [response.json()['data']['id']]})
+        self.assertIn('duration_ms', created)
+        self.assertTrue(detail['path'].endswith('?name=%5BREDACTED%5D'))
+
+    async def test_async_create(self):
+        response = await self.async_client.post(
+            reverse('async-user-list-create'), {'name': 'Асинхронный', 'email': 'async-capture@example.com', 'age': 30},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        created, = self.captured()
+        self.assertEqual(created['path'], '/api/async/users/')
+        self.assertEqual(created['created'], {'kind': 'users', 'ids': [response.json()['data']['id']]})
+
+    def test_process_file(self):
+        self.assertEqual(process_capture_path('/tmp/captures/requests.jsonl', pid=42), '/tmp/captures/requests.42.jsonl')
+        self.client.get(reverse('user-list-create'))
+        self.assertEqual([path.name for path in self.capture_file.parent.iterdir()], [self.capture_file.name])
+
+    @override_settings(REQUEST_CAPTURE_SAMPLE_RATE=0.0)
+    def test_sampling(self):
+        self.client.get(reverse('user-list-create'))
+        self.assertFalse(self.capture_file.exists())
+
+
+class ReplayRequestsTests(LiveServerTestCase):
+    """
+    replay_requests воспроизводит запись и подставляет id, созданные при воспроизведении
+    """
+
+    def write_capture(self, path, records):
+        with open(path, 'w', encoding='utf-8') as stream:
+            for record in records:
+                stream.write(json.dumps(record) + '\n')
+
+    def test_replay_remaps_ids(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / 'requests.jsonl'
+        # id из записи (900, 700) отличаются от id, которые выдаст пустая БД
+        self.write_capture(path, [
+            {
+                'ts': '2024-01-01T00:00:00+00:00', 'method': 'POST', 'path': '/api/users/',
+                'content_type': 'application/json', 'status': 201,
+                'body': {'name': 'Повтор', 'email': 'replay@example.com', 'age': 30},
+                'created': {'kind': 'users', 'ids': [900]},
+            },
+            {
+                'ts': '2024-01-01T00:00:00.010000+00:00', 'method': 'POST', 'path': '/api/orders/bulk/',
+                'content_type': 'application/json', 'status': 201,
+                'body': [{'title': 'Заказ повтора', 'description': 'Описание заказа повтора', 'user': 900}],
+                'created': {'kind': 'orders', 'ids': [700]},
+            },
+            {
+                'ts': '2024-01-01T00:00:00.020000+00:00', 'method': 'GET', 'path': '/api/orders/700/',
+                'content_type': '', 'body': None, 'status': 200,
+            },
+            {
+                'ts': '2024-01-01T00:00:00.030000+00:00', 'method': 'POST', 'path': '/api/users/import/',
+                'content_type': 'application/x-ndjson', 'body': None, 'body_omitted': 'too_large', 'status': 200,
+            },
+        ])
+
+        out = StringIO()
+        call_command('replay_requests', str(path), target=self.live_server_url, workers=3, speed=0, stdout=out)
+
+        user = User.objects.get(email='replay@example.com')
+        self.assertEqual(Order.objects.get().user, user)
+        self.assertIn('пропущено 1', out.getvalue())
+        self.assertIn('коды ответа отличаются от записи: 0', out.getvalue())
+
+
+class MetricsTests(TestCase):
+    """
+    /metrics отдает метрики представлений в формате Prometheus
+    """
+
+    def sample(self, text, name, **labels):
+        prefix = name + '{' + ','.join(f'{key}="{value}"' for key, value in sorted(labels.items())) + '}'
+        values = [float(line.rsplit(' ', 1)[1]) for line in text.splitlines() if line.startswith(prefix + ' ')]
+        return values[0] if values else 0.0
+
+    def test_view_metrics(self):
+        before = self.client.get(reverse('metrics')).content.decode()
+        User.objects.create(name='Метрики', email='metrics@example.com', age=30)
+        self.assertEqual(self.client.get(reverse('user-list-create')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('user-detail', args=[0])).status_code, 404)
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        after = response.content.decode()
+
+        def delta(name, **labels):
+            return self.sample(after, name, **labels) - self.sample(before, name, **labels)
+
+        list_labels = {'view': 'user-list-create', 'method': 'GET'}
+        self.assertEqual(delta('api_request_duration_seconds_count', **list_labels), 1)
+        self.assertEqual(delta('api_responses_total', status='2xx', **list_labels), 1)
+        self.assertEqual(delta('api_responses_total', status='4xx', view='user-detail', method='GET'), 1)
+        self.assertEqual(delta('api_db_queries_per_request_sum', **list_labels), 1)
+        self.assertEqual(delta('api_response_size_bytes_count', **list_labels), 1)
+        self.assertIn('api_requests_in_progress{method="GET"}', after)
+
+
+class QueryInstrumentationTests(TestCase):
+    """
+    Счетчики SQL-запросов собираются и под WSGI, и под ASGI
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(name='Счетчики', email='queries@example.com', age=30)
+
+    def setUp(self):
+        response_cache.clear()
+
+    @override_settings(DEBUG=True)
+    async def test_asgi(self):
+        for name, args in (('user-list-create', []), ('async-user-detail', [self.user.id])):
+            with self.subTest(name=name):
+                response = await self.async_client.get(reverse(name, args=args))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.asgi_request.query_stats.count, 1)
+                self.assertEqual(response['X-DB-Query-Count'], '1')
+
+    @override_settings(QUERY_BUDGETS={'user-list-create': {'GET': 0}})
+    async def test_asgi_budget_warning(self):
+        with self.assertLogs('t3codescommanders.queries', 'WARNING') as logs:
+            await self.async_client.get(reverse('user-list-create'))
+        self.assertIn('Query budget exceeded for GET user-list-create: 1 > 0', logs.output[0])
+
+    async def test_asgi_metrics(self):
+        prefix = 'api_db_queries_per_request_sum{method="GET",view="user-list-create"} '
+
+        async def queries_sum():
+            text = (await self.async_client.get(reverse('metrics'))).content.decode()
+            return sum(float(line[len(prefix):]) for line in text.splitlines() if line.startswith(prefix))
+
+        before = await queries_sum()
+        await self.async_client.get(reverse('user-list-create'))
+        self.assertEqual(await queries_sum() - before, 1)
+
+
+class ResponseCacheTests(TestCase):
+    """
+    Кэш ответов: инвалидация после коммита, счетчики и отказ от кэша в памяти процесса
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(name='Кэш', email='cache@example.com', age=30)
+        cls.order = Order.objects.create(title='Заказ кэша', description='Описание заказа кэша', user=cls.user)
+
+    def setUp(self):
+        response_cache.reset()
+        response_cache.clear()
+
+    def test_user_update_visible_in_orders(self):
+        url = reverse('order-detail', args=[self.order.id])
+        self.assertEqual(self.client.get(url, {'expand': 'user'}).json()['data']['user_detail']['name'], 'Кэш')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(
+                reverse('user-detail', args=[self.user.id]), {'name': 'Новое имя'}, content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.client.get(url, {'expand': 'user'}).json()['data']['user_detail']['name'], 'Новое имя',
+        )
+
+    def test_stats(self):
+        url = reverse('user-detail', args=[self.user.id])
+        self.client.get(url)
+        self.client.get(url)
+        data = self.client.get(reverse('cache-stats')).json()['data']
+        self.assertEqual(data['backend'], 'django')
+        self.assertEqual(data['namespaces']['user'], {'hits': 1, 'misses': 1})
+
+    @override_settings(RESPONSE_CACHE_REQUIRE_SHARED=True)
+    def test_process_local_cache_disabled(self):
+        for backend in ('lru', 'django'):
+            with self.subTest(backend=backend), override_settings(RESPONSE_CACHE_BACKEND=backend):
+                with self.assertLogs('t3codescommanders.cache', 'WARNING'):
+                    self.assertEqual(response_cache.backend.name, 'none')
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+        }}):
+            self.assertEqual(response_cache.backend.name, 'django')
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Чтение с реплик: выбор исправной реплики, отставание и закрепление клиента за default
+    """
+
+    def replica_set(self, lags):
+        def measure(alias):
+            if lags[alias] is None:
+                raise OperationalError('connection refused')
+            return lags[alias]
+
+        replicas = ReplicaSet(lags, max_lag=5, interval=60, measure=measure)
+        self.addCleanup(replicas.stop)
+        return replicas
+
+    def test_check(self):
+        replicas = self.replica_set({'replica1': 0.5, 'replica2': 30, 'replica3': None})
+        with self.assertLogs('t3codescommanders.replicas', 'WARNING'):
+            self.assertEqual(replicas.check(), ['replica1'])
+        self.assertEqual(replicas.lags, {'replica1': 0.5, 'replica2': 30, 'replica3': None})
+        self.assertEqual(replica_lag(DEFAULT_DB_ALIAS), 0)
+
+    def test_lag_from_state(self):
+        self.assertEqual(lag_from_state(False, None, False, None), 0)
+        # Принимает WAL и применила все полученное: не отстает при любом простое основной БД
+        self.assertEqual(lag_from_state(True, True, True, 3600), 0)
+        self.assertEqual(lag_from_state(True, False, True, 2.5), 2.5)
+        # Приемник отключен: полученный WAL применен, но новый не приходит
+        self.assertEqual(lag_from_state(True, True, False, 3600), 3600)
+        self.assertEqual(lag_from_state(True, True, None, 3600), 3600)
+        self.assertEqual(lag_from_state(True, True, False, None), float('inf'))
+
+        replicas = self.replica_set({'replica1': lag_from_state(True, True, False, 3600)})
+        with self.assertLogs('t3codescommanders.replicas', 'WARNING'):
+            self.assertEqual(replicas.check(), [])
+
+    def test_router(self):
+        lags = {'replica1': 0.0}
+        replicas = self.replica_set(lags)
+        replicas.check()
+        router = ReplicaRouter(replicas)
+        self.assertEqual(router.db_for_read(User), DEFAULT_DB_ALIAS)
+        with replica_reads():
+            self.assertEqual(router.db_for_read(User), 'replica1')
+            self.assertEqual(router.db_for_write(User), DEFAULT_DB_ALIAS)
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(User), DEFAULT_DB_ALIAS)
+            lags['replica1'] = 10
+            with self.assertLogs('t3codescommanders.replicas', 'WARNING'):
+                replicas.check()
+            self.assertEqual(router.db_for_read(User), DEFAULT_DB_ALIAS)
+        self.assertTrue(router.allow_migrate(DEFAULT_DB_ALIAS, 'users'))
+        self.assertFalse(router.allow_migrate('replica1', 'users'))
+
+    @override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_PIN_SECONDS=10)
+    def test_middleware_pins_writers(self):
+        seen = []
+
+        def view(request):
+            seen.append(replica_reads_allowed())
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(view)
+        factory = RequestFactory()
+        middleware(factory.get('/api/users/'))
+        response = middleware(factory.post('/api/users/'))
+        cookie = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], 10)
+
+        pinned = factory.get('/api/users/')
+        pinned.COOKIES[settings.REPLICA_PIN_COOKIE] = cookie.value
+        middleware(pinned)
+        expired = factory.get('/api/users/')
+        expired.COOKIES[settings.REPLICA_PIN_COOKIE] = '1'
+        middleware(expired)
+        self.assertEqual(seen, [True, False, False, True])
+        self.assertFalse(replica_reads_allowed())
+
+    @override_settings(DATABASE_REPLICAS=['replica1'], RESPONSE_CACHE_BACKEND='lru')
+    def test_cache_skips_fresh_versions_read_from_replicas(self):
+        builds = []
+
+        def build():
+            builds.append(1)
+            return {'id': 1}
+
+        response_cache.invalidate('replica-test', 1)
+        with replica_reads():
+            response_cache.fetch('replica-test', 1, build)
+            response_cache.fetch('replica-test', 1, build)
+        self.assertEqual(len(builds), 2)
+        response_cache.fetch('replica-test', 1, build)
+        response_cache.fetch('replica-test', 1, build)
+        self.assertEqual(len(builds), 3)
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Курсорная пагинация: обход всех страниц без пропусков и повторов, ошибки курсора
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(name='Владелец', email='owner@example.com', age=30)
+        orders = [
+            Order.objects.create(title=f'Заказ {i}', description='Описание заказа для страниц', user=cls.user)
+            for i in range(7)
+        ]
+        # Пять заказов с одинаковым created_at: порядок внутри них задает id
+        tie = datetime(2025, 1, 1, 12, 0, tzinfo=dt_timezone.utc)
+        Order.objects.filter(id__in=[order.id for order in orders[1:6]]).update(created_at=tie)
+        Order.objects.filter(id=orders[0].id).update(created_at=datetime(2025, 1, 2, tzinfo=dt_timezone.utc))
+        Order.objects.filter(id=orders[6].id).update(created_at=datetime(2024, 12, 31, tzinfo=dt_timezone.utc))
+
+    def pages(self, name, **params):
+        cursor = None
+        pages = []
+        while True:
+            response = self.client.get(reverse(name), {**params, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            pages.append([row['id'] for row in body['data']])
+            cursor = body['next_cursor']
+            if cursor is None:
+                self.assertIsNone(body['next'])
+                return pages
+            self.assertIn(f'cursor={cursor}', body['next'])
+
+    def test_round_trip_with_ties(self):
+        expected = list(Order.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        for page_size in (1, 2, 3, 7):
+            with self.subTest(page_size=page_size):
+                pages = self.pages('order-list-create', page_size=page_size)
+                self.assertEqual([order_id for page in pages for order_id in page], expected)
+                self.assertTrue(all(len(page) == page_size for page in pages[:-1]))
+
+        expected = list(Order.objects.order_by('created_at', 'id').values_list('id', flat=True))
+        pages = self.pages('order-list-create', page_size=2, ordering='created_at')
+        self.assertEqual([order_id for page in pages for order_id in page], expected)
+
+    def test_last_page(self):
+        # Страница ровно до последней строки не ссылается на пустую следующую
+        response = self.client.get(reverse('order-list-create'), {'page_size': 7})
+        self.assertEqual(len(response.json()['data']), 7)
+        self.assertIsNone(response.json()['next_cursor'])
+        self.assertEqual(self.pages('order-list-create', page_size=8), [
+            list(Order.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        ])
+
+    def test_invalid_cursor(self):
+        other = self.client.get(reverse('order-list-create'), {'page_size': 2, 'ordering': 'created_at'})
+        wrong_length = KeysetPagination().encode_cursor(['2025-01-01T12:00:00+00:00'])
+        wrong_type = KeysetPagination().encode_cursor(['вчера', 1])
+        not_json = base64.urlsafe_b64encode(b'not json').decode('ascii')
+        for cursor in ('%%%', not_json, wrong_length, wrong_type, other.json()['next_cursor']):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('order-list-create'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['status'], 'error')
+
+    async def test_async_round_trip(self):
+        ordered = Order.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        expected = [order_id async for order_id in ordered]
+        ids = []
+        params = {'page_size': 3}
+        while True:
+            response = await self.async_client.get(reverse('async-order-list-create'), params)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.json()['data'])
+            if response.json()['next_cursor'] is None:
+                break
+            params['cursor'] = response.json()['next_cursor']
+        self.assertEqual(ids, expected)
+
+
+class BatchTests(TransactionTestCase):
+    """
+    POST /api/batch/: подзапросы через URLconf без HTTP, общие выборки пользователей
+    """
+
+    def setUp(self):
+        response_cache.clear()
+        self.users = [
+            User.objects.create(name=f'Пакет {i}', email=f'batch{i}@example.com', age=30) for i in range(2)
+        ]
+        Order.objects.create(title='Заказ пакета', description='Описание заказа пакета', user=self.users[0])
+
+    def batch(self, requests, **options):
+        return self.client.post(
+            reverse('batch'), {'requests': requests, **options}, content_type='application/json',
+        )
+
+    def test_batch(self):
+        first, second = self.users
+        requests = [
+            {'id': 'user', 'path': f'/api/users/{first.id}/'},
+            {'id': 'orders', 'path': f'/api/users/{first.id}/orders/?page_size=5'},
+            {'id': 'again', 'path': f'/api/users/{first.id}/'},
+            {'id': 'other', 'path': f'/api/users/{second.id}/?fields=id,name'},
+            {'id': 'missing', 'path': '/api/nowhere/'},
+            {'id': 'export', 'path': '/api/orders/export/'},
+        ]
+        with CaptureQueriesContext(connection) as captured:
+            response = self.batch(requests)
+        self.assertEqual(response.status_code, 200)
+        results = {result['id']: result for result in response.json()['data']}
+        self.assertEqual([result['id'] for result in response.json()['data']], [item['id'] for item in requests])
+        self.assertEqual(results['user']['body']['data']['email'], 'batch0@example.com')
+        self.assertIn('ETag', results['user']['headers'])
+        self.assertEqual(results['again']['body'], results['user']['body'])
+        self.assertEqual([order['title'] for order in results['orders']['body']['data']], ['Заказ пакета'])
+        self.assertEqual(results['other']['body']['data'], {'id': second.id, 'name': 'Пакет 1'})
+        self.assertEqual(results['missing']['status'], 404)
+        self.assertEqual(results['export']['status'], 400)
+        # Оба пользователя загружены одной выборкой для всех подзапросов
+        user_queries = [query for query in captured.captured_queries if 'FROM "users_user"' in query['sql']]
+        self.assertEqual(len(user_queries), 1)
+
+    def test_writes_in_order_and_parallel_reads(self):
+        user = self.users[1]
+        response = self.batch([
+            {'path': '/api/orders/', 'method': 'POST',
+             'body': {'title': 'Новый заказ', 'description': 'Описание нового заказа', 'user': user.id}},
+            {'path': f'/api/users/{user.id}/orders/'},
+            {'path': f'/api/users/{user.id}/'},
+            {'path': f'/api/users/{user.id}/', 'method': 'DELETE'},
+            {'path': f'/api/users/{user.id}/'},
+        ], parallel=True)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['data']
+        self.assertEqual([result['status'] for result in results], [201, 200, 200, 204, 404])
+        self.assertEqual([order['title'] for order in results[1]['body']['data']], ['Новый заказ'])
+        self.assertEqual(results[2]['body']['data']['order_count'], 1)
+
+    def test_failed_write_rolls_back(self):
+        user = self.users[0]
+
+        def error_response(request, user_id):
+            User.objects.filter(id=user_id).update(name='Изменено')
+            return HttpResponse(status=500)
+
+        def error(request, user_id):
+            User.objects.filter(id=user_id).update(name='Изменено')
+            raise OperationalError('Сбой БД')
+
+        executor = BatchExecutor(RequestFactory().post(reverse('batch')))
+        for view in (error_response, error):
+            with self.subTest(view=view.__name__):
+                sub = SubRequest(0, {'method': 'PUT', 'path': f'/api/users/{user.id}/'})
+                sub.match = ResolverMatch(view, (), {'user_id': user.id})
+                self.assertEqual(executor.dispatch(sub)['status'], 500)
+                user.refresh_from_db()
+                self.assertEqual(user.name, 'Пакет 0')
+
+        # Запись следующего подзапроса фиксируется независимо от неудачной
+        response = self.batch([
+            {'path': f'/api/users/{user.id}/', 'method': 'PUT', 'body': {'name': 'Новое имя'}},
+            {'path': '/api/orders/', 'method': 'POST', 'body': {'title': 'Без пользователя'}},
+        ])
+        self.assertEqual([result['status'] for result in response.json()['data']], [200, 400])
+        user.refresh_from_db()
+        self.assertEqual(user.name, 'Новое имя')
+
+    @override_settings(BATCH_MAX_REQUESTS=2)
+    def test_validation(self):
+        self.assertEqual(self.batch([]).status_code, 400)
+        self.assertEqual(self.batch([{'path': '/api/users/'}] * 3).status_code, 400)
+        nested = self.batch([{'path': '/api/batch/', 'method': 'POST', 'body': {'requests': []}}])
+        self.assertEqual(nested.json()['data'][0]['status'], 400)
@@ -4,8 +4,15 @@ URL configuration for t3codescommanders project.
 from django.contrib import admin
 from django.urls import path, include
 
+from .views import BatchView, CacheStatsView, MetricsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', MetricsView.as_view(), name='metrics'),
+    path('api/cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
+    path('api/batch/', BatchView.as_view(), name='batch'),
+    path('api/async/', include('t3codescommanders.async_urls')),
     path('api/', include('users.urls')),
     path('api/', include('orders.urls')),
+    path('api/', include('jobs.urls')),
 ] 
\ No newline at end of file
@@ -0,0 +1,67 @@
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .batch import BatchExecutor, BatchSerializer
+from .cache import response_cache
+from .metrics import render_metrics
+
+
+class CacheStatsView(APIView):
+    """
+    Представление со счетчиками попаданий и промахов кэша ответов
+    """
+
+    def get(self, request):
+        """
+        Получить статистику кэша текущего процесса
+        """
+        return Response({
+            'status': 'success',
+            'data': response_cache.stats()
+        }, status=status.HTTP_200_OK)
+
+
+class BatchView(APIView):
+    """
+    Представление для пакетного выполнения подзапросов к API
+    """
+
+    def post(self, request):
+        """
+        Выполнить подзапросы пакета и вернуть их ответы в порядке запроса
+        """
+        serializer = BatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'status': 'error',
+                'message': 'Ошибка валидации пакета',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            executor = BatchExecutor(request._request, serializer.validated_data['parallel'])
+            results = executor.run(serializer.validated_data['requests'])
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': f'Ошибка при выполнении пакета: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        # Пакет только из чтений не закрепляет клиента за основной БД (ReplicaRoutingMiddleware)
+        request._request.read_only = not executor.wrote
+        return Response({
+            'status': 'success',
+            'data': results
+        }, status=status.HTTP_200_OK)
+
+
+class MetricsView(View):
+    """
+    Метрики Prometheus в текстовом формате
+    """
+
+    def get(self, request):
+        body, content_type = render_metrics()
+        return HttpResponse(body, content_type=content_type)
@@ -4,10 +4,10 @@ from .models import User
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'email', 'age', 'created_at', 'updated_at')
+    list_display = ('id', 'name', 'email', 'age', 'order_count', 'last_order_at', 'created_at', 'updated_at')
     list_filter = ('age', 'created_at')
     search_fields = ('name', 'email')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('order_count', 'last_order_at', 'created_at', 'updated_at')
     ordering = ('-created_at',)
     
     fieldsets = (
@@ -15,7 +15,7 @@ class UserAdmin(admin.ModelAdmin):
             'fields': ('name', 'email', 'age')
         }),
         ('Системная информация', {
-            'fields': ('created_at', 'updated_at'),
+            'fields': ('order_count', 'last_order_at', 'created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     ) 
\ No newline at end of file
@@ -0,0 +1,134 @@
+"""
+Асинхронные представления пользователей для запуска под ASGI-сервером.
+
+Каждый путь делает не больше одного обращения к асинхронному ORM, а
+сериализация выполняется над уже загруженными объектами.
+"""
+
+from django.db import IntegrityError
+from rest_framework import serializers, status
+
+from idempotency.keys import aidempotent
+from t3codescommanders.async_api import AsyncAPIView, InvalidJSONBody
+from t3codescommanders.cache import response_cache
+from t3codescommanders.conditional import (
+    apage_not_modified_response, not_modified_response, page_validators,
+    representation_validators, set_validators,
+)
+from t3codescommanders.exceptions import InvalidQueryParameter
+from t3codescommanders.pagination import KeysetPagination
+from t3codescommanders.serializers import get_row_serializer, parse_fields, prune_fields
+from .filters import UserFilterSet
+from .models import User
+from .serializers import UserImportSerializer, UserSerializer
+
+
+async def acached_user_data(user_id):
+    """
+    Асинхронный вариант users.views.cached_user_data
+    """
+    return UserSerializer(await User.objects.aget(id=user_id)).data
+
+
+class AsyncUserListCreateView(AsyncAPIView):
+    """
+    Асинхронное представление для создания и получения списка пользователей
+    """
+    pagination_class = KeysetPagination
+    version_fields = ('id', 'updated_at')
+
+    async def get(self, request):
+        """
+        Получить страницу списка пользователей
+        """
+        try:
+            fields = parse_fields(request.GET, get_row_serializer(UserSerializer).field_names)
+            filterset = UserFilterSet(request.GET)
+            rows = get_row_serializer(UserSerializer, fields=fields)
+            queryset = rows.values(
+                filterset.filter_queryset(User.objects.all()), *self.version_fields, *filterset.ordering_fields
+            )
+            not_modified = await apage_not_modified_response(
+                request, self.pagination_class, queryset, self.version_fields,
+                ordering=filterset.ordering_fields,
+            )
+            if not_modified is not None:
+                return not_modified
+
+            paginator = self.pagination_class(ordering=filterset.ordering_fields)
+            users = await paginator.apaginate_queryset(queryset, request, view=self)
+            etag, last_modified = page_validators(
+                request, users, self.version_fields, paginator.next_position is not None
+            )
+            return set_validators(
+                self.render(paginator.get_paginated_data(rows.serialize(users))), etag, last_modified
+            )
+        except InvalidQueryParameter as e:
+            return self.error(str(e), status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return self.error(
+                f'Ошибка при получении пользователей: {str(e)}',
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+    @aidempotent
+    async def post(self, request):
+        """
+        Создать нового пользователя.
+
+        Уникальность email проверяет сама БД: вместо запроса exists()
+        перед вставкой обрабатывается IntegrityError.
+        """
+        try:
+            data = UserImportSerializer().run_validation(self.parse_json(request))
+            user = await User.objects.acreate(**data)
+            return self.render({
+                'status': 'success',
+                'message': 'Пользователь успешно создан',
+                'data': UserSerializer(user).data
+            }, status.HTTP_201_CREATED)
+        except InvalidJSONBody as e:
+            return self.error(str(e), status.HTTP_400_BAD_REQUEST)
+        except serializers.ValidationError as e:
+            return self.error('Ошибка валидации данных', status.HTTP_400_BAD_REQUEST, errors=e.detail)
+        except IntegrityError:
+            return self.error(
+                'Ошибка валидации данных', status.HTTP_400_BAD_REQUEST,
+                errors={'email': ['Пользователь с таким email уже существует']},
+            )
+        except Exception as e:
+            return self.error(
+                f'Ошибка при создании пользователя: {str(e)}',
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class AsyncUserDetailView(AsyncAPIView):
+    """
+    Асинхронное представление для получения пользователя
+    """
+
+    async def get(self, request, user_id):
+        """
+        Получить информацию о пользователе по ID
+        """
+        try:
+            fields = parse_fields(request.GET, get_row_serializer(UserSerializer).field_names)
+            data = await response_cache.afetch('user', user_id, lambda: acached_user_data(user_id))
+            etag, last_modified = representation_validators('user', data)
+            not_modified = not_modified_response(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+            return set_validators(self.render({
+                'status': 'success',
+                'data': prune_fields(data, fields)
+            }), etag, last_modified)
+        except InvalidQueryParameter as e:
+            return self.error(str(e), status.HTTP_400_BAD_REQUEST)
+        except User.DoesNotExist:
+            return self.error('Пользователь не найден', status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return self.error(
+                f'Ошибка при получении пользователя: {str(e)}',
+                status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
@@ -0,0 +1,59 @@
+"""
+Фильтры и сортировки списка пользователей.
+"""
+
+from t3codescommanders.filters import DateTimeFilter, IntegerFilter, ListFilterSet, Ordering
+
+
+class UserFilterSet(ListFilterSet):
+    """
+    Фильтры пользователей.
+
+    Сортировки обслуживают индексы user_created_idx, user_updated_idx и
+    user_age_idx; диапазон возраста доступен только с сортировкой по возрасту.
+    """
+    filters = {
+        'created_after': DateTimeFilter('created_at__gte'),
+        'created_before': DateTimeFilter('created_at__lt'),
+        'updated_since': DateTimeFilter('updated_at__gte'),
+        'age_min': IntegerFilter('age__gte', min_value=1),
+        'age_max': IntegerFilter('age__lte', min_value=1),
+    }
+    orderings = {
+        '-created_at': Ordering(('-created_at', '-id'), ('created_after', 'created_before')),
+        'created_at': Ordering(('created_at', 'id'), ('created_after', 'created_before')),
+        # updated_since без ?ordering= выдает изменения от старых к новым
+        'updated_at': Ordering(('updated_at', 'id'), ('updated_since',)),
+        '-updated_at': Ordering(('-updated_at', '-id'), ('updated_since',)),
+        'age': Ordering(('age', 'id'), ('age_min', 'age_max')),
+        '-age': Ordering(('-age', '-id'), ('age_min', 'age_max')),
+    }
+    default_ordering = '-created_at'
+
+
+class UserStatsFilterSet(ListFilterSet):
+    """
+    Фильтры статистики заказов пользователей.
+
+    Сортировки обслуживают индексы user_order_count_idx и частичный
+    user_last_order_idx, поэтому сортировка по дате последнего заказа
+    выдает только пользователей, у которых есть заказы.
+    """
+    filters = {
+        'min_orders': IntegerFilter('order_count__gte', min_value=0),
+        'last_order_after': DateTimeFilter('last_order_at__gte'),
+        'last_order_before': DateTimeFilter('last_order_at__lt'),
+    }
+    orderings = {
+        '-order_count': Ordering(('-order_count', '-id'), ('min_orders',)),
+        'order_count': Ordering(('order_count', 'id'), ('min_orders',)),
+        '-last_order_at': Ordering(
+            ('-last_order_at', '-id'), ('last_order_after', 'last_order_before'),
+            where={'last_order_at__isnull': False},
+        ),
+        'last_order_at': Ordering(
+            ('last_order_at', 'id'), ('last_order_after', 'last_order_before'),
+            where={'last_order_at__isnull': False},
+        ),
+    }
+    default_ordering = '-order_count'
@@ -0,0 +1,236 @@
+"""
+Потоковый импорт пользователей из NDJSON и CSV.
+
+Файл читается построчно и обрабатывается пачками фиксированного размера,
+поэтому расход памяти не зависит от размера файла. Каждая пачка
+загружается и фиксируется в своей транзакции: на PostgreSQL командой COPY
+во временную таблицу и одним INSERT ... SELECT из нее в users_user. Если
+пачку не удалось загрузить, импорт останавливается с ImportBatchError, а
+предыдущие пачки остаются в БД.
+"""
+
+import csv
+import io
+import json
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import User
+from .serializers import UserImportSerializer
+
+FORMATS = ('ndjson', 'csv')
+
+STAGING_TABLE = 'users_import_staging'
+
+
+def _decode_lines(stream):
+    for line in stream:
+        yield line.decode('utf-8') if isinstance(line, bytes) else line
+
+
+def iter_ndjson(stream):
+    """
+    Строки NDJSON как пары (номер строки, объект); пустые строки пропускаются
+    """
+    for line_no, line in enumerate(_decode_lines(stream), start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError:
+            yield line_no, None
+
+
+def iter_csv(stream):
+    """
+    Строки CSV с заголовком как пары (номер записи, словарь)
+    """
+    reader = csv.DictReader(_decode_lines(stream))
+    for line_no, row in enumerate(reader, start=2):
+        yield line_no, row
+
+
+def iter_records(stream, file_format):
+    if file_format == 'ndjson':
+        return iter_ndjson(stream)
+    if file_format == 'csv':
+        return iter_csv(stream)
+    raise ValueError(f'Неподдерживаемый формат импорта: {file_format}')
+
+
+class ImportBatchError(Exception):
+    """
+    Пачка импорта не загружена из-за ошибки БД; result содержит итоги загруженных пачек
+    """
+
+    def __init__(self, result):
+        failed = result.failed_batch
+        super().__init__(
+            f"Пачка {failed['batch']} (строки {failed['first_line']}-{failed['last_line']}) "
+            f"не загружена: {failed['error']}"
+        )
+        self.result = result
+
+
+class ImportResult:
+    """
+    Итоги импорта; сохраняется не больше max_errors ошибок
+    """
+
+    def __init__(self, max_errors):
+        self.max_errors = max_errors
+        self.total = 0
+        self.created = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors = []
+        self.batches = 0
+        self.failed_batch = None
+
+    def add_error(self, line, errors):
+        self.invalid += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'total': self.total,
+            'created': self.created,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'errors': self.errors,
+            'batches': self.batches,
+            'failed_batch': self.failed_batch,
+        }
+
+
+class UserImporter:
+    """
+    Импорт пользователей пачками с проверкой правил UserSerializer
+    """
+
+    def __init__(self, batch_size=None, max_errors=None):
+        self.batch_size = batch_size or settings.USER_IMPORT_BATCH_SIZE
+        self.max_errors = settings.USER_IMPORT_MAX_REPORTED_ERRORS if max_errors is None else max_errors
+        self.use_copy = connection.vendor == 'postgresql'
+
+    def run(self, stream, file_format):
+        result = ImportResult(self.max_errors)
+        serializer = UserImportSerializer()
+        now = timezone.now()
+
+        batch = []
+        for line_no, record in iter_records(stream, file_format):
+            result.total += 1
+            if not isinstance(record, dict):
+                result.add_error(line_no, {'non_field_errors': ['Строка не является JSON-объектом']})
+                continue
+            try:
+                batch.append((line_no, serializer.run_validation(record)))
+            except serializers.ValidationError as e:
+                result.add_error(line_no, e.detail)
+                continue
+            if len(batch) >= self.batch_size:
+                self._load(batch, result, now)
+                batch = []
+        if batch:
+            self._load(batch, result, now)
+        return result
+
+    def _load(self, batch, result, now):
+        """
+        Загрузить пачку в своей транзакции; при ошибке БД выбрасывает ImportBatchError
+        """
+        result.batches += 1
+        try:
+            with transaction.atomic():
+                created, duplicates = self._flush(batch, now)
+        except DatabaseError as e:
+            result.failed_batch = {
+                'batch': result.batches,
+                'first_line': batch[0][0],
+                'last_line': batch[-1][0],
+                'error': str(e),
+            }
+            raise ImportBatchError(result) from e
+        result.created += created
+        result.duplicates += duplicates
+
+    def _flush(self, batch, now):
+        """
+        Отсеять дубликаты пачки и загрузить ее; возвращает (создано, дубликатов)
+        """
+        seen = set()
+        unique = []
+        for line_no, data in batch:
+            if data['email'] in seen:
+                continue
+            seen.add(data['email'])
+            unique.append((line_no, data))
+
+        existing = set(
+            User.objects.filter(email__in=seen).order_by().values_list('email', flat=True)
+        )
+        rows = [(line_no, data) for line_no, data in unique if data['email'] not in existing]
+
+        if self.use_copy:
+            self._create_staging_table()
+            self._copy_to_staging(rows, now)
+            created = self._merge_staging()
+        else:
+            User.objects.bulk_create(
+                [User(name=data['name'], email=data['email'], age=data['age']) for _, data in rows],
+                ignore_conflicts=True,
+            )
+            # bulk_create с ignore_conflicts не сообщает, сколько строк вставлено; email из rows
+            # до вставки отсутствовали, поэтому найденные теперь и есть вставленные
+            created = User.objects.filter(email__in=[data['email'] for _, data in rows]).count() if rows else 0
+        # Email, который между проверкой и вставкой занял другой запрос, тоже дубликат
+        return created, len(batch) - created
+
+    def _create_staging_table(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} ('
+                'seq bigint NOT NULL, '
+                'name varchar(100) NOT NULL, '
+                'email varchar(254) NOT NULL, '
+                'age integer NOT NULL, '
+                'created_at timestamp with time zone NOT NULL'
+                ') ON COMMIT DROP'
+            )
+
+    def _copy_to_staging(self, rows, now):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        created_at = now.isoformat()
+        for line_no, data in rows:
+            writer.writerow([line_no, data['name'], data['email'], data['age'], created_at])
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {STAGING_TABLE} (seq, name, email, age, created_at) FROM STDIN WITH (FORMAT csv)',
+                buffer,
+            )
+
+    def _merge_staging(self):
+        """
+        Перенести пачку из staging в users_user одним запросом; возвращает число вставленных строк.
+
+        Дубликаты внутри пачки уже отсеяны, а email из предыдущих пачек
+        зафиксирован раньше, поэтому первый email в файле побеждает.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {User._meta.db_table} (name, email, age, created_at, updated_at, order_count) '
+                'SELECT name, email, age, created_at, created_at, 0 '
+                f'FROM {STAGING_TABLE} ORDER BY seq '
+                'ON CONFLICT (email) DO NOTHING'
+            )
+            created = cursor.rowcount
+            # Вне транзакции запроса таблица удаляется при коммите пачки, внутри нее - очищается здесь
+            cursor.execute(f'TRUNCATE {STAGING_TABLE}')
+            return created
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.deletion import delete_user
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Django command to delete a user with many orders in batches"""
+
+    help = 'Удаление пользователя и его заказов порциями с выводом прогресса'
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_id', type=int)
+        parser.add_argument('--batch-size', type=int, default=None, help='Заказов в одной порции (USER_DELETE_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] is not None and options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным')
+        user = User.objects.filter(id=options['user_id']).only('id', 'order_count').first()
+        if user is None:
+            raise CommandError(f'Пользователь {options["user_id"]} не найден')
+
+        def progress(deleted):
+            self.stdout.write(f'Удалено заказов: {deleted} из ~{user.order_count}')
+
+        deleted = delete_user(user.id, batch_size=options['batch_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f'Пользователь {user.id} удален вместе с {deleted} заказами'))
@@ -0,0 +1,54 @@
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.importing import FORMATS, ImportBatchError, UserImporter
+
+
+class Command(BaseCommand):
+    """Django command to stream users from an NDJSON or CSV file into the database"""
+
+    help = 'Импорт пользователей из NDJSON или CSV файла ("-" для stdin)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу или "-" для чтения из stdin')
+        parser.add_argument('--format', choices=FORMATS, help='Формат файла (по умолчанию по расширению)')
+        parser.add_argument('--batch-size', type=int, help='Размер пачки (по умолчанию USER_IMPORT_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format']
+        if file_format is None:
+            suffix = Path(path).suffix.lower().lstrip('.')
+            file_format = 'ndjson' if suffix in ('ndjson', 'jsonl') else suffix
+        if file_format not in FORMATS:
+            raise CommandError('Не удалось определить формат файла, укажите --format')
+
+        importer = UserImporter(batch_size=options['batch_size'])
+        try:
+            if path == '-':
+                result = importer.run(sys.stdin.buffer, file_format)
+            else:
+                with open(path, 'rb') as stream:
+                    result = importer.run(stream, file_format)
+        except OSError as e:
+            raise CommandError(f'Не удалось открыть файл: {e}')
+        except ImportBatchError as e:
+            self.report(e.result)
+            raise CommandError(str(e))
+
+        self.report(result)
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт завершен: всего {result.total}, создано {result.created}, '
+            f'дубликатов {result.duplicates}, с ошибками {result.invalid}'
+        ))
+
+    def report(self, result):
+        for error in result.errors:
+            self.stderr.write(f"Строка {error['line']}: {error['errors']}")
+        if result.failed_batch is not None:
+            self.stderr.write(
+                f'Загружено пачек: {result.batches - 1}, создано {result.created}; '
+                f"продолжите со строки {result.failed_batch['first_line']}"
+            )
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs.registry import enqueue
+from orders.counters import recompute_batches
+
+
+class Command(BaseCommand):
+    """Django command to repair drifted order_count and last_order_at of users"""
+
+    help = 'Пересчет счетчиков заказов пользователей (order_count, last_order_at) порциями'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Пользователей в одной порции')
+        parser.add_argument('--background', action='store_true', help='Поставить пересчет в очередь задач')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть положительным')
+
+        if options['background']:
+            job, created = enqueue(
+                'recompute_user_counters', {'batch_size': batch_size}, key='recompute_user_counters',
+            )
+            message = 'поставлена в очередь' if created else 'уже в очереди'
+            self.stdout.write(self.style.SUCCESS(f'Задача {job.id} {message}'))
+            return
+
+        checked = repaired = 0
+        for user_ids, drifted in recompute_batches(batch_size):
+            checked += len(user_ids)
+            repaired += len(drifted)
+            if drifted and options['verbosity'] > 1:
+                self.stdout.write(f'Исправлены пользователи: {", ".join(map(str, drifted))}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчет завершен: проверено {checked}, исправлено {repaired}'
+        ))
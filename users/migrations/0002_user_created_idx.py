@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+from t3codescommanders.db.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='user',
+            index=models.Index(fields=['-created_at', '-id'], include=('updated_at',), name='user_created_idx'),
+        ),
+    ]
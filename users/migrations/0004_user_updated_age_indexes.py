@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+from t3codescommanders.db.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ('users', '0003_user_trigram_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='user',
+            index=models.Index(fields=['-updated_at', '-id'], name='user_updated_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='user',
+            index=models.Index(fields=['age', 'id'], name='user_age_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+from django.db import migrations, models
+
+from t3codescommanders.db.operations import AddIndexConcurrently
+
+BACKFILL = """
+UPDATE users_user SET
+    order_count = (SELECT count(*) FROM orders_order WHERE orders_order.user_id = users_user.id),
+    last_order_at = (SELECT max(created_at) FROM orders_order WHERE orders_order.user_id = users_user.id)
+WHERE id >= %s AND id < %s
+"""
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def backfill_counters(apps, schema_editor):
+    """
+    Заполнение счетчиков существующих пользователей порциями по id.
+
+    Миграция не атомарна, поэтому каждая порция фиксируется отдельно.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT min(id), max(id) FROM users_user')
+        first, last = cursor.fetchone()
+        if first is None:
+            return
+        for start in range(first, last + 1, BACKFILL_BATCH_SIZE):
+            cursor.execute(BACKFILL, [start, start + BACKFILL_BATCH_SIZE])
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ('users', '0004_user_updated_age_indexes'),
+        ('orders', '0004_order_updated_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='order_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество заказов'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='last_order_at',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Дата последнего заказа'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='user',
+            index=models.Index(fields=['-order_count', '-id'], name='user_order_count_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='user',
+            index=models.Index(condition=models.Q(('last_order_at__isnull', False)), fields=['-last_order_at', '-id'], name='user_last_order_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
 from django.core.validators import MinValueValidator, MaxValueValidator, EmailValidator
 
 
@@ -21,11 +22,32 @@ class User(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+    # Счетчики заказов поддерживаются orders.counters при изменении заказов
+    order_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Количество заказов")
+    last_order_at = models.DateTimeField(null=True, editable=False, verbose_name="Дата последнего заказа")
 
     class Meta:
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
         ordering = ['-created_at']
+        # Индекс повторяет сортировку курсорной пагинации (-created_at, -id)
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'], include=['updated_at'],
+                name='user_created_idx',
+            ),
+            models.Index(fields=['-updated_at', '-id'], name='user_updated_idx'),
+            models.Index(fields=['age', 'id'], name='user_age_idx'),
+            # Сортировки статистики /api/users/stats/
+            models.Index(fields=['-order_count', '-id'], name='user_order_count_idx'),
+            models.Index(
+                fields=['-last_order_at', '-id'], condition=models.Q(last_order_at__isnull=False),
+                name='user_last_order_idx',
+            ),
+            # Триграммные индексы для нечеткого поиска заказов по имени и email
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='user_name_trgm_idx'),
+            GinIndex(fields=['email'], opclasses=['gin_trgm_ops'], name='user_email_trgm_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.email})"
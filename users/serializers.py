@@ -2,14 +2,30 @@ from rest_framework import serializers
 from .models import User
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserAgeValidationMixin:
+    """
+    Правила проверки возраста пользователя
+    """
+
+    def validate_age(self, value):
+        """
+        Проверка возраста
+        """
+        if value < 1:
+            raise serializers.ValidationError("Возраст должен быть больше 0")
+        if value > 150:
+            raise serializers.ValidationError("Возраст не может быть больше 150")
+        return value
+
+
+class UserSerializer(UserAgeValidationMixin, serializers.ModelSerializer):
     """
     Сериализатор для модели User
     """
     class Meta:
         model = User
-        fields = ['id', 'name', 'email', 'age', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'email', 'age', 'order_count', 'last_order_at', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'order_count', 'last_order_at', 'created_at', 'updated_at']
 
     def validate_email(self, value):
         """
@@ -19,16 +35,6 @@ class UserSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Пользователь с таким email уже существует")
         return value
 
-    def validate_age(self, value):
-        """
-        Проверка возраста
-        """
-        if value < 1:
-            raise serializers.ValidationError("Возраст должен быть больше 0")
-        if value > 150:
-            raise serializers.ValidationError("Возраст не может быть больше 150")
-        return value
-
 
 class UserUpdateSerializer(serializers.ModelSerializer):
     """
@@ -45,4 +51,27 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         instance = self.instance
         if instance and User.objects.filter(email=value).exclude(id=instance.id).exists():
             raise serializers.ValidationError("Пользователь с таким email уже существует")
-        return value 
\ No newline at end of file
+        return value
+
+
+class UserImportSerializer(UserAgeValidationMixin, serializers.ModelSerializer):
+    """
+    Сериализатор строки импорта пользователей.
+
+    Проверяет те же правила, что и UserSerializer, но без запроса на
+    уникальность email: дубликаты ищутся для всей пачки одним запросом.
+    """
+    class Meta:
+        model = User
+        fields = ['name', 'email', 'age']
+        extra_kwargs = {'email': {'validators': []}}
+
+
+class UserStatsSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор строки статистики заказов пользователя
+    """
+    class Meta:
+        model = User
+        fields = ['id', 'name', 'email', 'order_count', 'last_order_at']
+        read_only_fields = fields
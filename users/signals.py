@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from t3codescommanders.cache import response_cache
+from .models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """
+    Сбросить кэш пользователя; заказы встраивают user_detail из этой же записи
+    """
+    response_cache.invalidate_on_commit('user', instance.pk)
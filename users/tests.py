@@ -0,0 +1,340 @@
+import json
+import threading
+import time
+from datetime import timedelta
+from io import BytesIO
+from unittest import skipUnless
+
+from django.db import DatabaseError, connection, connections, transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+
+from orders.models import Order
+from t3codescommanders.cache import response_cache
+from t3codescommanders.renderers import ORJSONRenderer
+from t3codescommanders.serializers import get_row_serializer
+from t3codescommanders.testing import QueryBudgetTestMixin
+from .importing import ImportBatchError, UserImporter
+from .models import User
+from .serializers import UserSerializer, UserStatsSerializer
+
+
+class UserQueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """
+    Бюджеты SQL-запросов для представлений пользователей
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create(name=f'Пользователь {i}', email=f'user{i}@example.com', age=20 + i)
+            for i in range(15)
+        ]
+
+    def test_list(self):
+        response = self.client.get(reverse('user-list-create'), {'page_size': 15})
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+
+    def test_list_filters(self):
+        response = self.client.get(reverse('user-list-create'), {'age_min': 22, 'age_max': 25})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user['age'] for user in response.json()['data']], [22, 23, 24, 25])
+        self.assertWithinQueryBudget(response)
+
+        response = self.client.get(reverse('user-list-create'), {'age_min': 22, 'ordering': '-created_at'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_fields(self):
+        response = self.client.get(reverse('user-list-create'), {'fields': 'id,name', 'ordering': 'age'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data'][0], {'id': self.users[0].id, 'name': self.users[0].name})
+        self.assertIsNotNone(response.json()['next_cursor'])
+        self.assertWithinQueryBudget(response)
+
+        response = self.client.get(reverse('user-detail', args=[self.users[0].id]), {'fields': 'email'})
+        self.assertEqual(response.json()['data'], {'email': self.users[0].email})
+
+        response = self.client.get(reverse('user-stats'), {'fields': 'id,age'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_stats(self):
+        User.objects.filter(id=self.users[3].id).update(order_count=5, last_order_at=timezone.now())
+        response = self.client.get(reverse('user-stats'), {'page_size': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data'][0]['id'], self.users[3].id)
+        self.assertWithinQueryBudget(response)
+
+        response = self.client.get(reverse('user-stats'), {'ordering': '-last_order_at'})
+        self.assertEqual([user['id'] for user in response.json()['data']], [self.users[3].id])
+
+        response = self.client.get(reverse('user-stats'), {'min_orders': 1, 'ordering': 'last_order_at'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_create(self):
+        response = self.client.post(
+            reverse('user-list-create'),
+            {'name': 'Новый', 'email': 'new@example.com', 'age': 30},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertWithinQueryBudget(response)
+
+    def test_detail(self):
+        response = self.client.get(reverse('user-detail', args=[self.users[0].id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+
+    def test_update(self):
+        response = self.client.put(
+            reverse('user-detail', args=[self.users[0].id]),
+            {'age': 40, 'email': 'changed@example.com'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+
+    def test_delete(self):
+        Order.objects.bulk_create([
+            Order(title=f'Заказ {i}', description='Описание тестового заказа', user=self.users[0]) for i in range(3)
+        ])
+        response = self.client.delete(reverse('user-detail', args=[self.users[0].id]))
+        self.assertEqual(response.status_code, 204)
+        self.assertWithinQueryBudget(response)
+        self.assertFalse(Order.objects.filter(user_id=self.users[0].id).exists())
+
+
+class UserConditionalRequestTests(TestCase):
+    """
+    ETag и Last-Modified пользователя: 304 для GET, If-Match для PUT
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(name='Условный', email='conditional@example.com', age=30)
+
+    def setUp(self):
+        response_cache.clear()
+        self.url = reverse('user-detail', args=[self.user.id])
+
+    def put(self, etag, **data):
+        # Кэш сбрасывается после коммита, как без тестовой транзакции
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.put(self.url, data, content_type='application/json', HTTP_IF_MATCH=etag)
+
+    def test_if_none_match(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        earlier = http_date((self.user.updated_at - timedelta(minutes=1)).timestamp())
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=earlier).status_code, 200)
+
+    def test_if_match(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.put(etag, age=31)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        # Второе изменение по тому же ETag потеряло бы первое
+        self.assertEqual(self.put(etag, age=32).status_code, 412)
+        self.assertEqual(User.objects.get(id=self.user.id).age, 31)
+
+    def test_if_match_after_stale_cache(self):
+        stale = self.client.get(self.url)['ETag']
+        # Изменение в обход save() не сбрасывает кэш
+        User.objects.filter(id=self.user.id).update(name='В обход', updated_at=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(self.client.get(self.url)['ETag'], stale)
+        self.assertEqual(self.put(stale, age=31).status_code, 412)
+
+        # После 412 GET отдает ETag из БД, и с ним изменение проходит
+        fresh = self.client.get(self.url)
+        self.assertEqual(fresh.json()['data']['name'], 'В обход')
+        self.assertEqual(self.put(fresh['ETag'], age=31).status_code, 200)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'SQLite не блокирует строки SELECT ... FOR UPDATE')
+class ConcurrentUserUpdateTests(TransactionTestCase):
+    """
+    PUT с If-Match проверяет ETag и записывает под блокировкой строки
+    """
+
+    def test_same_etag(self):
+        user = User.objects.create(name='Условный', email='conditional@example.com', age=30)
+        response_cache.clear()
+        url = reverse('user-detail', args=[user.id])
+        etag = self.client.get(url)['ETag']
+        responses = []
+
+        def put():
+            try:
+                responses.append(self.client_class().put(
+                    url, {'age': 32}, content_type='application/json', HTTP_IF_MATCH=etag,
+                ))
+            finally:
+                connections.close_all()
+
+        # Первый PUT записан, но не зафиксирован; второй с тем же ETag ждет его фиксации
+        with transaction.atomic():
+            first = self.client.put(url, {'age': 31}, content_type='application/json', HTTP_IF_MATCH=etag)
+            thread = threading.Thread(target=put)
+            thread.start()
+            time.sleep(0.2)
+        thread.join()
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual([response.status_code for response in responses], [412])
+        self.assertEqual(User.objects.get(id=user.id).age, 31)
+
+
+class UserRowSerializerContractTests(TestCase):
+    """
+    Быстрый путь (values() + RowSerializer + orjson) выдает те же байты, что и сериализаторы
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create(name='Без заказов', email='empty@example.com', age=30)
+        User.objects.create(
+            name='С заказами', email='orders@example.com', age=40, order_count=3, last_order_at=timezone.now(),
+        )
+
+    def test_matches_serializers(self):
+        for serializer_class in (UserSerializer, UserStatsSerializer):
+            with self.subTest(serializer=serializer_class.__name__):
+                users = list(User.objects.order_by('id'))
+                expected = JSONRenderer().render(serializer_class(users, many=True).data)
+
+                rows = get_row_serializer(serializer_class)
+                data = rows.serialize(rows.values(User.objects.order_by('id')))
+                self.assertEqual(ORJSONRenderer().render(data), expected)
+
+
+class AsyncUserViewTests(QueryBudgetTestMixin, TestCase):
+    """
+    Async-представления пользователей отдают те же данные, что и синхронные
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(name='Пользователь', email='async@example.com', age=20)
+
+    async def test_matches_sync_views(self):
+        for name, args in (('user-list-create', []), ('user-detail', [self.user.id])):
+            with self.subTest(name=name):
+                expected = (await self.async_client.get(reverse(name, args=args))).json()
+                response = await self.async_client.get(reverse(f'async-{name}', args=args))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), expected)
+
+    async def test_create_duplicate_email(self):
+        payload = {'name': 'Новый', 'email': 'async@example.com', 'age': 30}
+        response = await self.async_client.post(
+            reverse('async-user-list-create'), payload, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json()['errors'])
+
+
+class FailingImporter(UserImporter):
+    """
+    Импорт, в котором пачка с номером fail_batch не загружается
+    """
+
+    def __init__(self, fail_batch, **kwargs):
+        super().__init__(**kwargs)
+        self.fail_batch = fail_batch
+        self.loaded = 0
+
+    def _flush(self, batch, now):
+        self.loaded += 1
+        result = super()._flush(batch, now)
+        if self.loaded == self.fail_batch:
+            raise DatabaseError('Соединение разорвано')
+        return result
+
+
+class UserImportTests(TestCase):
+    """
+    Потоковый импорт пользователей: форматы, дубликаты, ошибки и границы пачек
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create(name='Существующий', email='existing@example.com', age=40)
+
+    def post(self, body, content_type):
+        return self.client.post(reverse('user-import'), body, content_type=content_type)
+
+    @staticmethod
+    def ndjson(*rows):
+        return ''.join(json.dumps(row) + '\n' for row in rows).encode('utf-8')
+
+    def test_csv(self):
+        body = 'name,email,age\nАнна,anna@example.com,30\nБорис,boris@example.com,25\n'
+        response = self.post(body.encode('utf-8'), 'text/csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['created'], 2)
+        self.assertEqual(User.objects.get(email='boris@example.com').name, 'Борис')
+
+    def test_jsonl(self):
+        body = self.ndjson({'name': 'Анна', 'email': 'anna@example.com', 'age': 30}) + b'\n'
+        for content_type in ('application/x-ndjson', 'application/jsonl'):
+            with self.subTest(content_type=content_type):
+                response = self.post(body, content_type)
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(User.objects.filter(email='anna@example.com').count(), 1)
+        self.assertEqual(self.post(body, 'application/json').status_code, 415)
+
+    def test_duplicates(self):
+        body = self.ndjson(
+            {'name': 'Первый', 'email': 'dup@example.com', 'age': 30},
+            {'name': 'Второй', 'email': 'dup@example.com', 'age': 31},
+            {'name': 'Повтор', 'email': 'existing@example.com', 'age': 32},
+        )
+        data = self.post(body, 'application/x-ndjson').json()['data']
+        self.assertEqual((data['created'], data['duplicates']), (1, 2))
+        self.assertEqual(User.objects.get(email='dup@example.com').name, 'Первый')
+        self.assertEqual(User.objects.get(email='existing@example.com').name, 'Существующий')
+
+    def test_validation_errors(self):
+        body = self.ndjson(
+            {'name': 'Анна', 'email': 'anna@example.com', 'age': 30},
+            {'name': 'Без email', 'age': 30},
+            {'name': 'Возраст', 'email': 'age@example.com', 'age': -1},
+        ) + b'not json\n' + self.ndjson([1, 2])
+        data = self.post(body, 'application/x-ndjson').json()['data']
+        self.assertEqual((data['total'], data['created'], data['invalid']), (5, 1, 4))
+        self.assertEqual([error['line'] for error in data['errors']], [2, 3, 4, 5])
+        self.assertIn('email', data['errors'][0]['errors'])
+
+    def test_batch_boundaries(self):
+        rows = [{'name': f'Пользователь {i}', 'email': f'user{i}@example.com', 'age': 20} for i in range(5)]
+        # Дубликат из первой пачки во второй и существующий email на границе пачек
+        rows.insert(2, {'name': 'Повтор', 'email': 'user0@example.com', 'age': 20})
+        rows.insert(4, {'name': 'Повтор', 'email': 'existing@example.com', 'age': 20})
+        result = UserImporter(batch_size=2).run(BytesIO(self.ndjson(*rows)), 'ndjson')
+        self.assertEqual((result.total, result.created, result.duplicates, result.batches), (7, 5, 2, 4))
+        self.assertEqual(User.objects.get(email='user0@example.com').name, 'Пользователь 0')
+
+    def test_failed_batch(self):
+        rows = [{'name': f'Пользователь {i}', 'email': f'user{i}@example.com', 'age': 20} for i in range(6)]
+        with self.assertRaises(ImportBatchError) as raised:
+            FailingImporter(fail_batch=2, batch_size=2).run(BytesIO(self.ndjson(*rows)), 'ndjson')
+        result = raised.exception.result
+        self.assertEqual(result.failed_batch['batch'], 2)
+        self.assertEqual((result.failed_batch['first_line'], result.failed_batch['last_line']), (3, 4))
+        # Первая пачка зафиксирована, вторая откатилась, третья не загружалась
+        self.assertEqual(result.created, 2)
+        self.assertEqual(
+            sorted(User.objects.filter(email__startswith='user').values_list('email', flat=True)),
+            ['user0@example.com', 'user1@example.com'],
+        )
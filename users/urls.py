@@ -1,7 +1,9 @@
 from django.urls import path
-from .views import UserListCreateView, UserDetailView
+from .views import UserListCreateView, UserImportView, UserStatsView, UserDetailView
 
 urlpatterns = [
     path('users/', UserListCreateView.as_view(), name='user-list-create'),
+    path('users/import/', UserImportView.as_view(), name='user-import'),
+    path('users/stats/', UserStatsView.as_view(), name='user-stats'),
     path('users/<int:user_id>/', UserDetailView.as_view(), name='user-detail'),
 ] 
\ No newline at end of file
@@ -2,34 +2,84 @@ from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.conf import settings
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.core.exceptions import ValidationError
 from .models import User
-from .serializers import UserSerializer, UserUpdateSerializer
+from .filters import UserFilterSet, UserStatsFilterSet
+from .importing import ImportBatchError, UserImporter
+from .serializers import UserSerializer, UserStatsSerializer, UserUpdateSerializer
+from idempotency.keys import idempotent
+from t3codescommanders.cache import response_cache
+from t3codescommanders.conditional import (
+    not_modified_response, page_not_modified_response, precondition_failed_response, precondition_lock,
+    representation_validators, set_page_validators, set_validators,
+)
+from t3codescommanders.exceptions import InvalidQueryParameter
+from t3codescommanders.pagination import KeysetPagination
+from t3codescommanders.serializers import get_row_serializer, parse_fields, prune_fields
+from jobs.registry import enqueue
+from orders.deletion import delete_user
+from orders.models import Order
+
+
+def cached_user_data(user_id):
+    """
+    Данные пользователя для кэша ответов; отсутствие дает User.DoesNotExist
+    """
+    return UserSerializer(User.objects.get(id=user_id)).data
+
+
+def cached_users_data(user_ids):
+    """
+    Данные нескольких пользователей для кэша ответов одним запросом
+    """
+    return {user.id: UserSerializer(user).data for user in User.objects.filter(id__in=user_ids)}
 
 
 class UserListCreateView(APIView):
     """
     Представление для создания и получения списка пользователей
     """
+    pagination_class = KeysetPagination
+    # Поля, по которым строятся ETag и Last-Modified страницы
+    version_fields = ('id', 'updated_at')
     
     def get(self, request):
         """
-        Получить список всех пользователей
+        Получить страницу списка пользователей с фильтрами и сортировкой
         """
         try:
-            users = User.objects.all()
-            serializer = UserSerializer(users, many=True)
+            fields = parse_fields(request.query_params, get_row_serializer(UserSerializer).field_names)
+            filterset = UserFilterSet(request.query_params)
+            rows = get_row_serializer(UserSerializer, fields=fields)
+            queryset = rows.values(
+                filterset.filter_queryset(User.objects.all()), *self.version_fields, *filterset.ordering_fields
+            )
+            not_modified = page_not_modified_response(
+                request, self.pagination_class, queryset, self.version_fields,
+                ordering=filterset.ordering_fields,
+            )
+            if not_modified is not None:
+                return not_modified
+
+            paginator = self.pagination_class(ordering=filterset.ordering_fields)
+            users = paginator.paginate_queryset(queryset, request, view=self)
+            response = paginator.get_paginated_response(rows.serialize(users))
+            return set_page_validators(response, request, paginator, users, self.version_fields)
+        except InvalidQueryParameter as e:
             return Response({
-                'status': 'success',
-                'data': serializer.data
-            }, status=status.HTTP_200_OK)
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({
                 'status': 'error',
                 'message': f'Ошибка при получении пользователей: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @idempotent
     def post(self, request):
         """
         Создать нового пользователя
@@ -62,6 +112,95 @@ class UserListCreateView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class UserStatsView(APIView):
+    """
+    Представление статистики заказов по пользователям
+    """
+    pagination_class = KeysetPagination
+    version_fields = ('id', 'updated_at')
+
+    def get(self, request):
+        """
+        Получить страницу пользователей, отсортированных по количеству
+        заказов (по умолчанию) или по дате последнего заказа
+        """
+        try:
+            fields = parse_fields(request.query_params, get_row_serializer(UserStatsSerializer).field_names)
+            filterset = UserStatsFilterSet(request.query_params)
+            rows = get_row_serializer(UserStatsSerializer, fields=fields)
+            queryset = rows.values(
+                filterset.filter_queryset(User.objects.all()), *self.version_fields, *filterset.ordering_fields
+            )
+            not_modified = page_not_modified_response(
+                request, self.pagination_class, queryset, self.version_fields,
+                ordering=filterset.ordering_fields,
+            )
+            if not_modified is not None:
+                return not_modified
+
+            paginator = self.pagination_class(ordering=filterset.ordering_fields)
+            users = paginator.paginate_queryset(queryset, request, view=self)
+            response = paginator.get_paginated_response(rows.serialize(users))
+            return set_page_validators(response, request, paginator, users, self.version_fields)
+        except InvalidQueryParameter as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': f'Ошибка при получении статистики пользователей: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class UserImportView(APIView):
+    """
+    Представление для потокового импорта пользователей из NDJSON или CSV
+    """
+    CONTENT_TYPES = {
+        'application/x-ndjson': 'ndjson',
+        'application/jsonl': 'ndjson',
+        'text/csv': 'csv',
+    }
+
+    def post(self, request):
+        """
+        Импортировать пользователей из тела запроса.
+
+        Тело читается построчно, request.data не используется, чтобы файл
+        не загружался в память целиком.
+        """
+        try:
+            content_type = request.content_type.split(';')[0].strip().lower()
+            file_format = self.CONTENT_TYPES.get(content_type)
+            if file_format is None:
+                return Response({
+                    'status': 'error',
+                    'message': f'Неподдерживаемый Content-Type: {content_type}. '
+                               f'Допустимо: {", ".join(self.CONTENT_TYPES)}'
+                }, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+            result = UserImporter().run(request._request, file_format)
+            return Response({
+                'status': 'success',
+                'message': 'Импорт пользователей завершен',
+                'data': result.as_dict()
+            }, status=status.HTTP_200_OK)
+        except ImportBatchError as e:
+            # Пачки до failed_batch уже зафиксированы: клиент продолжает со строки first_line
+            return Response({
+                'status': 'error',
+                'message': f'Ошибка при импорте пользователей: {str(e)}',
+                'data': e.result.as_dict()
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        except Exception as e:
+            return Response({
+                'status': 'error',
+                'message': f'Ошибка при импорте пользователей: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class UserDetailView(APIView):
     """
     Представление для получения, обновления и удаления пользователя
@@ -72,12 +211,21 @@ class UserDetailView(APIView):
         Получить информацию о пользователе по ID
         """
         try:
-            user = get_object_or_404(User, id=user_id)
-            serializer = UserSerializer(user)
-            return Response({
+            fields = parse_fields(request.query_params, get_row_serializer(UserSerializer).field_names)
+            data = response_cache.fetch('user', user_id, lambda: cached_user_data(user_id))
+            etag, last_modified = representation_validators('user', data)
+            not_modified = not_modified_response(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+            return set_validators(Response({
                 'status': 'success',
-                'data': serializer.data
-            }, status=status.HTTP_200_OK)
+                'data': prune_fields(data, fields)
+            }, status=status.HTTP_200_OK), etag, last_modified)
+        except InvalidQueryParameter as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
         except User.DoesNotExist:
             return Response({
                 'status': 'error',
@@ -89,26 +237,49 @@ class UserDetailView(APIView):
                 'message': f'Ошибка при получении пользователя: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @staticmethod
+    def _validators(user):
+        """
+        ETag и Last-Modified пользователя из БД по тому же представлению, что и в GET
+        """
+        etag, last_modified = representation_validators('user', UserSerializer(user).data)
+        return [etag], last_modified
+
     def put(self, request, user_id):
         """
         Обновить информацию о пользователе
         """
         try:
-            user = get_object_or_404(User, id=user_id)
-            serializer = UserUpdateSerializer(user, data=request.data, partial=True)
-            if serializer.is_valid():
-                serializer.save()
-                return Response({
-                    'status': 'success',
-                    'message': 'Пользователь успешно обновлен',
-                    'data': UserSerializer(user).data
-                }, status=status.HTTP_200_OK)
-            else:
-                return Response({
-                    'status': 'error',
-                    'message': 'Ошибка валидации данных',
-                    'errors': serializer.errors
-                }, status=status.HTTP_400_BAD_REQUEST)
+            lock, users = precondition_lock(request, User.objects.all())
+            with lock:
+                user = get_object_or_404(users, id=user_id)
+
+                # Оптимистичная блокировка через If-Match
+                precondition_failed = precondition_failed_response(
+                    request, lambda: self._validators(user)
+                )
+                if precondition_failed is not None:
+                    # ETag клиента мог прийти из устаревшей записи кэша: следующий
+                    # GET построит его из БД, как и эта проверка
+                    response_cache.invalidate('user', user.id)
+                    return precondition_failed
+
+                serializer = UserUpdateSerializer(user, data=request.data, partial=True)
+                if serializer.is_valid():
+                    serializer.save()
+                    data = UserSerializer(user).data
+                    etag, last_modified = representation_validators('user', data)
+                    return set_validators(Response({
+                        'status': 'success',
+                        'message': 'Пользователь успешно обновлен',
+                        'data': data
+                    }, status=status.HTTP_200_OK), etag, last_modified)
+                else:
+                    return Response({
+                        'status': 'error',
+                        'message': 'Ошибка валидации данных',
+                        'errors': serializer.errors
+                    }, status=status.HTTP_400_BAD_REQUEST)
         except User.DoesNotExist:
             return Response({
                 'status': 'error',
@@ -131,8 +302,25 @@ class UserDetailView(APIView):
         Удалить пользователя
         """
         try:
-            user = get_object_or_404(User, id=user_id)
-            user.delete()
+            user = get_object_or_404(User.objects.only('id', 'order_count'), id=user_id)
+            # Денормализованный order_count может разойтись с таблицей заказов, поэтому
+            # решение принимается по реальным заказам, но считается не дальше порога
+            threshold = settings.USER_DELETE_SYNC_MAX_ORDERS
+            orders = Order.objects.filter(user_id=user.id).order_by().values('id')[:threshold + 1].count()
+            if orders > threshold:
+                # Заказы удаляются порциями задачей очереди; ход виден по order_count
+                # пользователя и прогрессу задачи в /api/jobs/{id}/
+                job, created = enqueue('delete_user', {'user_id': user.id}, key=f'delete_user:{user.id}')
+                response = Response({
+                    'status': 'success',
+                    'message': 'Удаление пользователя запущено' if created else 'Пользователь уже удаляется',
+                    'data': {'id': user.id, 'orders_remaining': user.order_count, 'job_id': job.id}
+                }, status=status.HTTP_202_ACCEPTED)
+                response['Location'] = reverse('job-detail', args=[job.id])
+                return response
+
+            # Одна порция: заказы и пользователь удаляются в одной транзакции
+            delete_user(user.id, batch_size=threshold + 1)
             return Response({
                 'status': 'success',
                 'message': 'Пользователь успешно удален'